@@ -0,0 +1,260 @@
+"""Adaptive interpreter
+
+A tree walking engine whose operator nodes specialize themselves for the
+operand types they see, in the spirit of the specializing interpreter of
+CPython 3.11.
+"""
+
+import operator
+from collections.abc import Callable, Collection, Iterable
+from typing import Any, ClassVar
+
+from gen import expr, stmt
+
+from .closure import NUMBER_OPERATORS
+from .exceptions import InterpreterError
+from .interpreter import Interpreter, isequal, istruthy
+from .output import OutputSink
+from .resolver import Resolver
+from .tokens import Token, TokenType
+
+
+class _QuickenedResolver(Resolver):
+    """Resolves quickened nodes like the nodes they were."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        expressions = self._expressions
+        for binary in _BINARY_SPECIALIZATIONS.values():
+            expressions[binary] = self.visit_binary_expr
+        for unary in _UNARY_SPECIALIZATIONS.values():
+            expressions[unary] = self.visit_unary_expr
+        expressions[_GenericBinaryExpr] = self.visit_binary_expr
+        expressions[_GenericUnaryExpr] = self.visit_unary_expr
+
+
+class AdaptiveInterpreter(Interpreter):
+    """Interpreter that quickens the binary and unary nodes it runs.
+
+    The first time an operator node runs, the types of its operands pick a
+    specialized node class, and the node swaps its `__class__` to it. A
+    specialized node only checks that its operands still have those types
+    and applies its operation; on a miss it deoptimizes for good into a
+    generic node, which takes the full path. The output and the runtime
+    errors are the same as the ones of the tree walking `Interpreter`.
+    Quickened nodes stay quickened, so a tree run again by this engine
+    starts out specialized; other visitors do not know their classes.
+    """
+
+    _resolver = _QuickenedResolver
+
+    def __init__(
+        self,
+        _statements: Iterable[stmt.Stmt | None] | None = None,
+        output: OutputSink | None = None,
+    ) -> None:
+        super().__init__(_statements, output)
+        evaluators = self._evaluators
+        for binary in _BINARY_SPECIALIZATIONS.values():
+            evaluators[binary] = self._visit_specialized_binary
+        for unary in _UNARY_SPECIALIZATIONS.values():
+            evaluators[unary] = self._visit_specialized_unary
+        evaluators[_GenericBinaryExpr] = self._visit_generic_binary
+        evaluators[_GenericUnaryExpr] = self._visit_generic_unary
+
+    def visit_binary_expr(self, _expr: "expr.BinaryExpr") -> object:
+        evaluators = self._evaluators
+        left = evaluators[type(_expr.left)](_expr.left)
+        right = evaluators[type(_expr.right)](_expr.right)
+        key = (_expr.operator.type, type(left), type(right))
+        _expr.__class__ = _BINARY_SPECIALIZATIONS.get(key, _GenericBinaryExpr)
+        return apply_binary(_expr.operator, left, right)
+
+    def visit_unary_expr(self, _expr: "expr.UnaryExpr") -> object:
+        right = self._evaluators[type(_expr.right)](_expr.right)
+        key = (_expr.operator.type, type(right))
+        _expr.__class__ = _UNARY_SPECIALIZATIONS.get(key, _GenericUnaryExpr)
+        return apply_unary(_expr.operator, right)
+
+    def _visit_specialized_binary(self, _expr: "_SpecializedBinaryExpr") -> Any:
+        evaluators = self._evaluators
+        left = evaluators[type(_expr.left)](_expr.left)
+        right = evaluators[type(_expr.right)](_expr.right)
+        operand = _expr.operand
+        # pylint: disable-next=unidiomatic-typecheck
+        if type(left) is operand and type(right) is operand:
+            return _expr.operation(left, right)
+        _deoptimize(_expr, _GenericBinaryExpr)
+        return apply_binary(_expr.operator, left, right)
+
+    def _visit_specialized_unary(self, _expr: "_SpecializedUnaryExpr") -> Any:
+        right = self._evaluators[type(_expr.right)](_expr.right)
+        # pylint: disable-next=unidiomatic-typecheck
+        if type(right) is _expr.operand:
+            return _expr.operation(right)
+        _deoptimize(_expr, _GenericUnaryExpr)
+        return apply_unary(_expr.operator, right)
+
+    def _visit_generic_binary(self, _expr: "expr.BinaryExpr") -> object:
+        evaluators = self._evaluators
+        left = evaluators[type(_expr.left)](_expr.left)
+        right = evaluators[type(_expr.right)](_expr.right)
+        return apply_binary(_expr.operator, left, right)
+
+    def _visit_generic_unary(self, _expr: "expr.UnaryExpr") -> object:
+        right = self._evaluators[type(_expr.right)](_expr.right)
+        return apply_unary(_expr.operator, right)
+
+
+# A node can only change its class to one with the same layout, so none of
+# these classes adds slots.
+
+
+class _SpecializedBinaryExpr(expr.BinaryExpr):
+    """A binary node for two operands of one type."""
+
+    __slots__ = ()
+    operand: ClassVar[type]
+    operation: ClassVar[Callable[..., object]]
+
+
+class _SpecializedUnaryExpr(expr.UnaryExpr):
+    """A unary node for an operand of one type."""
+
+    __slots__ = ()
+    operand: ClassVar[type]
+    operation: ClassVar[Callable[..., object]]
+
+
+class _GenericBinaryExpr(expr.BinaryExpr):
+    """A binary node that saw operands of different types."""
+
+    __slots__ = ()
+
+
+class _GenericUnaryExpr(expr.UnaryExpr):
+    """A unary node that saw operands of different types."""
+
+    __slots__ = ()
+
+
+def _specialize(
+    base: type[_SpecializedBinaryExpr] | type[_SpecializedUnaryExpr],
+    name: str,
+    operand: type,
+    operation: Callable[..., object],
+) -> Any:
+    """Create the node class for an operation on operands of a type."""
+    namespace = {
+        "__module__": __name__,
+        "__slots__": (),
+        "__doc__": f"The {name} node.",
+        "operand": operand,
+        "operation": staticmethod(operation),
+    }
+    return type(f"{name}Expr", (base,), namespace)
+
+
+def _deoptimize(node: expr.Expr, generic: type[expr.Expr]) -> None:
+    """Turn a specialized node whose operands changed type into a generic
+    one."""
+    node.__class__ = generic
+
+
+_BINARY_OPERATIONS: dict[TokenType, Callable[[Any, Any], object]] = {
+    **NUMBER_OPERATORS,
+    TokenType.BANG_EQUAL: operator.ne,
+    TokenType.EQUAL_EQUAL: operator.eq,
+    TokenType.PLUS: operator.add,
+}
+
+_EQUALITY = (TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL)
+
+# The Lox name of every operand type and the operators specialized for it.
+# Two operands of the same type are equal exactly when Python says so.
+_OPERAND_TYPES: dict[type, tuple[str, Iterable[TokenType]]] = {
+    float: ("Number", _BINARY_OPERATIONS),
+    str: ("String", (*_EQUALITY, TokenType.PLUS)),
+    bool: ("Boolean", _EQUALITY),
+    type(None): ("Nil", _EQUALITY),
+}
+
+# The specialized classes, by operator and operand types.
+_BINARY_SPECIALIZATIONS: dict[
+    tuple[TokenType, type, type], type[_SpecializedBinaryExpr]
+] = {
+    (token_type, operand, operand): _specialize(
+        _SpecializedBinaryExpr,
+        name + token_type.name.title().replace("_", ""),
+        operand,
+        _BINARY_OPERATIONS[token_type],
+    )
+    for operand, (name, token_types) in _OPERAND_TYPES.items()
+    for token_type in token_types
+}
+
+_UNARY_SPECIALIZATIONS: dict[
+    tuple[TokenType, type], type[_SpecializedUnaryExpr]
+] = {
+    (TokenType.BANG, bool): _specialize(
+        _SpecializedUnaryExpr, "BooleanNot", bool, operator.not_
+    ),
+    (TokenType.MINUS, float): _specialize(
+        _SpecializedUnaryExpr, "NumberNegate", float, operator.neg
+    ),
+}
+
+
+def quickened_binary(
+    token_type: TokenType, observed: Collection[tuple[type, ...]]
+) -> type[expr.BinaryExpr] | None:
+    """The class of a binary node that ran with some operand types, before
+    it runs again: specialized for a single pair of them, generic for
+    several, and None for none."""
+    if len(observed) == 1:
+        (left, right), *_ = observed
+        key = (token_type, left, right)
+        return _BINARY_SPECIALIZATIONS.get(key, _GenericBinaryExpr)
+    return _GenericBinaryExpr if observed else None
+
+
+def quickened_unary(
+    token_type: TokenType, observed: Collection[tuple[type, ...]]
+) -> type[expr.UnaryExpr] | None:
+    """The class of a unary node that ran with some operand types, before
+    it runs again: specialized for a single type, generic for several, and
+    None for none."""
+    if len(observed) == 1:
+        (right,), *_ = observed
+        return _UNARY_SPECIALIZATIONS.get(
+            (token_type, right), _GenericUnaryExpr
+        )
+    return _GenericUnaryExpr if observed else None
+
+
+def apply_binary(token: Token, left: object, right: object) -> object:
+    """Apply a binary operator, checking its operands."""
+    match token.type:
+        case TokenType.EQUAL_EQUAL:
+            return isequal(left, right)
+        case TokenType.BANG_EQUAL:
+            return not isequal(left, right)
+        case TokenType.PLUS:
+            # pylint: disable-next=unidiomatic-typecheck
+            if type(left) is type(right) and type(left) in (float, str):
+                return operator.add(left, right)
+            raise InterpreterError(
+                token, "Operands must be two numbers or two strings."
+            )
+    if isinstance(left, float) and isinstance(right, float):
+        return _BINARY_OPERATIONS[token.type](left, right)
+    raise InterpreterError(token, "Operands must be numbers.")
+
+
+def apply_unary(token: Token, right: object) -> object:
+    """Apply a unary operator, checking its operand."""
+    if token.type == TokenType.BANG:
+        return not istruthy(right)
+    if isinstance(right, float):
+        return -right
+    raise InterpreterError(token, "Operand must be a number.")
@@ -0,0 +1,303 @@
+"""Batch evaluation
+
+Evaluates an expression once for every row of a table of variables, given
+as columns: the columns of CSV files, named by their header, or `.npy`
+files, named after the file. With NumPy installed, each node is evaluated
+once over whole columns; the rows it cannot handle that way, like those
+that fail, are evaluated one at a time. Without it, every row is.
+"""
+
+import csv
+import importlib
+import sys
+from collections.abc import Sequence
+from pathlib import Path
+from types import ModuleType
+from typing import Any
+
+from gen import expr
+
+from . import parser
+from .exceptions import InterpreterError
+from .interpreter import Interpreter, stringify
+from .output import OutputSink
+from .tokens import Token, TokenType
+
+
+class Unvectorizable(Exception):
+    """An expression that cannot be evaluated over whole columns."""
+
+
+class ArrayEvaluator(expr.Visitor):
+    """Evaluates an expression over NumPy arrays, one value per row.
+
+    Numbers are float arrays and Booleans bool arrays; nil and strings, and
+    the operations that fail for every row, are not vectorized. The rows
+    that fail, or whose value NumPy would compute differently, are marked
+    in `rejected`, to be evaluated one at a time; so are the rows of the
+    variables read whose cells are not of the type of their column.
+    """
+
+    def __init__(
+        self,
+        numpy: ModuleType,
+        columns: dict[str, tuple[Any, Any]],
+        rows: int,
+    ) -> None:
+        self._np = numpy
+        self._columns = columns
+        self.rejected = numpy.zeros(rows, dtype=bool)
+        self._expressions = expr.dispatch_table(self)
+
+    def evaluate(self, _expr: expr.Expr) -> Any:
+        """Evaluate an expression, as an array or a NumPy scalar."""
+        return self._expressions[type(_expr)](_expr)
+
+    def visit_assign_expr(self, _expr: "expr.AssignExpr") -> Any:
+        raise Unvectorizable
+
+    # pylint: disable-next=too-many-return-statements
+    def visit_binary_expr(self, _expr: "expr.BinaryExpr") -> Any:
+        left = self.evaluate(_expr.left)
+        right = self.evaluate(_expr.right)
+        np = self._np
+        match _expr.operator.type:
+            case TokenType.EQUAL_EQUAL:
+                return np.equal(left, right)
+            case TokenType.BANG_EQUAL:
+                return np.not_equal(left, right)
+        if not _numbers(left) or not _numbers(right):
+            raise Unvectorizable
+        match _expr.operator.type:
+            case TokenType.GREATER:
+                return np.greater(left, right)
+            case TokenType.GREATER_EQUAL:
+                return np.greater_equal(left, right)
+            case TokenType.LESS:
+                return np.less(left, right)
+            case TokenType.LESS_EQUAL:
+                return np.less_equal(left, right)
+            case TokenType.MINUS:
+                return np.subtract(left, right)
+            case TokenType.PLUS:
+                return np.add(left, right)
+            case TokenType.STAR:
+                return np.multiply(left, right)
+        # Dividing by zero is left to the interpreter.
+        zero = np.equal(right, 0.0)
+        self.rejected |= zero
+        return np.divide(left, np.where(zero, 1.0, right))
+
+    def visit_grouping_expr(self, _expr: "expr.GroupingExpr") -> Any:
+        return self.evaluate(_expr.expression)
+
+    def visit_literal_expr(self, _expr: "expr.LiteralExpr") -> Any:
+        if isinstance(_expr.value, bool):
+            return self._np.bool_(_expr.value)
+        if isinstance(_expr.value, float):
+            return self._np.float64(_expr.value)
+        raise Unvectorizable
+
+    def visit_unary_expr(self, _expr: "expr.UnaryExpr") -> Any:
+        right = self.evaluate(_expr.right)
+        if _expr.operator.type == TokenType.BANG:
+            if _numbers(right):
+                # Numbers are all truthy.
+                return self._np.zeros_like(right, dtype=bool)
+            return self._np.logical_not(right)
+        if not _numbers(right):
+            raise Unvectorizable
+        return self._np.negative(right)
+
+    def visit_variable_expr(self, _expr: "expr.VariableExpr") -> Any:
+        column = self._columns.get(_expr.name.lexeme)
+        if column is None or column[0].dtype.kind not in "bf":
+            raise Unvectorizable
+        values, mismatched = column
+        self.rejected |= mismatched
+        return values
+
+
+expr.Visitor.register(ArrayEvaluator)
+
+
+def _numbers(values: Any) -> bool:
+    """Check if an array or a NumPy scalar holds numbers."""
+    return bool(values.dtype.kind == "f")
+
+
+def import_numpy() -> ModuleType | None:
+    """NumPy, if it is installed."""
+    try:
+        return importlib.import_module("numpy")
+    except ImportError:
+        return None
+
+
+def read_columns(paths: Sequence[str]) -> dict[str, list[object]]:
+    """Read the columns of CSV and `.npy` files, as lists of Lox values."""
+    columns: dict[str, list[object]] = {}
+    for path in paths:
+        if path.endswith(".npy"):
+            np = import_numpy()
+            if np is None:
+                raise ValueError(f"Reading {path} needs NumPy")
+            array = np.load(path, allow_pickle=False)
+            if array.dtype.kind in "iuf":
+                array = array.astype(float)
+            columns[Path(path).stem] = array.tolist()
+            continue
+        with open(path, encoding="utf-8", newline="") as file:
+            reader = csv.reader(file)
+            names = next(reader, [])
+            cells: list[list[object]] = [[] for _ in names]
+            for row in reader:
+                for column, cell in zip(cells, row, strict=True):
+                    column.append(parse_cell(cell))
+        columns.update(zip(names, cells))
+    if len({len(column) for column in columns.values()}) > 1:
+        raise ValueError("The columns have different lengths")
+    return columns
+
+
+def parse_cell(cell: str) -> object:
+    """The Lox value of a CSV cell: a number, true, false, nil when empty
+    or a string."""
+    match cell:
+        case "true":
+            return True
+        case "false":
+            return False
+        case "nil" | "":
+            return None
+    try:
+        return float(cell)
+    except ValueError:
+        return cell
+
+
+def evaluate_rows(
+    _expr: expr.Expr,
+    columns: dict[str, list[object]],
+    engine: type[Interpreter] = Interpreter,
+) -> list[tuple[object, InterpreterError | None]]:
+    """Evaluate an expression for every row of some columns, returning the
+    value or the runtime error of each."""
+    rows = len(next(iter(columns.values()), []))
+    results: list[tuple[object, InterpreterError | None]] = []
+    np = import_numpy()
+    rejected: Any = range(rows)
+    if np is not None and columns:
+        arrays = {
+            name: column_array(np, column) for name, column in columns.items()
+        }
+        evaluator = ArrayEvaluator(np, arrays, rows)
+        try:
+            # Overflows and NaNs make the same values as in the interpreter.
+            with np.errstate(all="ignore"):
+                value = evaluator.evaluate(_expr)
+            values = np.broadcast_to(value, rows).tolist()
+            results = [(value, None) for value in values]
+            rejected = np.flatnonzero(evaluator.rejected).tolist()
+        except Unvectorizable:
+            pass
+    if not results:
+        results = [(None, None)] * rows
+    interpreter = engine()
+    for row in rejected:
+        for name, column in columns.items():
+            interpreter.define(name, column[row])
+        results[row] = _evaluate_row(interpreter, _expr)
+    return results
+
+
+def _evaluate_row(
+    interpreter: Interpreter, _expr: expr.Expr
+) -> tuple[object, InterpreterError | None]:
+    """Evaluate an expression for the row defined in an interpreter."""
+    try:
+        return interpreter.evaluate(_expr), None
+    except InterpreterError as e:
+        return None, e
+    except ZeroDivisionError:
+        # The engines leave dividing by zero to Python.
+        operator = _division(_expr)
+        if operator is None:
+            raise
+        return None, InterpreterError(operator, "Division by zero.")
+
+
+def _division(_expr: expr.Expr) -> Token | None:
+    """The operator of the outermost division of an expression, if any."""
+    nodes = [_expr]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, expr.BinaryExpr):
+            if node.operator.type == TokenType.SLASH:
+                return node.operator
+            nodes += (node.right, node.left)
+        elif isinstance(node, expr.GroupingExpr):
+            nodes.append(node.expression)
+        elif isinstance(node, expr.UnaryExpr):
+            nodes.append(node.right)
+        elif isinstance(node, expr.AssignExpr):
+            nodes.append(node.value)
+    return None
+
+
+def column_array(np: ModuleType, column: list[object]) -> tuple[Any, Any]:
+    """A column as an array and a bool array of the rows it does not hold.
+
+    A column with numbers is a float array and one with Booleans but no
+    numbers a bool array, without the cells of other types; any other
+    column is an object array, with no row held.
+    """
+    for kind in (float, bool):
+        held = np.array([isinstance(value, kind) for value in column], bool)
+        if held.any():
+            values = [
+                value if isinstance(value, kind) else False for value in column
+            ]
+            return np.array(values, dtype=kind), ~held
+    return np.array(column, dtype=object), np.ones(len(column), dtype=bool)
+
+
+def batch_cmd(
+    content: str,
+    paths: Sequence[str],
+    scanner_engine: str = "default",
+    engine: type[Interpreter] = Interpreter,
+) -> None:
+    """Batch evaluate command.
+
+    Prints the value of the expression for every row, or an empty line for
+    a row that fails; the runtime errors follow, with the number of their
+    rows.
+    """
+    _expr, parse_errors = parser.parse_expression(content, scanner_engine)
+    if parse_errors:
+        sys.exit(65)
+    try:
+        columns = read_columns(paths)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    if _expr is None:
+        return
+    output = OutputSink()
+    errors: list[str] = []
+    with parser.deep_recursion():
+        results = evaluate_rows(_expr, columns, engine)
+    for row, (value, error) in enumerate(results):
+        if error is None:
+            output.write(stringify(value))
+        else:
+            output.write("")
+            errors.append(
+                f"[row {row + 1}] {error.msg}\n[line {error.token.line}]"
+            )
+    output.flush()
+    if errors:
+        for message in errors:
+            print(message, file=sys.stderr)
+        sys.exit(70)
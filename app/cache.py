@@ -0,0 +1,172 @@
+"""On-disk cache of parsed programs.
+
+Parsed programs are pickled to `<hash>.loxc` files named after a hash of the
+source and of the code that scans and parses it, so a change to either one
+misses the cache. Hits refresh the modification time of their file and the
+least recently used files are removed once the directory grows over
+`max_size()` bytes. The directory is `$LOX_CACHE_DIR`, or `lox` in the user
+cache directory.
+
+Long-lived processes, like the `serve` daemon, also keep the pickled
+programs in memory after `keep_in_memory()`; every load still unpickles a
+fresh copy, as the engines may rewrite the trees they run.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from gen import expr, stmt
+
+SUFFIX = ".loxc"
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# The modules of the app, next to this one, that produce a parsed program.
+_SOURCES = ("tokens.py", "scanner.py", "parser.py")
+
+_VERSION: list[bytes] = []
+
+
+class _Memory:
+    """Pickled programs by key, least recently used first, up to `limit`
+    bytes."""
+
+    def __init__(self) -> None:
+        self.limit = 0
+        self._size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+
+    def get(self, name: str) -> bytes | None:
+        """The pickled program of a key, if kept."""
+        data = self._entries.get(name)
+        if data is not None:
+            self._entries.move_to_end(name)
+        return data
+
+    def put(self, name: str, data: bytes) -> None:
+        """Keep a pickled program, forgetting the least recently used ones
+        over the limit."""
+        if len(data) > self.limit or name in self._entries:
+            return
+        self._entries[name] = data
+        self._size += len(data)
+        self.resize(self.limit)
+
+    def resize(self, limit: int) -> None:
+        """Change the limit, forgetting the programs over it."""
+        self.limit = limit
+        while self._size > limit:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+
+_MEMORY = _Memory()
+
+
+def cache_dir() -> Path:
+    """The directory holding the cached programs."""
+    directory = os.environ.get("LOX_CACHE_DIR")
+    if directory:
+        return Path(directory)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "lox"
+
+
+def max_size() -> int:
+    """The size in bytes the cache directory is trimmed to."""
+    return int(os.environ.get("LOX_CACHE_SIZE", DEFAULT_MAX_SIZE))
+
+
+def keep_in_memory(limit: int | None = None) -> None:
+    """Also keep up to `limit` bytes of programs in memory, `max_size()`
+    by default, or none with 0."""
+    _MEMORY.resize(max_size() if limit is None else limit)
+
+
+def key(content: str) -> str:
+    """The cache key of a source."""
+    digest = hashlib.sha256(_interpreter_version())
+    digest.update(content.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+def load(content: str) -> Any | None:
+    """Return the program cached for a source, or None on a miss."""
+    name = key(content)
+    data = _MEMORY.get(name)
+    if data is not None:
+        return pickle.loads(data)
+    path = cache_dir() / f"{name}{SUFFIX}"
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+        program = pickle.loads(data)
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except Exception:  # pylint: disable=broad-exception-caught
+        # A corrupt or unreadable entry, whatever unpickling it raises, is
+        # just a miss.
+        path.unlink(missing_ok=True)
+        return None
+    _MEMORY.put(name, data)
+    return program
+
+
+def store(content: str, program: Any) -> None:
+    """Cache the program parsed from a source and trim the cache."""
+    try:
+        data = pickle.dumps(program, pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, RecursionError):
+        return
+    name = key(content)
+    _MEMORY.put(name, data)
+    directory = cache_dir()
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(".tmp", dir=directory)
+    except OSError:
+        return
+    try:
+        with os.fdopen(handle, "wb") as file:
+            file.write(data)
+        os.replace(temporary, directory / f"{name}{SUFFIX}")
+        evict(directory, max_size())
+    except OSError:
+        # The cache is an optimization: never fail a run because of it.
+        Path(temporary).unlink(missing_ok=True)
+
+
+def evict(directory: Path, limit: int) -> None:
+    """Remove the least recently used entries until `limit` bytes remain."""
+    entries = []
+    total = 0
+    for path in directory.glob(f"*{SUFFIX}"):
+        try:
+            status = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((status.st_mtime_ns, status.st_size, path))
+        total += status.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= limit:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+
+
+def _interpreter_version() -> bytes:
+    """A hash of the modules that define how a source is parsed."""
+    if not _VERSION:
+        digest = hashlib.sha256()
+        paths = [Path(__file__).with_name(name) for name in _SOURCES]
+        paths += [Path(str(expr.__file__)), Path(str(stmt.__file__))]
+        for path in paths:
+            digest.update(path.read_bytes())
+        _VERSION.append(digest.digest())
+    return _VERSION[0]
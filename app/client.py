@@ -0,0 +1,85 @@
+"""Daemon client
+
+A thin client for the `serve` daemon, taking the same arguments as the
+main program: it sends them to the daemon over its Unix socket and replays
+the standard output, standard error and exit code of the command, without
+starting an interpreter of its own. With `-` as the file name, the source
+is read from standard input. The socket is `$LOX_SOCKET`, by default
+`lox-<uid>.sock` in the runtime directory.
+
+    python3 -m app.client run program.lox --engine=vm
+
+Client and daemon exchange JSON objects, one per line: a request with the
+arguments, the working directory and, maybe, the source, then messages
+holding `stdout` or `stderr` text and a last one with the `exit` code.
+"""
+
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+
+def socket_path() -> str:
+    """The path of the socket of the daemon."""
+    path = os.environ.get("LOX_SOCKET")
+    if path:
+        return path
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return str(Path(base) / f"lox-{os.getuid()}.sock")
+
+
+def send(stream: io.BufferedIOBase, message: dict[str, Any]) -> None:
+    """Send a message."""
+    stream.write(json.dumps(message).encode() + b"\n")
+    stream.flush()
+
+
+def receive(stream: io.BufferedIOBase) -> Iterator[dict[str, Any]]:
+    """Receive messages until the other end stops sending."""
+    for line in stream:
+        yield json.loads(line)
+
+
+def request(argv: list[str]) -> dict[str, Any]:
+    """The request for a command line."""
+    message: dict[str, Any] = {"argv": argv, "cwd": os.getcwd()}
+    positional = [arg for arg in argv if arg == "-" or arg[:1] != "-"]
+    if positional[1:2] == ["-"]:
+        message["source"] = sys.stdin.read()
+    return message
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run a command on the daemon and return its exit code."""
+    message = request(sys.argv[1:] if argv is None else argv)
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path())
+    except OSError as e:
+        connection.close()
+        print(f"Cannot reach the daemon: {e}", file=sys.stderr)
+        return 1
+    with connection, connection.makefile("rwb") as stream:
+        send(stream, message)
+        for reply in receive(stream):
+            if "exit" in reply:
+                return int(reply["exit"])
+            for name, target in (
+                ("stdout", sys.stdout),
+                ("stderr", sys.stderr),
+            ):
+                if name in reply:
+                    target.write(reply[name])
+                    target.flush()
+    print("The daemon closed the connection", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""Closure compiler
+
+An execution engine that compiles every statement once into nested Python
+closures and then runs them, instead of walking the tree.
+"""
+
+import operator
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from gen import expr, stmt
+
+from .environment import Environment
+from .exceptions import InterpreterError
+from .interpreter import Interpreter, isequal, istruthy, stringify
+from .output import OutputSink
+from .tokens import Token, TokenType
+
+Thunk = Callable[[], Any]
+
+# The binary operators that only take two numbers.
+NUMBER_OPERATORS: dict[TokenType, Callable[[float, float], Any]] = {
+    TokenType.GREATER: operator.gt,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+    TokenType.MINUS: operator.sub,
+    TokenType.SLASH: operator.truediv,
+    TokenType.STAR: operator.mul,
+}
+
+
+class ClosureInterpreter(Interpreter):
+    """Interpreter that runs statements compiled to closures.
+
+    The output and the runtime errors are the same as the ones of the tree
+    walking `Interpreter`.
+    """
+
+    def __init__(
+        self,
+        _statements: Iterable[stmt.Stmt | None] | None = None,
+        output: OutputSink | None = None,
+    ) -> None:
+        super().__init__(_statements, output)
+        self._compiler = Compiler(
+            self._globals, self._frames, self._pool, self.output
+        )
+
+    def evaluate(self, _expr: expr.Expr) -> object:
+        return self._compiler.expression(_expr)()
+
+    def _execute(self, _stmt: stmt.Stmt) -> None:
+        self._compiler.statement(_stmt)()
+
+
+class Compiler(expr.Visitor, stmt.Visitor):
+    """Compiles resolved nodes into closures.
+
+    Every closure is specialized for its operator and for where its
+    variable lives, and arithmetic on a number literal skips evaluating it.
+    """
+
+    def __init__(
+        self,
+        _globals: Environment,
+        frames: list[list[object]],
+        pool: dict[int, list[list[object]]],
+        output: OutputSink,
+    ) -> None:
+        self._globals = _globals
+        self._frames = frames
+        self._pool = pool
+        self._output = output
+        self._expressions = expr.dispatch_table(self)
+        self._statements = stmt.dispatch_table(self)
+
+    def expression(self, _expr: expr.Expr) -> Thunk:
+        """Compile an expression into a closure that returns its value."""
+        thunk: Thunk = self._expressions[type(_expr)](_expr)
+        return thunk
+
+    def statement(self, _stmt: stmt.Stmt) -> Thunk:
+        """Compile a statement into a closure that runs it."""
+        thunk: Thunk = self._statements[type(_stmt)](_stmt)
+        return thunk
+
+    def visit_assign_expr(self, _expr: "expr.AssignExpr") -> Thunk:
+        value = self.expression(_expr.value)
+        name = _expr.name
+        if _expr.slot < 0:
+            assign = self._globals.assign
+
+            def assign_global() -> object:
+                result = value()
+                assign(name, result)
+                return result
+
+            return assign_global
+
+        frames, index, slot = self._frames, -1 - _expr.depth, _expr.slot
+
+        def assign_local() -> object:
+            result = value()
+            frames[index][slot] = result
+            return result
+
+        return assign_local
+
+    def visit_binary_expr(self, _expr: "expr.BinaryExpr") -> Thunk:
+        token = _expr.operator
+        # The hottest visit: dispatch inline instead of through expression.
+        expressions = self._expressions
+        left = expressions[type(_expr.left)](_expr.left)
+        right = expressions[type(_expr.right)](_expr.right)
+        match token.type:
+            case TokenType.EQUAL_EQUAL:
+                return lambda: isequal(left(), right())
+            case TokenType.BANG_EQUAL:
+                return lambda: not isequal(left(), right())
+            case TokenType.PLUS:
+                return _plus(token, left, right)
+        return _number_binary(
+            token, NUMBER_OPERATORS[token.type], left, right, _expr
+        )
+
+    def visit_grouping_expr(self, _expr: "expr.GroupingExpr") -> Thunk:
+        return self.expression(_expr.expression)
+
+    def visit_literal_expr(self, _expr: "expr.LiteralExpr") -> Thunk:
+        value = _expr.value
+        return lambda: value
+
+    def visit_unary_expr(self, _expr: "expr.UnaryExpr") -> Thunk:
+        token = _expr.operator
+        right = self.expression(_expr.right)
+        if token.type == TokenType.BANG:
+            return lambda: not istruthy(right())
+
+        def negate() -> object:
+            value = right()
+            if type(value) is float:  # pylint: disable=unidiomatic-typecheck
+                return -value
+            raise InterpreterError(token, "Operand must be a number.")
+
+        return negate
+
+    def visit_variable_expr(self, _expr: "expr.VariableExpr") -> Thunk:
+        name = _expr.name
+        if _expr.slot < 0:
+            get = self._globals.get
+            return lambda: get(name)
+        frames, index, slot = self._frames, -1 - _expr.depth, _expr.slot
+        return lambda: frames[index][slot]
+
+    def visit_block_stmt(self, _stmt: "stmt.BlockStmt") -> Thunk:
+        body = self._sequence(_stmt.statements)
+        size = _stmt.size
+        if not size:
+            return body
+        frames = self._frames
+        pool = self._pool.setdefault(size, [])
+
+        def block() -> None:
+            frames.append(pool.pop() if pool else [None] * size)
+            try:
+                body()
+            finally:
+                pool.append(frames.pop())
+
+        return block
+
+    def visit_expression_stmt(self, _stmt: "stmt.ExpressionStmt") -> Thunk:
+        return self.expression(_stmt.expression)
+
+    def visit_print_stmt(self, _stmt: "stmt.PrintStmt") -> Thunk:
+        value = self.expression(_stmt.expression)
+        write = self._output.write
+        return lambda: write(stringify(value()))
+
+    def visit_var_stmt(self, _stmt: "stmt.VarStmt") -> Thunk:
+        initializer = (
+            self.expression(_stmt.initializer)
+            if _stmt.initializer is not None
+            else lambda: None
+        )
+        if _stmt.slot < 0:
+            define, name = self._globals.define, _stmt.name.lexeme
+            return lambda: define(name, initializer())
+        frames, slot = self._frames, _stmt.slot
+
+        def define_local() -> None:
+            frames[-1][slot] = initializer()
+
+        return define_local
+
+    def _sequence(self, statements: list[stmt.Stmt | None]) -> Thunk:
+        """Compile statements into a closure that runs them in order."""
+        body = [self.statement(s) for s in statements if s is not None]
+
+        def sequence() -> None:
+            for thunk in body:
+                thunk()
+
+        return sequence
+
+
+expr.Visitor.register(Compiler)
+stmt.Visitor.register(Compiler)
+
+
+def _plus(token: Token, left: Thunk, right: Thunk) -> Thunk:
+    def plus() -> object:
+        a = left()
+        b = right()
+        # pylint: disable=unidiomatic-typecheck
+        if type(a) is type(b) and (type(a) is float or type(a) is str):
+            return a + b
+        raise InterpreterError(
+            token, "Operands must be two numbers or two strings."
+        )
+
+    return plus
+
+
+def _number_binary(
+    token: Token,
+    operation: Callable[[float, float], Any],
+    left: Thunk,
+    right: Thunk,
+    node: expr.BinaryExpr,
+) -> Thunk:
+    """A closure for an operator on two numbers, specialized for a number
+    literal on the right."""
+    # pylint: disable=unidiomatic-typecheck
+    constant = node.right
+    if isinstance(constant, expr.LiteralExpr) and type(constant.value) is float:
+        number = constant.value
+
+        def binary_constant() -> object:
+            a = left()
+            if type(a) is float:
+                return operation(a, number)
+            raise InterpreterError(token, "Operands must be numbers.")
+
+        return binary_constant
+
+    def binary() -> object:
+        a = left()
+        b = right()
+        if type(a) is float and type(b) is float:
+            return operation(a, b)
+        raise InterpreterError(token, "Operands must be numbers.")
+
+    return binary
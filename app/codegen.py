@@ -0,0 +1,486 @@
+"""Python code generation
+
+A backend that translates resolved programs into Python functions, so the
+bytecode interpreter of CPython runs them.
+"""
+
+import ast
+import itertools
+from collections.abc import Callable, Iterable
+from typing import Any, NoReturn
+
+from gen import expr, stmt
+
+from . import parser
+from .exceptions import InterpreterError
+from .interpreter import Interpreter, stringify
+from .output import OutputSink
+from .resolver import Resolver
+from .rope import Rope
+from .tokens import Token, TokenType
+
+# The top-level statements translated into each compiled function.
+BATCH_SIZE = 64
+
+# The position of every generated node, which compile requires. Passing it
+# to the constructors is much faster than `ast.fix_missing_locations`.
+_AT: Any = {"lineno": 1, "col_offset": 0, "end_lineno": 1, "end_col_offset": 0}
+
+_NUMBER_OPERATORS: dict[TokenType, ast.operator | ast.cmpop] = {
+    TokenType.GREATER: ast.Gt(),
+    TokenType.GREATER_EQUAL: ast.GtE(),
+    TokenType.LESS: ast.Lt(),
+    TokenType.LESS_EQUAL: ast.LtE(),
+    TokenType.MINUS: ast.Sub(),
+    TokenType.SLASH: ast.Div(),
+    TokenType.STAR: ast.Mult(),
+}
+
+
+def _fail(message: str, line: int) -> NoReturn:
+    """Raise a runtime error.
+
+    The generated code knows lines rather than tokens, so the error gets a
+    token that only carries the line.
+    """
+    raise InterpreterError(Token(TokenType.EOF, "", None, line), message)
+
+
+def _undefined(name: str, line: int) -> NoReturn:
+    _fail(f"Undefined variable '{name}'.", line)
+
+
+def _assign(
+    values: dict[str, object], name: str, value: object, line: int
+) -> object:
+    if name not in values:
+        _undefined(name, line)
+    values[name] = value
+    return value
+
+
+# The names the generated code uses, besides the builtins.
+_HELPERS: dict[str, Any] = {
+    "_fail": _fail,
+    "_undefined": _undefined,
+    "_assign": _assign,
+    "_stringify": stringify,
+}
+
+
+class Translator(expr.Visitor, stmt.Visitor):
+    """Translates resolved nodes into Python syntax trees.
+
+    The generated function takes the dictionary of globals, `G`. Blocks
+    cannot be re-entered, so local variables become Python locals named
+    after their absolute slot, as in the `vm`. Operands that may have side
+    effects are bound to temporaries, `_<n>`, so both are evaluated before
+    their types are checked, like the tree walking `Interpreter` does.
+    """
+
+    def __init__(self) -> None:
+        # The first slot of the frames being translated, innermost last.
+        self._bases: list[int] = []
+        self._top = 0
+        self._temporaries = itertools.count()
+        self._expressions = expr.dispatch_table(self)
+        self._statements = stmt.dispatch_table(self)
+
+    def function(
+        self, statements: Iterable[stmt.Stmt], name: str = "run"
+    ) -> ast.Module:
+        """Translate statements into a module defining a function."""
+        body: list[ast.stmt] = []
+        for statement in statements:
+            # Temporaries never outlive a statement: fewer locals keep the
+            # Python compiler fast.
+            self._temporaries = itertools.count()
+            body += self.statement(statement)
+        return _module(name, body or [ast.Pass(**_AT)])
+
+    def expression_function(
+        self, _expr: expr.Expr, name: str = "run"
+    ) -> ast.Module:
+        """Translate an expression into a function that returns it."""
+        self._temporaries = itertools.count()
+        return _module(name, [ast.Return(self.expression(_expr), **_AT)])
+
+    def expression(self, _expr: expr.Expr) -> ast.expr:
+        """Translate an expression."""
+        node: ast.expr = self._expressions[type(_expr)](_expr)
+        return node
+
+    def statement(self, _stmt: stmt.Stmt) -> list[ast.stmt]:
+        """Translate a statement."""
+        nodes: list[ast.stmt] = self._statements[type(_stmt)](_stmt)
+        return nodes
+
+    def visit_assign_expr(self, _expr: "expr.AssignExpr") -> ast.expr:
+        value = self.expression(_expr.value)
+        if _expr.slot < 0:
+            return _call(
+                "_assign",
+                _load("G"),
+                ast.Constant(_expr.name.lexeme, **_AT),
+                value,
+                ast.Constant(_expr.name.line, **_AT),
+            )
+        return ast.NamedExpr(_store(self._local(_expr)), value, **_AT)
+
+    def visit_binary_expr(self, _expr: "expr.BinaryExpr") -> ast.expr:
+        left = self.expression(_expr.left)
+        right = self.expression(_expr.right)
+        operator = _expr.operator.type
+        if operator == TokenType.EQUAL_EQUAL:
+            return ast.Compare(left, [ast.Eq()], [right], **_AT)
+        if operator == TokenType.BANG_EQUAL:
+            return ast.Compare(left, [ast.NotEq()], [right], **_AT)
+
+        # Both operands are evaluated before any check. A variable on the
+        # left is read first too if the right operand assigns it.
+        evaluated: list[ast.expr] = []
+        if not isinstance(left, ast.Constant) and not (
+            isinstance(left, ast.Name) and not _assigns(right, left.id)
+        ):
+            left = self._bind(left, evaluated)
+        if not _is_plain(right):
+            right = self._bind(right, evaluated)
+        checks = _evaluate_first(evaluated)
+        if operator == TokenType.PLUS:
+            checks += _addable(left, right)
+            message = "Operands must be two numbers or two strings."
+            result: ast.expr = ast.BinOp(left, ast.Add(), right, **_AT)
+        else:
+            checks += [
+                _is_number(operand)
+                for operand in (left, right)
+                if not _is_number_constant(operand)
+            ]
+            message = "Operands must be numbers."
+            operation = _NUMBER_OPERATORS[operator]
+            if isinstance(operation, ast.operator):
+                result = ast.BinOp(left, operation, right, **_AT)
+            else:
+                result = ast.Compare(left, [operation], [right], **_AT)
+        if not checks:
+            return result
+        return ast.IfExp(
+            _conjunction(checks),
+            result,
+            _call(
+                "_fail",
+                ast.Constant(message, **_AT),
+                ast.Constant(_expr.operator.line, **_AT),
+            ),
+            **_AT,
+        )
+
+    def visit_grouping_expr(self, _expr: "expr.GroupingExpr") -> ast.expr:
+        return self.expression(_expr.expression)
+
+    def visit_literal_expr(self, _expr: "expr.LiteralExpr") -> ast.expr:
+        value: Any = _expr.value
+        return ast.Constant(value, **_AT)
+
+    def visit_unary_expr(self, _expr: "expr.UnaryExpr") -> ast.expr:
+        evaluated: list[ast.expr] = []
+        right = self.expression(_expr.right)
+        if not _is_plain(right):
+            right = self._bind(right, evaluated)
+        if _expr.operator.type == TokenType.BANG:
+            if isinstance(right, ast.Constant):
+                # Comparing a literal with `is` is a SyntaxWarning.
+                value = right.value
+                return ast.Constant(value is None or value is False, **_AT)
+            first = evaluated[0] if evaluated else right
+            return ast.BoolOp(
+                ast.Or(),
+                [
+                    ast.Compare(
+                        first, [ast.Is()], [ast.Constant(None, **_AT)], **_AT
+                    ),
+                    ast.Compare(
+                        right, [ast.Is()], [ast.Constant(False, **_AT)], **_AT
+                    ),
+                ],
+                **_AT,
+            )
+        return ast.IfExp(
+            _conjunction(_evaluate_first(evaluated) + [_is_number(right)]),
+            ast.UnaryOp(ast.USub(), right, **_AT),
+            _call(
+                "_fail",
+                ast.Constant("Operand must be a number.", **_AT),
+                ast.Constant(_expr.operator.line, **_AT),
+            ),
+            **_AT,
+        )
+
+    def visit_variable_expr(self, _expr: "expr.VariableExpr") -> ast.expr:
+        if _expr.slot >= 0:
+            return _load(self._local(_expr))
+        name = ast.Constant(_expr.name.lexeme, **_AT)
+        return ast.IfExp(
+            ast.Compare(name, [ast.In()], [_load("G")], **_AT),
+            ast.Subscript(_load("G"), name, ast.Load(), **_AT),
+            _call("_undefined", name, ast.Constant(_expr.name.line, **_AT)),
+            **_AT,
+        )
+
+    def visit_block_stmt(self, _stmt: "stmt.BlockStmt") -> list[ast.stmt]:
+        if _stmt.size:
+            self._bases.append(self._top)
+            self._top += _stmt.size
+        body: list[ast.stmt] = []
+        for statement in _stmt.statements:
+            if statement is not None:
+                body += self.statement(statement)
+        if _stmt.size:
+            self._top = self._bases.pop()
+        return body
+
+    def visit_expression_stmt(
+        self, _stmt: "stmt.ExpressionStmt"
+    ) -> list[ast.stmt]:
+        assignment = _stmt.expression
+        if isinstance(assignment, expr.AssignExpr) and assignment.slot >= 0:
+            target = _store(self._local(assignment))
+            return [
+                ast.Assign([target], self.expression(assignment.value), **_AT)
+            ]
+        if isinstance(assignment, expr.AssignExpr):
+            # A statement needs no value, so the assignment is inlined.
+            name = ast.Constant(assignment.name.lexeme, **_AT)
+            temporary = f"_{next(self._temporaries)}"
+            return [
+                ast.Assign(
+                    [_store(temporary)],
+                    self.expression(assignment.value),
+                    **_AT,
+                ),
+                ast.If(
+                    ast.Compare(name, [ast.NotIn()], [_load("G")], **_AT),
+                    [
+                        ast.Expr(
+                            _call(
+                                "_undefined",
+                                name,
+                                ast.Constant(assignment.name.line, **_AT),
+                            ),
+                            **_AT,
+                        )
+                    ],
+                    [],
+                    **_AT,
+                ),
+                ast.Assign(
+                    [ast.Subscript(_load("G"), name, ast.Store(), **_AT)],
+                    _load(temporary),
+                    **_AT,
+                ),
+            ]
+        return [ast.Expr(self.expression(_stmt.expression), **_AT)]
+
+    def visit_print_stmt(self, _stmt: "stmt.PrintStmt") -> list[ast.stmt]:
+        value = _call("_stringify", self.expression(_stmt.expression))
+        return [ast.Expr(_call("print", value), **_AT)]
+
+    def visit_var_stmt(self, _stmt: "stmt.VarStmt") -> list[ast.stmt]:
+        value: ast.expr = ast.Constant(None, **_AT)
+        if _stmt.initializer is not None:
+            value = self.expression(_stmt.initializer)
+        if _stmt.slot < 0:
+            name = ast.Constant(_stmt.name.lexeme, **_AT)
+            target: ast.expr = ast.Subscript(
+                _load("G"), name, ast.Store(), **_AT
+            )
+        else:
+            target = _store(
+                f"{_stmt.name.lexeme}_{self._bases[-1] + _stmt.slot}"
+            )
+        return [ast.Assign([target], value, **_AT)]
+
+    def _local(self, _expr: expr.AssignExpr | expr.VariableExpr) -> str:
+        """The Python name of a local variable."""
+        slot = self._bases[-1 - _expr.depth] + _expr.slot
+        return f"{_expr.name.lexeme}_{slot}"
+
+    def _bind(self, node: ast.expr, evaluated: list[ast.expr]) -> ast.expr:
+        """Bind an operand to a temporary.
+
+        The binding is added to `evaluated`; return the expression that
+        reads the value.
+        """
+        temporary = f"_{next(self._temporaries)}"
+        evaluated.append(ast.NamedExpr(_store(temporary), node, **_AT))
+        return _load(temporary)
+
+
+expr.Visitor.register(Translator)
+stmt.Visitor.register(Translator)
+
+
+def _module(name: str, body: list[ast.stmt]) -> ast.Module:
+    arguments = ast.arguments(
+        posonlyargs=[],
+        args=[ast.arg("G", **_AT)],
+        kwonlyargs=[],
+        kw_defaults=[],
+        defaults=[],
+    )
+    function = ast.FunctionDef(
+        name,
+        arguments,
+        body,
+        decorator_list=[],
+        returns=None,
+        type_params=[],
+        **_AT,
+    )
+    return ast.Module([function], type_ignores=[])
+
+
+def _load(name: str) -> ast.Name:
+    return ast.Name(name, ast.Load(), **_AT)
+
+
+def _store(name: str) -> ast.Name:
+    return ast.Name(name, ast.Store(), **_AT)
+
+
+def _call(function: str, *arguments: ast.expr) -> ast.Call:
+    return ast.Call(_load(function), list(arguments), [], **_AT)
+
+
+def _type(node: ast.expr) -> ast.expr:
+    return _call("type", node)
+
+
+def _is_number(node: ast.expr) -> ast.expr:
+    return ast.Compare(_type(node), [ast.Is()], [_load("float")], **_AT)
+
+
+def _is_number_constant(node: ast.expr) -> bool:
+    return isinstance(node, ast.Constant) and isinstance(node.value, float)
+
+
+def _addable(left: ast.expr, right: ast.expr) -> list[ast.expr]:
+    """The checks that two operands are two numbers or two strings.
+
+    Constants need no check when their type is already right.
+    """
+    known = [
+        type(operand.value) if isinstance(operand, ast.Constant) else None
+        for operand in (left, right)
+    ]
+    if known[0] is known[1] and known[0] in (float, str):
+        return []
+    for operand, other in ((left, known[1]), (right, known[0])):
+        if other in (float, str) and not isinstance(operand, ast.Constant):
+            assert other is not None
+            return [
+                ast.Compare(
+                    _type(operand), [ast.Is()], [_load(other.__name__)], **_AT
+                )
+            ]
+    return [
+        ast.Compare(_type(left), [ast.Is()], [_type(right)], **_AT),
+        ast.Compare(
+            _type(left),
+            [ast.In()],
+            [ast.Tuple([_load("float"), _load("str")], ast.Load(), **_AT)],
+            **_AT,
+        ),
+    ]
+
+
+def _assigns(node: ast.expr, name: str) -> bool:
+    """Check if evaluating a node assigns a name."""
+    return any(
+        isinstance(child, ast.NamedExpr) and child.target.id == name
+        for child in ast.walk(node)
+    )
+
+
+def _is_plain(node: ast.expr) -> bool:
+    """Check if reading a node has no effects and cannot fail."""
+    return isinstance(node, (ast.Constant, ast.Name))
+
+
+def _evaluate_first(evaluated: list[ast.expr]) -> list[ast.expr]:
+    """The checks that evaluate bindings first; a tuple is always true."""
+    return [ast.Tuple(evaluated, ast.Load(), **_AT)] if evaluated else []
+
+
+def _conjunction(checks: list[ast.expr]) -> ast.expr:
+    return (
+        checks[0] if len(checks) == 1 else ast.BoolOp(ast.And(), checks, **_AT)
+    )
+
+
+def compile_function(
+    module: ast.Module, name: str = "run", output: OutputSink | None = None
+) -> Callable[..., Any]:
+    """Compile a translated module and return its function, which prints
+    to an output sink rather than to standard output if one is given."""
+    namespace = dict(_HELPERS)
+    if output is not None:
+        namespace["print"] = output.write
+    code = compile(module, "<lox>", "exec")
+    exec(code, namespace)  # pylint: disable=exec-used
+    function: Callable[..., Any] = namespace[name]
+    return function
+
+
+class PythonInterpreter(Interpreter):
+    """Interpreter that runs statements translated to Python.
+
+    The output and the runtime errors are the same as the ones of the tree
+    walking `Interpreter`. Statements too deeply nested for the Python
+    compiler are walked instead.
+    """
+
+    def interpret(self) -> None:
+        """Translate and run the top-level statements in batches."""
+        if self._statements is None:
+            return
+        resolved = Resolver().resolved(self._statements)
+        statements = (s for s in resolved if s is not None)
+        # pylint: disable-next=protected-access
+        values = self._globals._values
+        try:
+            for batch in itertools.batched(statements, BATCH_SIZE):
+                try:
+                    module = Translator().function(batch)
+                    function = compile_function(module, "run", self.output)
+                except RecursionError:
+                    for statement in batch:
+                        self._execute(statement)
+                    # The generated code only knows strings as `str`.
+                    for name, value in values.items():
+                        if isinstance(value, Rope):
+                            values[name] = str(value)
+                    continue
+                function(values)
+        except InterpreterError as e:
+            self.runtime_error(e)
+        finally:
+            self.output.flush()
+
+    def evaluate(self, _expr: expr.Expr) -> object:
+        try:
+            module = Translator().expression_function(_expr)
+            function = compile_function(module)
+        except RecursionError:
+            return super().evaluate(_expr)
+        # pylint: disable-next=protected-access
+        return function(self._globals._values)
+
+
+def emit_python_cmd(content: str, scanner_engine: str = "default") -> None:
+    """Emit Python command."""
+    statements = parser.parse_or_exit(content, scanner_engine)
+    with parser.deep_recursion():
+        resolved = Resolver().resolved(statements)
+        module = Translator().function(s for s in resolved if s is not None)
+        print(ast.unparse(module))
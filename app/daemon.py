@@ -0,0 +1,158 @@
+"""Interpreter daemon
+
+`serve` keeps an interpreter running on a Unix socket for `app.client`,
+so a command run through it pays neither for starting Python and
+importing the interpreter nor, as the daemon keeps the programs it parses
+in memory, for parsing a program again. Requests are handled one at a
+time, in the working directory of their client, with their standard
+output and error sent back to it as they are written; every command
+builds its own interpreter, so runs share no state.
+"""
+
+import contextlib
+import io
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import traceback
+from collections.abc import Callable, Iterator
+from types import FrameType
+from typing import Any, NoReturn
+
+from .client import receive, send
+
+# Runs a command line, given its arguments and the source of its file, if
+# it was sent instead of a path.
+Executor = Callable[[list[str], str | None], None]
+
+
+class _Stream(io.TextIOBase):
+    """A text stream whose writes are sent to the client."""
+
+    def __init__(self, connection: io.BufferedIOBase, name: str) -> None:
+        super().__init__()
+        self._connection = connection
+        self._name = name
+        self._broken = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if text and not self._broken:
+            try:
+                send(self._connection, {self._name: text})
+            except OSError:
+                # The client left: finish the command anyway.
+                self._broken = True
+        return len(text)
+
+
+class Daemon(socketserver.UnixStreamServer):
+    """Runs the commands sent to a Unix socket, one at a time."""
+
+    def __init__(self, path: str, execute: Executor) -> None:
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o600)
+        self.execute = execute
+
+    def run(
+        self, message: dict[str, Any], connection: io.BufferedIOBase
+    ) -> int:
+        """Run the command of a request and return its exit code."""
+        directory = os.getcwd()
+        code = 0
+        with (
+            contextlib.redirect_stdout(_Stream(connection, "stdout")),
+            contextlib.redirect_stderr(_Stream(connection, "stderr")),
+        ):
+            try:
+                os.chdir(message.get("cwd", directory))
+                self.execute(list(message["argv"]), message.get("source"))
+            except SystemExit as e:
+                code = _exit_code(e)
+            except Exception:  # pylint: disable=broad-exception-caught
+                # Like an uncaught exception ending the program.
+                traceback.print_exc()
+                code = 1
+            finally:
+                os.chdir(directory)
+        return code
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Handles the request of one connection."""
+
+    server: Daemon
+
+    def handle(self) -> None:
+        message = next(receive(self.rfile), None)
+        if message is None:
+            return
+        code = self.server.run(message, self.wfile)
+        with contextlib.suppress(OSError):
+            send(self.wfile, {"exit": code})
+
+
+def _exit_code(exit_: SystemExit) -> int:
+    """The exit code of a `SystemExit`, printing its message if any."""
+    if exit_.code is None or isinstance(exit_.code, int):
+        return exit_.code or 0
+    print(exit_.code, file=sys.stderr)
+    return 1
+
+
+def _interrupt(_signum: int, _frame: FrameType | None) -> NoReturn:
+    raise KeyboardInterrupt
+
+
+@contextlib.contextmanager
+def _interrupted_by_sigterm() -> Iterator[None]:
+    """Make SIGTERM stop the daemon like Ctrl-C does, when it runs in the
+    main thread, where signals are handled."""
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+    previous = signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+
+def serve_cmd(
+    path: str, execute: Executor, requests: int | None = None
+) -> None:
+    """Serve command: run the commands sent to the socket at `path`, or
+    only the first `requests` ones."""
+    try:
+        mode: int | None = os.lstat(path).st_mode
+    except FileNotFoundError:
+        mode = None
+    if mode is not None:
+        if not stat.S_ISSOCK(mode):
+            print(f"{path} is not a socket", file=sys.stderr)
+            sys.exit(1)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(path)
+            except OSError:
+                # Left behind by a daemon that did not stop cleanly.
+                os.unlink(path)
+            else:
+                print(f"A daemon already serves {path}", file=sys.stderr)
+                sys.exit(1)
+    with Daemon(path, execute) as daemon, _interrupted_by_sigterm():
+        try:
+            if requests is None:
+                daemon.serve_forever()
+            for _ in range(requests or 0):
+                daemon.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
@@ -0,0 +1,395 @@
+"""Incremental scanning and parsing.
+
+A `Document` keeps the tokens and the top-level declarations of a source
+and updates them after an edit, re-scanning only from the nearest safe
+restart point until the tokens resynchronize and re-parsing only the
+declarations the changed tokens belong to.
+"""
+
+import os
+import sys
+import time
+from bisect import bisect_left
+from typing import NamedTuple
+
+from gen import stmt
+
+from . import parser, scanner
+from .tokens import Token, TokenType
+
+
+class EditStats(NamedTuple):
+    """How much work an edit needed."""
+
+    rescanned_tokens: int
+    reparsed_declarations: int
+
+
+class LexicalError:
+    """A lexical error and the offset where its lexeme starts."""
+
+    __slots__ = ("offset", "line", "message")
+
+    def __init__(self, offset: int, line: int, message: str) -> None:
+        self.offset = offset
+        self.line = line
+        self.message = message
+
+    def __str__(self) -> str:
+        return f"[line {self.line}] Error: {self.message}"
+
+
+class _PositionedScanner(scanner.Scanner):
+    """Scanner that reports where every token and error starts."""
+
+    def __init__(
+        self,
+        source: str,
+        symbols: scanner.SymbolTable,
+        start: int = 0,
+        line: int = 1,
+    ) -> None:
+        super().__init__(source)
+        self.symbols = symbols
+        self._current = start
+        self._line = line
+        self.errors: list[LexicalError] = []
+
+    def _lexical_error(self, msg: str) -> None:
+        self.errors.append(LexicalError(self._start, self._line, msg))
+
+
+class _DeclarationParser(parser.Parser):
+    """Parser that parses one top-level declaration at a given token."""
+
+    def __init__(self, tokens: list[Token]) -> None:
+        super().__init__(tokens)
+        self.errors: list[tuple[Token, str]] = []
+
+    def declaration_at(
+        self, index: int
+    ) -> tuple[stmt.Stmt | None, int, list[tuple[Token, str]]]:
+        """Parse the declaration starting at index.
+
+        Return the declaration, the index where the next one starts and
+        the errors found.
+        """
+        self._current = index
+        self.errors = []
+        declaration = self._declaration()
+        return declaration, self._current, self.errors
+
+    def at_end(self, index: int) -> bool:
+        """Check if index is the end of the tokens."""
+        self._current = index
+        return self._is_at_end()
+
+    def _report_error(self, token: Token, message: str) -> None:
+        super()._report_error(token, message)
+        self.errors.append((token, message))
+
+
+# pylint: disable-next=too-many-instance-attributes
+class Document:
+    """The tokens and top-level declarations of a source being edited."""
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.symbols = scanner.SymbolTable()
+        self.tokens: list[Token] = []
+        self._starts: list[int] = []
+        self._lexical: list[LexicalError] = []
+        self.statements: list[stmt.Stmt | None] = []
+        self._declaration_starts: list[int] = []
+        self._declaration_errors: list[list[tuple[Token, str]]] = []
+        self._scan()
+        self._parse(0)
+
+    @property
+    def lexical_errors(self) -> list[str]:
+        """The lexical errors, formatted like `Scanner.lexical_errors`."""
+        return [str(error) for error in self._lexical]
+
+    @property
+    def parse_errors(self) -> list[str]:
+        """The parse errors, formatted like `Parser.parse_errors`."""
+        errors = []
+        for declaration_errors in self._declaration_errors:
+            for token, message in declaration_errors:
+                if token.type == TokenType.EOF:
+                    errors.append(
+                        f"[line {token.line}] Error at end: {message}"
+                    )
+                else:
+                    errors.append(
+                        f"[line {token.line}] Error at '{token.lexeme}': "
+                        f"{message}"
+                    )
+        return errors
+
+    def edit(self, offset: int, removed: int, inserted: str) -> EditStats:
+        """Replace `removed` characters at `offset` with `inserted`."""
+        old_end = offset + removed
+        if offset < 0 or old_end > len(self.source):
+            raise ValueError("edit out of range of the source")
+
+        delta = len(inserted) - removed
+        line_delta = inserted.count("\n") - self.source.count(
+            "\n", offset, old_end
+        )
+        self.source = self.source[:offset] + inserted + self.source[old_end:]
+
+        first, restart, line = self._restart_point(offset)
+        sc = _PositionedScanner(self.source, self.symbols, restart, line)
+        synchronized, new_tokens, new_starts = self._resynchronize(
+            sc, old_end, delta
+        )
+        self._shift_tail(restart, synchronized, sc.errors, delta, line_delta)
+        self.tokens[first:synchronized] = new_tokens
+        self._starts[first:synchronized] = new_starts
+
+        shift = len(new_tokens) - (synchronized - first)
+        return EditStats(
+            len(new_tokens),
+            self._reparse(first, first + len(new_tokens), shift),
+        )
+
+    def _restart_point(self, offset: int) -> tuple[int, int, int]:
+        """The index, offset and line of the token to rescan from after an
+        edit at `offset`.
+
+        It is the last token that cannot have looked ahead (up to two
+        characters) into the edit: tokens never start inside a string or a
+        comment.
+        """
+        first = bisect_left(self._starts, offset) - 1
+        while (
+            first >= 0
+            and self._starts[first] + len(self.tokens[first].lexeme) + 2
+            > offset
+        ):
+            first -= 1
+        if first < 0:
+            return 0, 0, 1
+        line = self.tokens[first].line
+        line -= self.tokens[first].lexeme.count("\n")
+        return first, self._starts[first], line
+
+    def _resynchronize(
+        self, sc: _PositionedScanner, old_end: int, delta: int
+    ) -> tuple[int, list[Token], list[int]]:
+        """Scan until a token matches an old one after the edit.
+
+        Return the index of that old token and the tokens scanned before
+        it, with their start offsets.
+        """
+        new_tokens: list[Token] = []
+        new_starts: list[int] = []
+        old = bisect_left(self._starts, old_end)
+        # The end of file always resynchronizes.
+        synchronized = len(self.tokens) - 1
+        for start, token in sc.positioned_tokens():
+            while old < len(self._starts) and self._starts[old] + delta < start:
+                old += 1
+            if old < len(self._starts) and self._starts[old] + delta == start:
+                previous = self.tokens[old]
+                if (
+                    previous.type == token.type
+                    and previous.lexeme == token.lexeme
+                ):
+                    synchronized = old
+                    break
+            new_tokens.append(token)
+            new_starts.append(start)
+        return synchronized, new_tokens, new_starts
+
+    def _shift_tail(
+        self,
+        restart: int,
+        synchronized: int,
+        errors: list[LexicalError],
+        delta: int,
+        line_delta: int,
+    ) -> None:
+        """Move the tokens from `synchronized` on after the edit, and swap
+        the errors found from `restart` to there for the new ones."""
+        resume = self._starts[synchronized]
+        for token in self.tokens[synchronized:]:
+            token.line += line_delta
+        for index in range(synchronized, len(self._starts)):
+            self._starts[index] += delta
+        kept_before = [e for e in self._lexical if e.offset < restart]
+        kept_after = [e for e in self._lexical if e.offset >= resume]
+        for error in kept_after:
+            error.offset += delta
+            error.line += line_delta
+        self._lexical = kept_before + errors + kept_after
+
+    def _scan(self) -> None:
+        """Scan the whole source."""
+        sc = scanner.FastScanner(self.source)
+        sc.symbols = self.symbols
+        buffer = sc.scan_buffer()
+        if sc.lexical_errors:
+            positioned = _PositionedScanner(self.source, self.symbols)
+            pairs = list(positioned.positioned_tokens())
+            self._starts = [start for start, _ in pairs]
+            self.tokens = [token for _, token in pairs]
+            self._lexical = positioned.errors
+        else:
+            self._starts = [buffer.start(i) for i in range(len(buffer))]
+            self.tokens = [self._intern(token) for token in buffer]
+            self._lexical = []
+
+    def _intern(self, token: Token) -> Token:
+        if token.type == TokenType.IDENTIFIER:
+            token.lexeme = self.symbols.intern(token.lexeme)
+        return token
+
+    def _parse(self, declaration: int) -> None:
+        """Parse every declaration from the given one to the end."""
+        del self.statements[declaration:]
+        del self._declaration_errors[declaration:]
+        index = (
+            self._declaration_starts[declaration]
+            if declaration < len(self._declaration_starts)
+            else 0
+        )
+        del self._declaration_starts[declaration:]
+        _parser = _DeclarationParser(self.tokens)
+        while not _parser.at_end(index):
+            self._declaration_starts.append(index)
+            statement, index, errors = _parser.declaration_at(index)
+            self.statements.append(statement)
+            self._declaration_errors.append(errors)
+
+    def _reparse(self, first: int, changed_end: int, shift: int) -> int:
+        """Re-parse the declarations that read tokens in [first, changed_end).
+
+        Return the number of declarations parsed.
+        """
+        starts = self._declaration_starts
+        # A declaration peeks at the first token of the next one, so the
+        # one ending right at `first` is affected too.
+        declaration = max(bisect_left(starts, first) - 1, 0)
+        if declaration >= len(starts):
+            self._parse(declaration)
+            return len(self.statements) - declaration
+
+        synchronized, new_statements, new_starts, new_errors = (
+            self._reparse_from(starts[declaration], changed_end, shift)
+        )
+        self.statements[declaration:synchronized] = new_statements
+        self._declaration_errors[declaration:synchronized] = new_errors
+        starts[declaration:synchronized] = new_starts
+        for i in range(declaration + len(new_starts), len(starts)):
+            starts[i] += shift
+        return len(new_statements)
+
+    def _reparse_from(self, index: int, changed_end: int, shift: int) -> tuple[
+        int,
+        list[stmt.Stmt | None],
+        list[int],
+        list[list[tuple[Token, str]]],
+    ]:
+        """Parse declarations from the token at `index` until one starts
+        where an old one did, after the changed tokens.
+
+        Return the index of that old declaration and the declarations
+        parsed before it, with their starts and errors.
+        """
+        starts = self._declaration_starts
+        resume = bisect_left(starts, changed_end - shift)
+        new_statements: list[stmt.Stmt | None] = []
+        new_starts: list[int] = []
+        new_errors: list[list[tuple[Token, str]]] = []
+        _parser = _DeclarationParser(self.tokens)
+        synchronized = len(starts)
+        while not _parser.at_end(index):
+            if index >= changed_end:
+                old = bisect_left(starts, index - shift, resume)
+                if old < len(starts) and starts[old] == index - shift:
+                    synchronized = old
+                    break
+            new_starts.append(index)
+            statement, index, errors = _parser.declaration_at(index)
+            new_statements.append(statement)
+            new_errors.append(errors)
+        return synchronized, new_statements, new_starts, new_errors
+
+
+def diff(old: str, new: str) -> tuple[int, int, str]:
+    """Describe the change from old to new as a single edit.
+
+    Return the offset, the number of removed characters and the inserted
+    text.
+    """
+    limit = min(len(old), len(new))
+    prefix = _common_length(old, new, limit, 1)
+    suffix = _common_length(old, new, limit - prefix, -1)
+    return prefix, len(old) - prefix - suffix, new[prefix : len(new) - suffix]
+
+
+def _common_length(old: str, new: str, limit: int, direction: int) -> int:
+    """Length of the common prefix (1) or suffix (-1), at most limit."""
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if direction == 1:
+            same = old[:middle] == new[:middle]
+        else:
+            same = old[len(old) - middle :] == new[len(new) - middle :]
+        if same:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def watch_cmd(
+    filename: str, interval: float = 0.5, iterations: int | None = None
+) -> None:
+    """Re-tokenize and re-parse a file every time it changes."""
+    document = Document(_read(filename))
+    _report(filename, document, None)
+    mtime = os.stat(filename).st_mtime_ns
+    try:
+        while iterations is None or iterations > 0:
+            if iterations is not None:
+                iterations -= 1
+            time.sleep(interval)
+            try:
+                current = os.stat(filename).st_mtime_ns
+                if current == mtime:
+                    continue
+                source = _read(filename)
+            except FileNotFoundError:
+                # Editors that save atomically replace the file: look
+                # again on the next interval.
+                continue
+            mtime = current
+            stats = document.edit(*diff(document.source, source))
+            _report(filename, document, stats)
+    except KeyboardInterrupt:
+        pass
+
+
+def _read(filename: str) -> str:
+    with open(filename, encoding="utf-8") as file:
+        return file.read()
+
+
+def _report(filename: str, document: Document, stats: EditStats | None) -> None:
+    """Print the state of the document after a change."""
+    for error in document.lexical_errors + document.parse_errors:
+        print(error, file=sys.stderr)
+    summary = (
+        f"{filename}: {len(document.tokens)} tokens, "
+        f"{len(document.statements)} declarations"
+    )
+    if stats is not None:
+        summary += (
+            f" (rescanned {stats.rescanned_tokens} tokens, "
+            f"reparsed {stats.reparsed_declarations} declarations)"
+        )
+    print(summary, flush=True)
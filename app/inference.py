@@ -0,0 +1,220 @@
+"""Type inference
+
+A static pass that proves which operators always get operands of the types
+they need, so that they run without checking them.
+"""
+
+import sys
+from collections.abc import Iterable, Iterator
+from enum import IntFlag
+from typing import Any, NamedTuple
+
+from gen import expr, stmt
+
+from . import parser
+from .resolver import ScopedPass
+from .tokens import Token, TokenType
+
+
+class Type(IntFlag):
+    """The types a value may have. An empty set means it is never made."""
+
+    NIL = 1
+    BOOLEAN = 2
+    NUMBER = 4
+    STRING = 8
+    ANY = NIL | BOOLEAN | NUMBER | STRING
+
+
+# Plain ints, as the operators of flags are several times slower.
+_NIL, _BOOLEAN, _NUMBER, _STRING = map(int, Type)
+_NEVER = 0
+
+
+class Site(NamedTuple):
+    """An operator that checks the types of its operands."""
+
+    operator: Token
+    operands: tuple[Type, ...]
+    proven: bool
+
+
+# The operators that only take numbers, and the type of their result.
+_NUMBER_OPERATORS = {
+    TokenType.GREATER: _BOOLEAN,
+    TokenType.GREATER_EQUAL: _BOOLEAN,
+    TokenType.LESS: _BOOLEAN,
+    TokenType.LESS_EQUAL: _BOOLEAN,
+    TokenType.MINUS: _NUMBER,
+    TokenType.SLASH: _NUMBER,
+    TokenType.STAR: _NUMBER,
+}
+
+
+class TypeInference(ScopedPass):
+    """Marks the binary and unary nodes whose operands are proven.
+
+    Programs have no loops and no functions, so they run in the order they
+    are written, and the value of a variable is the last one written to
+    it. The pass follows that order, tracking the type of every variable,
+    and sets `proven` on an operator when its operands can only have the
+    types it accepts; every other operator gets it cleared. The sites that
+    check types are kept in `sites` when `explain` is set.
+    """
+
+    def __init__(self, explain: bool = False) -> None:
+        # The scopes map the variables of the blocks to their types, kept
+        # apart from the types of the global ones.
+        super().__init__()
+        self._globals: dict[str, int] = {}
+        self._explain = explain
+        self.sites: list[Site] = []
+
+    def inferred(
+        self, statements: Iterable[stmt.Stmt | None]
+    ) -> Iterator[stmt.Stmt | None]:
+        """Infer the types of each top-level statement as it is consumed."""
+        return self._visited(statements)
+
+    def expression(self, _expr: expr.Expr) -> Type:
+        """Infer the types of an expression and return the types of its
+        value."""
+        return Type(self._expressions[type(_expr)](_expr))
+
+    def visit_assign_expr(self, _expr: "expr.AssignExpr") -> Any:
+        value = self._expressions[type(_expr.value)](_expr.value)
+        scope = self._scope_of(_expr.name.lexeme)
+        if scope is not None:
+            scope[_expr.name.lexeme] = value
+        return value
+
+    def visit_binary_expr(self, _expr: "expr.BinaryExpr") -> Any:
+        # The hottest visit: dispatch inline instead of through expression.
+        expressions = self._expressions
+        left = expressions[type(_expr.left)](_expr.left)
+        right = expressions[type(_expr.right)](_expr.right)
+        token_type = _expr.operator.type
+        if token_type in (TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL):
+            return _BOOLEAN
+        if token_type == TokenType.PLUS:
+            # Both numbers or both strings, or an error.
+            value = left & right & (_NUMBER | _STRING)
+            proven = left == right and value in (_NUMBER, _STRING)
+        else:
+            value = _NUMBER_OPERATORS[token_type]
+            proven = left == right == _NUMBER
+        self._site(_expr, (left, right), proven)
+        return value
+
+    def visit_grouping_expr(self, _expr: "expr.GroupingExpr") -> Any:
+        return self._expressions[type(_expr.expression)](_expr.expression)
+
+    def visit_literal_expr(self, _expr: "expr.LiteralExpr") -> Any:
+        return _type_of(_expr.value)
+
+    def visit_unary_expr(self, _expr: "expr.UnaryExpr") -> Any:
+        right = self._expressions[type(_expr.right)](_expr.right)
+        if _expr.operator.type == TokenType.BANG:
+            return _BOOLEAN
+        self._site(_expr, (right,), right == _NUMBER)
+        return _NUMBER
+
+    def visit_variable_expr(self, _expr: "expr.VariableExpr") -> Any:
+        scope = self._scope_of(_expr.name.lexeme)
+        # Reading an undefined variable fails before making a value.
+        return _NEVER if scope is None else scope[_expr.name.lexeme]
+
+    def visit_block_stmt(self, _stmt: "stmt.BlockStmt") -> Any:
+        self._block(_stmt.statements)
+
+    def visit_expression_stmt(self, _stmt: "stmt.ExpressionStmt") -> Any:
+        self._expressions[type(_stmt.expression)](_stmt.expression)
+
+    def visit_print_stmt(self, _stmt: "stmt.PrintStmt") -> Any:
+        self._expressions[type(_stmt.expression)](_stmt.expression)
+
+    def visit_var_stmt(self, _stmt: "stmt.VarStmt") -> Any:
+        # The initializer still sees the variables of the enclosing scopes.
+        value = _NIL
+        initializer = _stmt.initializer
+        if initializer is not None:
+            value = self._expressions[type(initializer)](initializer)
+        scope = self._scopes[-1] if self._scopes else self._globals
+        scope[_stmt.name.lexeme] = value
+
+    def _scope_of(self, name: str) -> dict[str, int] | None:
+        """The innermost scope that declares a name, if any."""
+        for scope in reversed(self._scopes):
+            if name in scope:
+                return scope
+        return self._globals if name in self._globals else None
+
+    def _site(
+        self,
+        _expr: expr.BinaryExpr | expr.UnaryExpr,
+        operands: tuple[int, ...],
+        proven: bool,
+    ) -> None:
+        """Mark an operator that checks the types of its operands."""
+        _expr.proven = proven
+        if self._explain:
+            types = tuple(map(Type, operands))
+            self.sites.append(Site(_expr.operator, types, proven))
+
+
+expr.Visitor.register(TypeInference)
+stmt.Visitor.register(TypeInference)
+
+
+def _type_of(value: object) -> int:
+    """The type of a literal value."""
+    match value:
+        case None:
+            return _NIL
+        case bool():
+            return _BOOLEAN
+        case float():
+            return _NUMBER
+    return _STRING
+
+
+def describe(types: Type) -> str:
+    """Describe a set of types like `number|string`."""
+    if types == Type.ANY:
+        return "any"
+    if not types:
+        return "never"
+    return "|".join(str(t.name).lower() for t in types)
+
+
+def explain_types_cmd(
+    content: str, scanner_engine: str = "default", expression: bool = False
+) -> None:
+    """Explain types command.
+
+    Prints every operator that checks the types of its operands, in the
+    order they run, and whether the check is proven unnecessary.
+    """
+    statements: list[stmt.Stmt | None] = []
+    if expression:
+        _expr, parse_errors = parser.parse_expression(content, scanner_engine)
+        if _expr is not None:
+            statements.append(stmt.ExpressionStmt(_expr))
+    else:
+        statements, parse_errors = parser.parse(content, scanner_engine)
+    if parse_errors:
+        parser.print_parse_errors(parse_errors)
+        sys.exit(65)
+    inference = TypeInference(explain=True)
+    with parser.deep_recursion():
+        for _ in inference.inferred(statements):
+            pass
+    for site in inference.sites:
+        operands = ", ".join(describe(t) for t in site.operands)
+        status = "proven" if site.proven else "checked"
+        print(
+            f"[line {site.operator.line}] {site.operator.lexeme} "
+            f"({operands}) {status}"
+        )
+    proven = sum(site.proven for site in inference.sites)
+    print(f"{proven} of {len(inference.sites)} checks proven unnecessary")
@@ -3,46 +3,80 @@
 Module to evaluate.
 """
 
+import itertools
 import sys
-from typing import Any
+from collections.abc import Callable, Iterable
+from operator import ge, gt, le, lt, mul, sub, truediv
+from typing import Any, cast
 
 from gen import expr, stmt
 
-from . import parser
+from . import parser, scanner
 from .environment import Environment
 from .exceptions import InterpreterError
-from .tokens import Token, TokenType
+from .output import OutputSink
+from .resolver import Resolver
+from .rope import Rope, concat
+from .tokens import Token, TokenStream, TokenType
 
 
+# pylint: disable-next=too-many-instance-attributes
 class Interpreter(expr.Visitor, stmt.Visitor):
     """Interpreter"""
 
-    def __init__(self, _statements: list[stmt.Stmt | None] | None = None):
+    # The pass that lays out the frames of the statements before they run.
+    _resolver: type[Resolver] = Resolver
+
+    def __init__(
+        self,
+        _statements: Iterable[stmt.Stmt | None] | None = None,
+        output: OutputSink | None = None,
+    ) -> None:
         self._statements = _statements
+        self.output = OutputSink() if output is None else output
         self.runtime_errors: list[str] = []
-        self._environment = Environment()
+        self._globals = Environment()
+        # The slots of the blocks being run, innermost last.
+        self._frames: list[list[object]] = []
+        # Frames of finished blocks, by size, ready to be reused.
+        self._pool: dict[int, list[list[object]]] = {}
+        self._evaluators = expr.dispatch_table(self)
+        self._executors = stmt.dispatch_table(self)
 
     def interpret(self) -> None:
-        """Interpret a list of statements."""
+        """Interpret a list of statements.
+
+        Each top-level statement is resolved right before it runs, as the
+        frames its variables live in are laid out by the `Resolver`. The
+        output is flushed when the run ends.
+        """
         if self._statements is None:
             return
         try:
-            for statement in self._statements:
+            for statement in self._resolver().resolved(self._statements):
                 if statement is not None:
                     self._execute(statement)
         except InterpreterError as e:
             self.runtime_error(e)
+        finally:
+            self.output.flush()
 
     def visit_assign_expr(self, _expr: "expr.AssignExpr") -> object:
-        value = self.evaluate(_expr.value)
-        self._environment.assign(_expr.name, value)
+        value = self._evaluators[type(_expr.value)](_expr.value)
+        if _expr.slot < 0:
+            self._globals.assign(_expr.name, value)
+        else:
+            self._frames[-1 - _expr.depth][_expr.slot] = value
         return value
 
     def visit_binary_expr(self, _expr: "expr.BinaryExpr") -> object:
-        left = self.evaluate(_expr.left)
-        right = self.evaluate(_expr.right)
+        evaluators = self._evaluators
+        left = evaluators[type(_expr.left)](_expr.left)
+        right = evaluators[type(_expr.right)](_expr.right)
+        if _expr.proven:
+            return _PROVEN_OPERATIONS[_expr.operator.type](left, right)
 
-        value: bool | float | str | None = None
+        value: bool | float | str | Rope | None = None
         match _expr.operator.type:
             case TokenType.GREATER:
                 left, right = _check_number_operands(
@@ -76,8 +110,10 @@ class Interpreter(expr.Visitor, stmt.Visitor):
             case TokenType.PLUS:
                 if isinstance(left, float) and isinstance(right, float):
                     value = float(left) + float(right)
-                elif isinstance(left, str) and isinstance(right, str):
-                    value = str(left) + str(right)
+                elif isinstance(left, (str, Rope)) and isinstance(
+                    right, (str, Rope)
+                ):
+                    value = concat(left, right)
                 else:
                     raise InterpreterError(
                         _expr.operator,
@@ -97,13 +133,15 @@ class Interpreter(expr.Visitor, stmt.Visitor):
         return value
 
     def visit_grouping_expr(self, _expr: "expr.GroupingExpr") -> object:
-        return self.evaluate(_expr.expression)
+        return self._evaluators[type(_expr.expression)](_expr.expression)
 
     def visit_literal_expr(self, _expr: "expr.LiteralExpr") -> object:
         return _expr.value
 
     def visit_unary_expr(self, _expr: "expr.UnaryExpr") -> object:
-        right = self.evaluate(_expr.right)
+        right = self._evaluators[type(_expr.right)](_expr.right)
+        if _expr.proven:
+            return -cast(float, right)
 
         match _expr.operator.type:
             case TokenType.BANG:
@@ -116,52 +154,90 @@ class Interpreter(expr.Visitor, stmt.Visitor):
         return None
 
     def visit_variable_expr(self, _expr: "expr.VariableExpr") -> object:
-        return self._environment.get(_expr.name)
+        if _expr.slot < 0:
+            return self._globals.get(_expr.name)
+        return self._frames[-1 - _expr.depth][_expr.slot]
 
     def visit_block_stmt(self, _stmt: "stmt.BlockStmt") -> None:
-        self._execute_block(_stmt.statements, Environment(self._environment))
+        if not _stmt.size:
+            self._execute_statements(_stmt.statements)
+            return
+        # A slot is always defined before it is read, so a reused frame
+        # needs no clearing.
+        pool = self._pool.get(_stmt.size)
+        frame: list[object] = pool.pop() if pool else [None] * _stmt.size
+        self._frames.append(frame)
+        try:
+            self._execute_statements(_stmt.statements)
+        finally:
+            self._frames.pop()
+            self._pool.setdefault(_stmt.size, []).append(frame)
 
     def visit_expression_stmt(self, _stmt: "stmt.ExpressionStmt") -> None:
-        self.evaluate(_stmt.expression)
+        self._evaluators[type(_stmt.expression)](_stmt.expression)
 
     def visit_print_stmt(self, _stmt: "stmt.PrintStmt") -> None:
-        value = self.evaluate(_stmt.expression)
-        print(stringify(value))
+        value = self._evaluators[type(_stmt.expression)](_stmt.expression)
+        self.output.write(stringify(value))
 
     def visit_var_stmt(self, _stmt: "stmt.VarStmt") -> None:
         value = None
         if _stmt.initializer is not None:
-            value = self.evaluate(_stmt.initializer)
-        self._environment.define(_stmt.name.lexeme, value)
+            initializer = _stmt.initializer
+            value = self._evaluators[type(initializer)](initializer)
+        if _stmt.slot < 0:
+            self._globals.define(_stmt.name.lexeme, value)
+        else:
+            self._frames[-1][_stmt.slot] = value
+
+    def define(self, name: str, value: object) -> None:
+        """Define a global variable."""
+        self._globals.define(name, value)
 
     def evaluate(self, _expr: expr.Expr) -> object:
         """Evaluate an expression."""
-        return _expr.accept(self)
+        return self._evaluators[type(_expr)](_expr)
 
     def runtime_error(self, err: InterpreterError) -> None:
         """Create a runtime error."""
         self.runtime_errors.append(f"{err.msg}\n[line {err.token.line}]")
 
     def _execute(self, _stmt: stmt.Stmt) -> None:
-        _stmt.accept(self)
+        self._executors[type(_stmt)](_stmt)
 
-    def _execute_block(
-        self, statements: list[stmt.Stmt | None], environment: Environment
-    ) -> None:
-        previous = self._environment
-        try:
-            self._environment = environment
-            for statement in statements:
-                if statement is not None:
-                    self._execute(statement)
-        finally:
-            self._environment = previous
+    def _execute_statements(self, statements: list[stmt.Stmt | None]) -> None:
+        executors = self._executors
+        for statement in statements:
+            if statement is not None:
+                executors[type(statement)](statement)
 
 
 expr.Visitor.register(Interpreter)
 stmt.Visitor.register(Interpreter)
 
 
+def _add(left: Any, right: Any) -> object:
+    """Add two numbers or concatenate two strings."""
+    # pylint: disable-next=unidiomatic-typecheck
+    if type(left) is float:
+        return left + right
+    return concat(left, right)
+
+
+# The binary operators, for the nodes whose operands are proven to have the
+# right types.
+_PROVEN_OPERATIONS: dict[TokenType, Callable[[Any, Any], object]] = {
+    TokenType.GREATER: gt,
+    TokenType.GREATER_EQUAL: ge,
+    TokenType.LESS: lt,
+    TokenType.LESS_EQUAL: le,
+    TokenType.MINUS: sub,
+    TokenType.PLUS: _add,
+    TokenType.SLASH: truediv,
+    TokenType.STAR: mul,
+}
+
+
 def istruthy(obj: object) -> bool:
     """Check if an object is an istruthy expression."""
     if obj is None:
@@ -214,52 +290,101 @@ def stringify(obj: Any) -> str:
     return str(obj)
 
 
-def interpret_cmd(content: str) -> None:
+def interpret_cmd(
+    content: str,
+    scanner_engine: str = "default",
+    engine: type[Interpreter] = Interpreter,
+) -> None:
     """Interpret command."""
-    value, runtime_errors = _interpret(content)
+    value, runtime_errors = _interpret(content, scanner_engine, engine)
     if runtime_errors:
         _print_runtime_errors(runtime_errors)
         sys.exit(70)
     print(stringify(value))
 
 
-def _interpret(content: str) -> tuple[Any, list[str]]:
+def _interpret(
+    content: str,
+    scanner_engine: str = "default",
+    engine: type[Interpreter] = Interpreter,
+) -> tuple[Any, list[str]]:
     """Interpret the content."""
-    expression, parse_errors = parser.parse_expression(content)
+    expression, parse_errors = parser.parse_expression(content, scanner_engine)
     if parse_errors:
         sys.exit(65)
     if expression is not None:
-        interpreter = Interpreter()
+        interpreter = engine()
         value = None
         try:
-            value = interpreter.evaluate(expression)
+            with parser.deep_recursion():
+                value = interpreter.evaluate(expression)
         except InterpreterError as e:
             interpreter.runtime_error(e)
         return value, interpreter.runtime_errors
     return None, []
 
 
-def run_cmd(content: str) -> None:
+def run_cmd(
+    content: str,
+    scanner_engine: str = "default",
+    stream: bool = False,
+    use_cache: bool = True,
+    engine: type[Interpreter] = Interpreter,
+) -> None:
     """Run command."""
-    runtime_errors = _run(content)
+    if stream:
+        runtime_errors = _run_stream(content, scanner_engine, engine)
+    else:
+        runtime_errors = _run(content, scanner_engine, use_cache, engine)
     if runtime_errors:
         _print_runtime_errors(runtime_errors)
         sys.exit(70)
 
 
-def _run(content: str) -> list[str]:
+def _run(
+    content: str,
+    scanner_engine: str = "default",
+    use_cache: bool = True,
+    engine: type[Interpreter] = Interpreter,
+) -> list[str]:
     """Interpret the content."""
-    statements, parse_errors = parser.parse(content)
-    if parse_errors:
-        parser.print_parse_errors(parse_errors)
-        sys.exit(65)
+    statements = parser.parse_or_exit(content, scanner_engine, use_cache)
     if statements:
-        interpreter = Interpreter(statements)
-        interpreter.interpret()
+        with parser.deep_recursion():
+            interpreter = engine(statements)
+            interpreter.interpret()
         return interpreter.runtime_errors
     return []
 
 
+def _run_stream(
+    content: str,
+    scanner_engine: str = "default",
+    engine: type[Interpreter] = Interpreter,
+) -> list[str]:
+    """Interpret the content while it is being parsed.
+
+    Every top-level declaration is executed as soon as it is parsed and then
+    dropped, so neither the tokens nor the statements are ever held in full.
+    Execution stops at the first parse error, but the rest of the content is
+    still parsed to report all of them.
+    """
+    sc = scanner.make_scanner(content, scanner_engine)
+    _parser = parser.Parser(TokenStream(sc.iter_tokens()))
+    declarations = _parser.declarations()
+    interpreter = engine(
+        itertools.takewhile(lambda _: not _parser.parse_errors, declarations)
+    )
+    with parser.deep_recursion():
+        interpreter.interpret()
+        for _ in declarations:
+            pass
+    if _parser.parse_errors:
+        parser.print_parse_errors(_parser.parse_errors)
+        sys.exit(65)
+    return interpreter.runtime_errors
+
+
 def _print_runtime_errors(errors: list[str]) -> None:
     """Print a list of runtime errors"""
     for error in errors:
@@ -6,35 +6,204 @@ This is an interpreted based on the book Crafting Interpreters.
 
 import sys
 
-from . import interpreter, parser, scanner
+from . import (
+    adaptive,
+    batch,
+    cache,
+    closure,
+    codegen,
+    daemon,
+    incremental,
+    inference,
+    interpreter,
+    optimizer,
+    parser,
+    profiles,
+    scanner,
+    vm,
+)
+
+ENGINES: dict[str, type[interpreter.Interpreter]] = {
+    "tree": interpreter.Interpreter,
+    "closure": closure.ClosureInterpreter,
+    "vm": vm.VMInterpreter,
+    "python": codegen.PythonInterpreter,
+    "adaptive": adaptive.AdaptiveInterpreter,
+}
 
 
 def main() -> None:
 
-    if len(sys.argv) < 3:
+    args, _ = parse_arguments(sys.argv[1:])
+
+    if len(args) >= 2 and args[0] == "serve":
+        cache.keep_in_memory()
+        daemon.serve_cmd(args[1], serve_request)
+        return
+
+    execute(sys.argv[1:])
+
+
+def execute(argv: list[str], content: str | None = None) -> None:
+    """Run a command line, on `content` instead of the content of its file
+    if given."""
+
+    args, options = parse_arguments(argv)
+
+    if len(args) < 2:
         printhelp()
         sys.exit(1)
 
-    command = sys.argv[1]
-    filename = sys.argv[2]
+    command = args[0]
+    filename = args[1]
+
+    scanner_engine = options.get("scanner", "default")
+    if scanner_engine not in scanner.SCANNERS:
+        print(f"Unknown scanner: {scanner_engine}", file=sys.stderr)
+        printhelp()
+        sys.exit(1)
+
+    engine = get_engine(options)
+
+    if "explain-types" in options and command in ("evaluate", "run"):
+        inference.explain_types_cmd(
+            get_contents_from_file(filename, content),
+            scanner_engine,
+            expression=command == "evaluate",
+        )
+        return
 
     match command:
         case "tokenize":
-            scanner.tokenize_cmd(get_contents_from_file(filename))
+            scanner.tokenize_cmd(
+                get_contents_from_file(filename, content),
+                scanner_engine,
+                compact="compact" in options,
+                stats="stats" in options,
+                workers=int(options.get("workers", "1")),
+            )
         case "parse":
-            parser.parse_cmd(get_contents_from_file(filename))
+            parser.parse_cmd(
+                get_contents_from_file(filename, content),
+                scanner_engine,
+                compact="compact" in options,
+            )
+        case "evaluate" if "columns" in options:
+            batch.batch_cmd(
+                get_contents_from_file(filename, content),
+                options["columns"].split(","),
+                scanner_engine,
+                engine,
+            )
         case "evaluate":
-            interpreter.interpret_cmd(get_contents_from_file(filename))
+            interpreter.interpret_cmd(
+                get_contents_from_file(filename, content),
+                scanner_engine,
+                engine,
+            )
         case "run":
-            interpreter.run_cmd(get_contents_from_file(filename))
+            content = get_contents_from_file(filename, content)
+            interpreter.run_cmd(
+                content,
+                scanner_engine,
+                stream="stream" in options,
+                use_cache="no-cache" not in options,
+                engine=get_profile_engine(options, content) or engine,
+            )
+        case "disasm":
+            vm.disasm_cmd(
+                get_contents_from_file(filename, content), scanner_engine
+            )
+        case "emit-python":
+            codegen.emit_python_cmd(
+                get_contents_from_file(filename, content), scanner_engine
+            )
+        case "watch":
+            incremental.watch_cmd(
+                filename, interval=float(options.get("interval", "0.5"))
+            )
         case _:
             print(f"Unknown command: {command}", file=sys.stderr)
             printhelp()
             sys.exit(1)
 
 
-def get_contents_from_file(filename: str) -> str:
-    """Read a file and extract its content."""
+def serve_request(argv: list[str], content: str | None) -> None:
+    """Run a command line sent to the daemon."""
+    args, _ = parse_arguments(argv)
+    if args[:1] in (["serve"], ["watch"]):
+        print(f"The daemon does not run {args[0]}", file=sys.stderr)
+        sys.exit(1)
+    execute(argv, content)
+
+
+def get_engine(options: dict[str, str]) -> type[interpreter.Interpreter]:
+    """The execution engine selected by the options."""
+    engine_name = options.get("engine", "tree")
+    if engine_name not in ENGINES:
+        print(f"Unknown engine: {engine_name}", file=sys.stderr)
+        printhelp()
+        sys.exit(1)
+    engine = ENGINES[engine_name]
+    if "O" in options:
+        engine = optimizer.optimizing(engine)
+    return engine
+
+
+def get_profile_engine(
+    options: dict[str, str], content: str
+) -> type[interpreter.Interpreter] | None:
+    """The engine that records or uses the profile of the options, if any.
+
+    Recording runs under the tree walking interpreter and using a profile
+    under the adaptive engine, so neither takes another `--engine`.
+    """
+    if "profile-out" in options and "profile-in" in options:
+        print("Use one of --profile-out and --profile-in", file=sys.stderr)
+        sys.exit(1)
+    if "profile-out" in options:
+        name, factory, own = "profile-out", profiles.profiling, "tree"
+    elif "profile-in" in options:
+        name, factory, own = "profile-in", profiles.profile_guided, "adaptive"
+    else:
+        return None
+    if options.get("engine", own) != own:
+        print(f"--{name} runs under --engine={own}", file=sys.stderr)
+        sys.exit(1)
+    try:
+        profile = profiles.load(options[name], content, name == "profile-out")
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    engine = factory(profile)
+    if "O" in options:
+        engine = optimizer.optimizing(engine)
+    return engine
+
+
+def parse_arguments(argv: list[str]) -> tuple[list[str], dict[str, str]]:
+    """Split the command line into positional arguments and options.
+
+    Options have the form `--name=value`; a bare `--name` is stored with an
+    empty value, and so is a short `-x` flag, under the name `x`.
+    """
+    args: list[str] = []
+    options: dict[str, str] = {}
+    for arg in argv:
+        if arg.startswith("--"):
+            name, _, value = arg[2:].partition("=")
+            options[name] = value
+        elif arg.startswith("-") and len(arg) > 1:
+            options[arg[1:]] = ""
+        else:
+            args.append(arg)
+    return args, options
+
+
+def get_contents_from_file(filename: str, content: str | None = None) -> str:
+    """Read a file and extract its content, unless it is given."""
+    if content is not None:
+        return content
     with open(filename, encoding="utf-8") as file:
         file_contents = file.read()
     return file_contents
@@ -44,12 +213,41 @@ def printhelp() -> None:
     """Print the help."""
     print(
         """
-usage: ./your_program.sh <command> <filename>
+usage: ./your_program.sh <command> <filename> [options]
 
 Available commands:
     tokenize    Tokenize the input
     parse       Parse the input
     evaluate    Evaluate the input
+    run         Run the input
+    disasm      Print the bytecode compiled from the input
+    emit-python Print the Python code translated from the input
+    watch       Re-tokenize and re-parse the input every time it changes
+    serve       Run the commands sent by `python3 -m app.client <command>
+                <filename> [options]` to the Unix socket <filename>, with
+                warm caches
+
+Options:
+    --scanner=<default|fast>    Scanning engine
+    --engine=<tree|closure|vm|python|adaptive>
+                                Execution engine (evaluate, run)
+    --compact                   Keep tokens in a compact buffer
+    --stats                     Report interned symbol counts (tokenize)
+    --workers=<n>               Tokenize with n processes (tokenize)
+    --stream                    Run each declaration as soon as it is parsed
+    --no-cache                  Do not use the cache of parsed programs (run)
+    --interval=<seconds>        How often watch checks the input
+    -O                          Fold and propagate constants and prove
+                                operand types first (evaluate, run)
+    --explain-types             Print which operators still check the types
+                                of their operands instead (evaluate, run)
+    --columns=<files>           Evaluate once per row of the columns of CSV
+                                and .npy files, separated by commas
+                                (evaluate)
+    --profile-out=<file>        Record the operand types of the operators
+                                to a profile (run)
+    --profile-in=<file>         Run with the adaptive engine, specialized
+                                first by a profile (run)
 """,
         file=sys.stderr,
     )
@@ -0,0 +1,181 @@
+"""Optimizer
+
+A pass that rewrites parsed programs into equivalent ones that do less work
+at run time.
+"""
+
+import functools
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from gen import expr, stmt
+
+from . import interpreter
+from .exceptions import InterpreterError
+from .inference import TypeInference
+from .output import OutputSink
+from .rope import Rope
+
+
+class Optimizer(expr.Visitor, stmt.Visitor):
+    """Folds constants, strips groupings and propagates constant variables.
+
+    Operations on literals are computed once, here, unless computing them
+    fails: those are left in the tree so that they raise their runtime
+    error at their line, after everything that runs before them. Programs
+    have no loops and no functions, so they run in the order they are
+    written, and a read of a variable declared with a constant sees that
+    constant until the first assignment to it; such reads are replaced by
+    the constant. Declarations are kept, as reads before them must still
+    fail and the `Resolver` lays out their frames.
+    """
+
+    def __init__(self) -> None:
+        # The variables of the blocks being optimized, innermost last, and
+        # the global ones, mapped to their constant or None.
+        self._scopes: list[dict[str, expr.LiteralExpr | None]] = []
+        self._globals: dict[str, expr.LiteralExpr | None] = {}
+        # Evaluates the operations whose operands are all literals.
+        self._folder = interpreter.Interpreter()
+        self._expressions = expr.dispatch_table(self)
+        self._statements = stmt.dispatch_table(self)
+
+    def optimized(
+        self, statements: Iterable[stmt.Stmt | None]
+    ) -> Iterator[stmt.Stmt | None]:
+        """Optimize each top-level statement as it is consumed."""
+        for statement in statements:
+            yield None if statement is None else self.statement(statement)
+
+    def expression(self, _expr: expr.Expr) -> expr.Expr:
+        """Optimize an expression, returning the node to use instead."""
+        optimized: expr.Expr = self._expressions[type(_expr)](_expr)
+        return optimized
+
+    def statement(self, _stmt: stmt.Stmt) -> stmt.Stmt:
+        """Optimize the expressions of a statement in place."""
+        self._statements[type(_stmt)](_stmt)
+        return _stmt
+
+    def visit_assign_expr(self, _expr: "expr.AssignExpr") -> Any:
+        _expr.value = self.expression(_expr.value)
+        scope = self._scope_of(_expr.name.lexeme)
+        if scope is not None:
+            scope[_expr.name.lexeme] = None
+        return _expr
+
+    def visit_binary_expr(self, _expr: "expr.BinaryExpr") -> Any:
+        # The hottest visit: dispatch inline instead of through expression.
+        expressions = self._expressions
+        left = _expr.left = expressions[type(_expr.left)](_expr.left)
+        right = _expr.right = expressions[type(_expr.right)](_expr.right)
+        if type(left) is type(right) is expr.LiteralExpr:
+            return self._fold(_expr)
+        return _expr
+
+    def visit_grouping_expr(self, _expr: "expr.GroupingExpr") -> Any:
+        return self.expression(_expr.expression)
+
+    def visit_literal_expr(self, _expr: "expr.LiteralExpr") -> Any:
+        return _expr
+
+    def visit_unary_expr(self, _expr: "expr.UnaryExpr") -> Any:
+        _expr.right = self.expression(_expr.right)
+        if isinstance(_expr.right, expr.LiteralExpr):
+            return self._fold(_expr)
+        return _expr
+
+    def visit_variable_expr(self, _expr: "expr.VariableExpr") -> Any:
+        scope = self._scope_of(_expr.name.lexeme)
+        constant = None if scope is None else scope[_expr.name.lexeme]
+        if constant is None:
+            return _expr
+        return expr.LiteralExpr(constant.value)
+
+    def visit_block_stmt(self, _stmt: "stmt.BlockStmt") -> Any:
+        self._scopes.append({})
+        try:
+            for statement in _stmt.statements:
+                if statement is not None:
+                    self.statement(statement)
+        finally:
+            self._scopes.pop()
+
+    def visit_expression_stmt(self, _stmt: "stmt.ExpressionStmt") -> Any:
+        _stmt.expression = self.expression(_stmt.expression)
+
+    def visit_print_stmt(self, _stmt: "stmt.PrintStmt") -> Any:
+        _stmt.expression = self.expression(_stmt.expression)
+
+    def visit_var_stmt(self, _stmt: "stmt.VarStmt") -> Any:
+        # The initializer still sees the variables of the enclosing scopes.
+        constant: expr.LiteralExpr | None = expr.LiteralExpr(None)
+        if _stmt.initializer is not None:
+            _stmt.initializer = self.expression(_stmt.initializer)
+            constant = (
+                _stmt.initializer
+                if isinstance(_stmt.initializer, expr.LiteralExpr)
+                else None
+            )
+        scope = self._scopes[-1] if self._scopes else self._globals
+        scope[_stmt.name.lexeme] = constant
+
+    def _scope_of(self, name: str) -> dict[str, expr.LiteralExpr | None] | None:
+        """The innermost scope that declares a name, if any."""
+        for scope in reversed(self._scopes):
+            if name in scope:
+                return scope
+        return self._globals if name in self._globals else None
+
+    def _fold(self, _expr: expr.BinaryExpr | expr.UnaryExpr) -> expr.Expr:
+        """Replace an operation on literals by its value, unless it fails."""
+        try:
+            value = self._folder.evaluate(_expr)
+            # Literals hold plain strings, which every engine knows.
+            if isinstance(value, Rope):
+                value = str(value)
+            return expr.LiteralExpr(value)
+        except (InterpreterError, ArithmeticError):
+            return _expr
+
+
+expr.Visitor.register(Optimizer)
+stmt.Visitor.register(Optimizer)
+
+
+@functools.cache
+def optimizing(
+    engine: type[interpreter.Interpreter],
+) -> type[interpreter.Interpreter]:
+    """An engine that runs the programs rewritten by the `Optimizer`, with
+    the operand types proven by `TypeInference`."""
+
+    class OptimizingInterpreter(engine):  # type: ignore[valid-type,misc]
+        """Runs the optimized statements and expressions."""
+
+        def __init__(
+            self,
+            _statements: Iterable[stmt.Stmt | None] | None = None,
+            output: OutputSink | None = None,
+        ) -> None:
+            self._optimizer = Optimizer()
+            self._inference = TypeInference()
+            if _statements is not None:
+                _statements = self._inference.inferred(
+                    self._optimizer.optimized(_statements)
+                )
+            super().__init__(_statements, output)
+
+        def evaluate(self, _expr: expr.Expr) -> object:
+            """Optimize an expression, then evaluate it."""
+            _expr = self._optimizer.expression(_expr)
+            self._inference.expression(_expr)
+            return super().evaluate(_expr)
+
+    OptimizingInterpreter.__name__ = f"Optimizing{engine.__name__}"
+    return OptimizingInterpreter
+
+
+def optimize(statements: Iterable[stmt.Stmt | None]) -> list[stmt.Stmt | None]:
+    """Optimize a program."""
+    return list(Optimizer().optimized(statements))
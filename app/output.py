@@ -0,0 +1,76 @@
+"""Program output
+
+The lines printed by a program are buffered by an `OutputSink` and written
+in large chunks, instead of one write per `print` statement. A sink writes
+once it holds `$LOX_OUTPUT_SIZE` characters, 65536 by default, or when a
+line comes `$LOX_OUTPUT_INTERVAL` seconds, 1 by default, after its last
+write, and whenever it is flushed: the engines flush it when a run ends,
+before its runtime errors are reported.
+"""
+
+import os
+import sys
+import time
+from typing import TextIO
+
+DEFAULT_SIZE = 64 * 1024
+DEFAULT_INTERVAL = 1.0
+
+
+class OutputSink:
+    """Buffers lines and writes them to standard output, to another text
+    stream, like an in-memory `io.StringIO`, or to a file descriptor."""
+
+    def __init__(
+        self,
+        target: TextIO | int | None = None,
+        size: int | None = None,
+        interval: float | None = None,
+    ) -> None:
+        # Standard output is looked up on every flush, as it may be
+        # replaced while the sink lives.
+        self._target = target
+        self._size = max_size() if size is None else size
+        self._interval = max_interval() if interval is None else interval
+        self._lines: list[str] = []
+        self._buffered = 0
+        self._written = time.monotonic()
+
+    def write(self, line: str) -> None:
+        """Print a line."""
+        self._lines.append(line)
+        self._buffered += len(line) + 1
+        if (
+            self._buffered >= self._size
+            or time.monotonic() - self._written >= self._interval
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered lines."""
+        self._written = time.monotonic()
+        if not self._lines:
+            return
+        lines = self._lines
+        self._lines = []
+        self._buffered = 0
+        lines.append("")
+        text = "\n".join(lines)
+        if isinstance(self._target, int):
+            data = text.encode("utf-8", "surrogateescape")
+            while data:
+                data = data[os.write(self._target, data) :]
+            return
+        stream = sys.stdout if self._target is None else self._target
+        stream.write(text)
+        stream.flush()
+
+
+def max_size() -> int:
+    """The number of characters a sink buffers before writing them."""
+    return int(os.environ.get("LOX_OUTPUT_SIZE", DEFAULT_SIZE))
+
+
+def max_interval() -> float:
+    """The number of seconds after which a sink writes the next line."""
+    return float(os.environ.get("LOX_OUTPUT_INTERVAL", DEFAULT_INTERVAL))
@@ -1,12 +1,19 @@
 """Parser"""
 
+import contextlib
 import sys
+from collections.abc import Callable, Iterator
+from enum import IntEnum, auto
+from typing import NamedTuple
 
 from gen import expr, stmt
 
-from . import scanner
+from . import cache, scanner
 from .astprinter import AstPrinter
-from .tokens import Token, TokenType
+from .tokens import Token, TokenSequence, TokenType
+
+# The recursion limit under `deep_recursion`.
+DEEP_RECURSION_LIMIT = 1_000_000
 
 
 class Parser:
@@ -23,7 +30,7 @@ class Parser:
     class ParseError(Exception):
         """A custom exception for parsing errors."""
 
-    def __init__(self, tokens: list[Token]) -> None:
+    def __init__(self, tokens: TokenSequence) -> None:
         self._tokens = tokens
         self._current = 0
         self.parse_errors: list[str] = []
@@ -39,33 +46,71 @@ class Parser:
         except self.ParseError:
             return statements
 
+    def declarations(self) -> Iterator[stmt.Stmt | None]:
+        """Parse the top-level declarations one at a time."""
+        while not self._is_at_end():
+            yield self._declaration()
+
     def expression(self) -> expr.Expr:
         """Parse an expression."""
-        return self._assignment()
+        return self._parse_precedence(Precedence.ASSIGNMENT)
+
+    def _parse_precedence(self, precedence: int) -> expr.Expr:
+        """Parse an expression whose operators bind at least as tightly as
+        precedence.
+
+        The first token selects a prefix rule in `PREFIX_RULES`, then every
+        following operator in `INFIX_RULES` with enough precedence extends
+        the expression from the left.
+        """
+        tokens = self._tokens
+        token = tokens[self._current]
+        prefix = PREFIX_RULES.get(token.type)
+        if prefix is None:
+            raise self._error(token, "Expect expression.")
+        self._current += 1
+        left = prefix(self, token)
+        while True:
+            token = tokens[self._current]
+            rule = INFIX_RULES.get(token.type)
+            if rule is None or rule.precedence < precedence:
+                return left
+            self._current += 1
+            left = rule.parse(self, left, token)
 
-    def _assignment(self) -> expr.Expr:
-        expression = self._equality()
-        if self._match(TokenType.EQUAL):
-            equals = self._previous()
-            value = self._assignment()
+    def _literal(self, token: Token) -> expr.Expr:
+        return expr.LiteralExpr(token.literal)
 
-            if isinstance(expression, expr.VariableExpr):
-                name = expr.VariableExpr(expression.name).name
-                return expr.AssignExpr(name, value)
+    def _keyword_literal(self, token: Token) -> expr.Expr:
+        return expr.LiteralExpr(_KEYWORD_LITERALS[token.type])
 
-            self._error(equals, "Invalid assignment target.")
+    def _variable(self, token: Token) -> expr.Expr:
+        return expr.VariableExpr(token)
 
-        return expression
+    def _grouping(self, _token: Token) -> expr.Expr:
+        _expr = self.expression()
+        self._consume(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
+        return expr.GroupingExpr(_expr)
 
-    def _equality(self) -> expr.Expr:
-        _expr = self._comparison()
+    def _unary(self, operator: Token) -> expr.Expr:
+        return expr.UnaryExpr(
+            operator, self._parse_precedence(Precedence.UNARY)
+        )
 
-        while self._match(TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL):
-            operator = self._previous()
-            right = self._comparison()
-            _expr = expr.BinaryExpr(_expr, operator, right)
+    def _binary(self, left: expr.Expr, operator: Token) -> expr.Expr:
+        # Operands on the right bind tighter, so operators are left
+        # associative.
+        precedence = INFIX_RULES[operator.type].precedence + 1
+        return expr.BinaryExpr(
+            left, operator, self._parse_precedence(precedence)
+        )
 
-        return _expr
+    def _assignment(self, target: expr.Expr, equals: Token) -> expr.Expr:
+        value = self._parse_precedence(Precedence.ASSIGNMENT)
+        if isinstance(target, expr.VariableExpr):
+            return expr.AssignExpr(target.name, value)
+        self._error(equals, "Invalid assignment target.")
+        return target
 
     def _match(self, *types: TokenType) -> bool:
         for _type in types:
@@ -93,70 +138,6 @@ class Parser:
     def _previous(self) -> Token:
         return self._tokens[self._current - 1]
 
-    def _comparison(self) -> expr.Expr:
-        _expr = self._term()
-
-        while self._match(
-            TokenType.GREATER,
-            TokenType.GREATER_EQUAL,
-            TokenType.LESS,
-            TokenType.LESS_EQUAL,
-        ):
-            operator = self._previous()
-            right = self._term()
-            _expr = expr.BinaryExpr(_expr, operator, right)
-
-        return _expr
-
-    def _term(self) -> expr.Expr:
-        _expr = self._factor()
-
-        while self._match(TokenType.MINUS, TokenType.PLUS):
-            operator = self._previous()
-            right = self._factor()
-            _expr = expr.BinaryExpr(_expr, operator, right)
-
-        return _expr
-
-    def _factor(self) -> expr.Expr:
-        _expr = self._unary()
-
-        while self._match(TokenType.SLASH, TokenType.STAR):
-            operator = self._previous()
-            right = self._unary()
-            _expr = expr.BinaryExpr(_expr, operator, right)
-
-        return _expr
-
-    def _unary(self) -> expr.Expr:
-        if self._match(TokenType.BANG, TokenType.MINUS):
-            operator = self._previous()
-            right = self._unary()
-            return expr.UnaryExpr(operator, right)
-
-        return self._primary()
-
-    def _primary(self) -> expr.Expr:
-        if self._match(TokenType.FALSE):
-            return expr.LiteralExpr(False)
-        if self._match(TokenType.TRUE):
-            return expr.LiteralExpr(True)
-        if self._match(TokenType.NIL):
-            return expr.LiteralExpr(None)
-
-        if self._match(TokenType.NUMBER, TokenType.STRING):
-            return expr.LiteralExpr(self._previous().literal)
-
-        if self._match(TokenType.IDENTIFIER):
-            return expr.VariableExpr(self._previous())
-
-        if self._match(TokenType.LEFT_PAREN):
-            _expr = self.expression()
-            self._consume(TokenType.RIGHT_PAREN, "Expect ')' after expression.")
-            return expr.GroupingExpr(_expr)
-
-        raise self._error(self._peek(), "Expect expression.")
-
     def _consume(self, _type: TokenType, message: str) -> Token:
         if self._check(_type):
             return self._advance()
@@ -244,35 +225,238 @@ class Parser:
         return stmt.VarStmt(name, initializer)
 
 
-def parse_cmd(content: str) -> None:
+class IterativeParser(Parser):
+    """A parser that keeps the pending operators and blocks on explicit
+    stacks instead of recursing, so the nesting depth of its input is only
+    bounded by memory.
+
+    It builds the same trees and reports the same errors as `Parser`.
+    """
+
+    def _parse_precedence(self, precedence: int) -> expr.Expr:
+        tokens = self._tokens
+        # Each pending frame is (operator, left operand, precedence of the
+        # expression it belongs to); grouping and unary frames have no left
+        # operand.
+        pending: list[tuple[Token, expr.Expr | None, int]] = []
+        while True:
+            token = tokens[self._current]
+            match token.type:
+                case TokenType.LEFT_PAREN:
+                    self._current += 1
+                    pending.append((token, None, precedence))
+                    precedence = Precedence.ASSIGNMENT
+                    continue
+                case TokenType.BANG | TokenType.MINUS:
+                    self._current += 1
+                    pending.append((token, None, precedence))
+                    precedence = Precedence.UNARY
+                    continue
+            prefix = PREFIX_RULES.get(token.type)
+            if prefix is None:
+                raise self._error(token, "Expect expression.")
+            self._current += 1
+            left = prefix(self, token)
+
+            while True:
+                token = tokens[self._current]
+                rule = INFIX_RULES.get(token.type)
+                if rule is not None and rule.precedence >= precedence:
+                    self._current += 1
+                    pending.append((token, left, precedence))
+                    if token.type == TokenType.EQUAL:
+                        precedence = Precedence.ASSIGNMENT
+                    else:
+                        precedence = rule.precedence + 1
+                    break
+                if not pending:
+                    return left
+                operator, operand, precedence = pending.pop()
+                left = self._complete(operator, operand, left)
+
+    def _complete(
+        self, operator: Token, left: expr.Expr | None, right: expr.Expr
+    ) -> expr.Expr:
+        """Build the expression of a pending frame once its right operand
+        has been parsed."""
+        if left is None:
+            if operator.type == TokenType.LEFT_PAREN:
+                self._consume(
+                    TokenType.RIGHT_PAREN, "Expect ')' after expression."
+                )
+                return expr.GroupingExpr(right)
+            return expr.UnaryExpr(operator, right)
+        if operator.type != TokenType.EQUAL:
+            return expr.BinaryExpr(left, operator, right)
+        if isinstance(left, expr.VariableExpr):
+            return expr.AssignExpr(left.name, right)
+        self._error(operator, "Invalid assignment target.")
+        return left
+
+    def _declaration(self) -> stmt.Stmt | None:
+        # The statements of the blocks still open, innermost last.
+        blocks: list[list[stmt.Stmt | None]] = []
+        while True:
+            declaration: stmt.Stmt | None
+            try:
+                if blocks and (
+                    self._check(TokenType.RIGHT_BRACE) or self._is_at_end()
+                ):
+                    if self._is_at_end():
+                        # Like `Parser._block`, the error belongs to the
+                        # declaration that opened the block.
+                        blocks.pop()
+                    self._consume(TokenType.RIGHT_BRACE, "Expect '}'.")
+                    declaration = stmt.BlockStmt(blocks.pop())
+                elif self._match(TokenType.VAR):
+                    declaration = self._var_declaration()
+                elif self._match(TokenType.LEFT_BRACE):
+                    blocks.append([])
+                    continue
+                else:
+                    declaration = self._statement()
+            except self.ParseError:
+                self._synchronize()
+                declaration = None
+            if not blocks:
+                return declaration
+            blocks[-1].append(declaration)
+
+
+class Precedence(IntEnum):
+    """How tightly the operators bind, from loosest to tightest."""
+
+    NONE = 0
+    ASSIGNMENT = auto()
+    EQUALITY = auto()
+    COMPARISON = auto()
+    TERM = auto()
+    FACTOR = auto()
+    UNARY = auto()
+    PRIMARY = auto()
+
+
+class InfixRule(NamedTuple):
+    """How to parse an operator that follows an expression."""
+
+    parse: Callable[[Parser, expr.Expr, Token], expr.Expr]
+    precedence: Precedence
+
+
+# pylint: disable=protected-access
+PREFIX_RULES: dict[TokenType, Callable[[Parser, Token], expr.Expr]] = {
+    TokenType.FALSE: Parser._keyword_literal,
+    TokenType.TRUE: Parser._keyword_literal,
+    TokenType.NIL: Parser._keyword_literal,
+    TokenType.NUMBER: Parser._literal,
+    TokenType.STRING: Parser._literal,
+    TokenType.IDENTIFIER: Parser._variable,
+    TokenType.LEFT_PAREN: Parser._grouping,
+    TokenType.BANG: Parser._unary,
+    TokenType.MINUS: Parser._unary,
+}
+
+INFIX_RULES: dict[TokenType, InfixRule] = {
+    TokenType.EQUAL: InfixRule(Parser._assignment, Precedence.ASSIGNMENT),
+    TokenType.BANG_EQUAL: InfixRule(Parser._binary, Precedence.EQUALITY),
+    TokenType.EQUAL_EQUAL: InfixRule(Parser._binary, Precedence.EQUALITY),
+    TokenType.GREATER: InfixRule(Parser._binary, Precedence.COMPARISON),
+    TokenType.GREATER_EQUAL: InfixRule(Parser._binary, Precedence.COMPARISON),
+    TokenType.LESS: InfixRule(Parser._binary, Precedence.COMPARISON),
+    TokenType.LESS_EQUAL: InfixRule(Parser._binary, Precedence.COMPARISON),
+    TokenType.MINUS: InfixRule(Parser._binary, Precedence.TERM),
+    TokenType.PLUS: InfixRule(Parser._binary, Precedence.TERM),
+    TokenType.SLASH: InfixRule(Parser._binary, Precedence.FACTOR),
+    TokenType.STAR: InfixRule(Parser._binary, Precedence.FACTOR),
+}
+
+# pylint: enable=protected-access
+
+_KEYWORD_LITERALS: dict[TokenType, object] = {
+    TokenType.FALSE: False,
+    TokenType.TRUE: True,
+    TokenType.NIL: None,
+}
+
+
+def parse_cmd(
+    content: str, scanner_engine: str = "default", compact: bool = False
+) -> None:
     """The `parse` method processes the given contents of a source file by
     scanning it into tokens, parsing those tokens into an abstract syntax
     tree (AST), and then printing the resulting AST."""
-    expression, parse_errors = parse_expression(content)
+    expression, parse_errors = parse_expression(
+        content, scanner_engine, compact
+    )
 
     if parse_errors:
         print_parse_errors(parse_errors)
         sys.exit(65)
     if expression is not None:
-        print(AstPrinter().print(expression))
+        with deep_recursion():
+            print(AstPrinter().print(expression))
 
 
-def parse(content: str) -> tuple[list[stmt.Stmt | None], list[str]]:
-    """Parse the contents."""
-    sc = scanner.Scanner(content)
-    tokens = sc.scan_tokens()
-    parser = Parser(tokens)
-    statements = parser.parse()
+def parse(
+    content: str,
+    scanner_engine: str = "default",
+    compact: bool = False,
+    use_cache: bool = True,
+    iterative: bool = False,
+) -> tuple[list[stmt.Stmt | None], list[str]]:
+    """Parse the contents.
+
+    Programs without errors are kept in the on-disk `cache` unless
+    `use_cache` is false. Contents nested too deeply for the recursive
+    parser are parsed again by the `IterativeParser`, which `iterative`
+    selects from the start.
+    """
+    if use_cache:
+        statements = cache.load(content)
+        if statements is not None:
+            return statements, []
+    try:
+        parser = _make_parser(content, scanner_engine, compact, iterative)
+        statements = parser.parse()
+    except RecursionError:
+        parser = _make_parser(content, scanner_engine, compact, True)
+        statements = parser.parse()
+    if use_cache and not parser.parse_errors:
+        cache.store(content, statements)
     return statements, parser.parse_errors
 
 
+def parse_or_exit(
+    content: str, scanner_engine: str = "default", use_cache: bool = True
+) -> list[stmt.Stmt | None]:
+    """Parse the contents, or print the parse errors and exit."""
+    statements, parse_errors = parse(
+        content, scanner_engine, use_cache=use_cache
+    )
+    if parse_errors:
+        print_parse_errors(parse_errors)
+        sys.exit(65)
+    return statements
+
+
 def parse_expression(
     content: str,
+    scanner_engine: str = "default",
+    compact: bool = False,
+    iterative: bool = False,
 ) -> tuple[expr.Expr | None, list[str]]:
     """Parse the contents."""
-    sc = scanner.Scanner(content)
-    tokens = sc.scan_tokens()
-    parser = Parser(tokens)
+    try:
+        return _parse_expression(
+            _make_parser(content, scanner_engine, compact, iterative)
+        )
+    except RecursionError:
+        return _parse_expression(
+            _make_parser(content, scanner_engine, compact, True)
+        )
+
+
+def _parse_expression(parser: Parser) -> tuple[expr.Expr | None, list[str]]:
     try:
         _expr = parser.expression()
     except Parser.ParseError:
@@ -280,6 +464,37 @@ def parse_expression(
     return _expr, parser.parse_errors
 
 
+@contextlib.contextmanager
+def deep_recursion() -> Iterator[None]:
+    """Raise the recursion limit to walk deeply nested trees recursively.
+
+    Calls between Python functions do not grow the C stack, so only memory
+    bounds their depth; calls through C code still stop with a
+    `RecursionError` at the C recursion limit.
+    """
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, DEEP_RECURSION_LIMIT))
+    try:
+        yield
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def _make_parser(
+    content: str, scanner_engine: str, compact: bool, iterative: bool
+) -> Parser:
+    tokens = _scan(content, scanner_engine, compact)
+    return IterativeParser(tokens) if iterative else Parser(tokens)
+
+
+def _scan(content: str, scanner_engine: str, compact: bool) -> TokenSequence:
+    """Scan the contents into a list of tokens or a compact token buffer."""
+    sc = scanner.make_scanner(content, scanner_engine)
+    if compact:
+        return sc.scan_buffer()
+    return sc.scan_tokens()
+
+
 def print_parse_errors(errors: list[str]) -> None:
     """Print a list of parse errors"""
     for error in errors:
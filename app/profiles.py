@@ -0,0 +1,298 @@
+"""Execution profiles
+
+Statistics of the operators and variables of a program, recorded while it
+runs and saved to a file, so that the next runs of the same program start
+out specialized for it.
+
+The sites of a program are its binary, unary and variable nodes, numbered in
+the order a pre-order walk of its statements meets them. A profile is saved
+as gzipped JSON along with the cache key of the source it was recorded for,
+and is only used for that source.
+"""
+
+import gzip
+import json
+import sys
+from collections.abc import Iterable, Iterator
+from typing import Any, ClassVar
+
+from gen import expr, stmt
+
+from . import adaptive, cache
+from .adaptive import AdaptiveInterpreter
+from .interpreter import Interpreter
+from .output import OutputSink
+
+# The Lox names of the types of the values.
+_TYPE_NAMES: dict[type, str] = {
+    type(None): "nil",
+    bool: "boolean",
+    float: "number",
+    str: "string",
+}
+_TYPES = {name: operand for operand, name in _TYPE_NAMES.items()}
+
+
+class Site:
+    """The statistics of a site: its kind, how many times it ran, the
+    operand types it ran with, as names separated by spaces, and for a
+    variable the depth of the scope it was read from, -1 for a global one."""
+
+    __slots__ = ("kind", "hits", "types", "depth")
+
+    def __init__(
+        self,
+        kind: str,
+        hits: int = 0,
+        types: dict[str, int] | None = None,
+        depth: int | None = None,
+    ) -> None:
+        self.kind = kind
+        self.hits = hits
+        self.types = types if types is not None else {}
+        self.depth = depth
+
+    def observed(self, arity: int) -> list[tuple[type, ...]]:
+        """The operand types the site ran with, as an operator of an arity,
+        with `object` for the unknown ones."""
+        observed = [
+            tuple(_TYPES.get(name, object) for name in types.split())
+            for types in self.types
+        ]
+        return [types for types in observed if len(types) == arity]
+
+
+class Profile:
+    """The sites of the program of a source, saved to a file."""
+
+    __slots__ = ("path", "source", "sites")
+
+    def __init__(self, path: str, source: str) -> None:
+        self.path = path
+        self.source = source
+        self.sites: list[Site] = []
+
+    def site(self, index: int, kind: str) -> Site | None:
+        """The site with an index, if it is one for the same kind of node."""
+        if index < len(self.sites) and self.sites[index].kind == kind:
+            return self.sites[index]
+        return None
+
+    def dump(self) -> None:
+        """Save the profile to its file."""
+        sites = [
+            [site.kind, site.hits, dict(site.types), site.depth]
+            for site in self.sites
+        ]
+        data = {"source": self.source, "sites": sites}
+        with gzip.open(self.path, "wt", encoding="utf-8") as file:
+            # Dumping to a string first is many times faster.
+            file.write(json.dumps(data, separators=(",", ":")))
+
+
+def load(path: str, content: str, recording: bool = False) -> Profile:
+    """Load the profile of a source from a file.
+
+    A missing file gives an empty profile; so does a file that is not a
+    profile or the profile of another source, with a warning. A recording
+    starts over the profile of another source without one, but raises
+    `ValueError` instead of replacing a file that is not a profile.
+    """
+    profile = Profile(path, cache.key(content))
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            data = json.load(file)
+        source = data["source"]
+    except FileNotFoundError:
+        return profile
+    except (OSError, EOFError, ValueError, KeyError, TypeError) as e:
+        if recording:
+            raise ValueError(f"{path} is not a profile") from e
+        print(f"Ignoring an invalid profile: {path}: {e}", file=sys.stderr)
+        return profile
+    if source != profile.source:
+        if not recording:
+            print(
+                f"Ignoring the profile of another source: {path}",
+                file=sys.stderr,
+            )
+        return profile
+    try:
+        profile.sites = [Site(*site) for site in data["sites"]]
+    except (KeyError, TypeError) as e:
+        if not recording:
+            print(f"Ignoring an invalid profile: {path}: {e}", file=sys.stderr)
+    return profile
+
+
+class ProfilingInterpreter(Interpreter):
+    """Interpreter that records the profile of the program it runs.
+
+    The counts add up over the runs recorded to the same profile, which is
+    saved when the run ends, even on a runtime error.
+    """
+
+    profile: ClassVar[Profile]
+
+    def __init__(
+        self,
+        _statements: Iterable[stmt.Stmt | None] | None = None,
+        output: OutputSink | None = None,
+    ) -> None:
+        # The site of every node of the program, by node id. The nodes are
+        # kept so that their ids are not reused.
+        self._sites: dict[int, tuple[expr.Expr, Site]] = {}
+        if _statements is not None:
+            _statements = self._indexed(_statements)
+        super().__init__(_statements, output)
+
+    def interpret(self) -> None:
+        try:
+            super().interpret()
+        finally:
+            self.profile.dump()
+
+    def visit_binary_expr(self, _expr: "expr.BinaryExpr") -> object:
+        evaluators = self._evaluators
+        left = evaluators[type(_expr.left)](_expr.left)
+        right = evaluators[type(_expr.right)](_expr.right)
+        if entry := self._sites.get(id(_expr)):
+            site = entry[1]
+            site.hits += 1
+            types = (_TYPE_NAMES[type(left)], _TYPE_NAMES[type(right)])
+            key = " ".join(types)
+            site.types[key] = site.types.get(key, 0) + 1
+        return adaptive.apply_binary(_expr.operator, left, right)
+
+    def visit_unary_expr(self, _expr: "expr.UnaryExpr") -> object:
+        right = self._evaluators[type(_expr.right)](_expr.right)
+        if entry := self._sites.get(id(_expr)):
+            site = entry[1]
+            site.hits += 1
+            key = _TYPE_NAMES[type(right)]
+            site.types[key] = site.types.get(key, 0) + 1
+        return adaptive.apply_unary(_expr.operator, right)
+
+    def visit_variable_expr(self, _expr: "expr.VariableExpr") -> object:
+        if entry := self._sites.get(id(_expr)):
+            site = entry[1]
+            site.hits += 1
+            site.depth = _expr.depth if _expr.slot >= 0 else -1
+        return super().visit_variable_expr(_expr)
+
+    def _indexed(
+        self, statements: Iterable[stmt.Stmt | None]
+    ) -> Iterator[stmt.Stmt | None]:
+        """Number the sites of each statement as it is consumed, reusing the
+        sites of the profile loaded for them."""
+        profile = self.profile
+        index = 0
+        for statement in statements:
+            for kind, node in site_nodes(statement):
+                site = profile.site(index, kind)
+                if site is None:
+                    # The program changed shape: drop the rest.
+                    del profile.sites[index:]
+                    site = Site(kind)
+                    profile.sites.append(site)
+                self._sites[id(node)] = (node, site)
+                index += 1
+            yield statement
+
+
+class ProfileGuidedInterpreter(AdaptiveInterpreter):
+    """Adaptive interpreter that quickens the operators of each statement
+    for the operand types of its profile before the statement runs.
+
+    A site that only ran with operand types it has a specialization for
+    starts out specialized; one that ran with other types, or several, goes
+    straight to the generic node, and skips the checks of the
+    specialization it would lose on the way.
+    """
+
+    profile: ClassVar[Profile]
+
+    def __init__(
+        self,
+        _statements: Iterable[stmt.Stmt | None] | None = None,
+        output: OutputSink | None = None,
+    ) -> None:
+        if _statements is not None:
+            _statements = quickened(_statements, self.profile)
+        super().__init__(_statements, output)
+
+
+def profiling(profile: Profile) -> type[Interpreter]:
+    """An engine that records the programs it runs to a profile."""
+    return type(
+        "ProfilingInterpreter", (ProfilingInterpreter,), {"profile": profile}
+    )
+
+
+def profile_guided(profile: Profile) -> type[Interpreter]:
+    """An engine that runs the programs quickened by a profile."""
+    return type(
+        "ProfileGuidedInterpreter",
+        (ProfileGuidedInterpreter,),
+        {"profile": profile},
+    )
+
+
+def quickened(
+    statements: Iterable[stmt.Stmt | None], profile: Profile
+) -> Iterator[stmt.Stmt | None]:
+    """Quicken the operators of each statement for the operand types of a
+    profile as it is consumed."""
+    # The class of the operators, by kind and operand types.
+    classes: dict[tuple[str, tuple[str, ...]], type | None] = {}
+    sites = profile.sites
+    index = 0
+    for statement in statements:
+        for kind, node in site_nodes(statement):
+            if index < len(sites) and sites[index].kind == kind:
+                site = sites[index]
+                key = (kind, tuple(site.types))
+                if key not in classes:
+                    classes[key] = _quickened_class(node, site)
+                if classes[key] is not None:
+                    node.__class__ = classes[key]
+            index += 1
+        yield statement
+
+
+def _quickened_class(node: expr.Expr, site: Site) -> type | None:
+    """The class an operator quickens to for the types of its site."""
+    if isinstance(node, expr.BinaryExpr):
+        return adaptive.quickened_binary(node.operator.type, site.observed(2))
+    if isinstance(node, expr.UnaryExpr):
+        return adaptive.quickened_unary(node.operator.type, site.observed(1))
+    return None
+
+
+def site_nodes(node: stmt.Stmt | expr.Expr | None) -> list[tuple[str, Any]]:
+    """The binary, unary and variable nodes of a tree, in pre-order, with
+    their kinds, like `binary +` or `variable a`."""
+    # Dispatching on the exact classes is several times faster than the
+    # checks of the abstract node classes.
+    nodes = []
+    stack: list[Any] = [node]
+    while stack:
+        current = stack.pop()
+        match type(current):
+            case stmt.BlockStmt:
+                stack += reversed(current.statements)
+            case stmt.ExpressionStmt | stmt.PrintStmt | expr.GroupingExpr:
+                stack.append(current.expression)
+            case stmt.VarStmt:
+                stack.append(current.initializer)
+            case expr.AssignExpr:
+                stack.append(current.value)
+            case expr.BinaryExpr:
+                nodes.append((f"binary {current.operator.lexeme}", current))
+                stack += (current.right, current.left)
+            case expr.UnaryExpr:
+                nodes.append((f"unary {current.operator.lexeme}", current))
+                stack.append(current.right)
+            case expr.VariableExpr:
+                nodes.append((f"variable {current.name.lexeme}", current))
+    return nodes
@@ -0,0 +1,151 @@
+"""Resolver
+
+A static pass that tells every variable reference where its value lives.
+"""
+
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from gen import expr, stmt
+
+
+# pylint: disable-next=abstract-method
+class ScopedPass(expr.Visitor, stmt.Visitor):
+    """A static pass that visits a program in the order it runs, keeping a
+    scope for every block around the node being visited."""
+
+    def __init__(self) -> None:
+        # The variables of the blocks being visited, innermost last.
+        self._scopes: list[dict[str, int]] = []
+        self._expressions = expr.dispatch_table(self)
+        self._statements = stmt.dispatch_table(self)
+
+    def _visited(
+        self, statements: Iterable[stmt.Stmt | None]
+    ) -> Iterator[stmt.Stmt | None]:
+        """Visit each top-level statement as it is consumed."""
+        for statement in statements:
+            if statement is not None:
+                self._statement(statement)
+            yield statement
+
+    def _statement(self, _stmt: stmt.Stmt) -> None:
+        self._statements[type(_stmt)](_stmt)
+
+    def _sequence(self, statements: Iterable[stmt.Stmt | None]) -> None:
+        for statement in statements:
+            if statement is not None:
+                self._statement(statement)
+
+    def _block(self, statements: Iterable[stmt.Stmt | None]) -> dict[str, int]:
+        """Visit the statements of a block in a new scope and return it."""
+        self._scopes.append({})
+        try:
+            self._sequence(statements)
+        finally:
+            scope = self._scopes.pop()
+            self._leave(scope)
+        return scope
+
+    def _leave(self, scope: dict[str, int]) -> None:
+        """Called with the scope of every block when it is left."""
+
+
+class Resolver(ScopedPass):
+    """Annotates variable references with their frame depth and slot.
+
+    Every block that declares variables gets a frame with one slot per
+    variable, and its size is recorded on the block; blocks that declare
+    nothing run in the frame around them and get a size of 0. The depth of
+    a reference is how many frames up its variable lives and the slot is
+    its index in that frame, or -1 for globals. Blocks run in order and
+    cannot be re-entered, so a reference resolves to the innermost variable
+    declared before it, exactly like the dynamic lookup did.
+    """
+
+    def __init__(self) -> None:
+        # The scopes map the variables of the blocks to their slots.
+        super().__init__()
+        # The scope index and slot of every declaration of a name that is
+        # in scope, innermost last.
+        self._declarations: dict[str, list[tuple[int, int]]] = {}
+
+    def resolved(
+        self, statements: Iterable[stmt.Stmt | None]
+    ) -> Iterator[stmt.Stmt | None]:
+        """Resolve each top-level statement as it is consumed."""
+        return self._visited(statements)
+
+    def resolve(self, node: expr.Expr | stmt.Stmt) -> None:
+        """Resolve an expression or a statement."""
+        if isinstance(node, expr.Expr):
+            self._expression(node)
+        else:
+            self._statement(node)
+
+    def _expression(self, _expr: expr.Expr) -> None:
+        self._expressions[type(_expr)](_expr)
+
+    def visit_assign_expr(self, _expr: "expr.AssignExpr") -> Any:
+        self._expression(_expr.value)
+        _expr.depth, _expr.slot = self._lookup(_expr.name.lexeme)
+
+    def visit_binary_expr(self, _expr: "expr.BinaryExpr") -> Any:
+        self._expression(_expr.left)
+        self._expression(_expr.right)
+
+    def visit_grouping_expr(self, _expr: "expr.GroupingExpr") -> Any:
+        self._expression(_expr.expression)
+
+    def visit_literal_expr(self, _expr: "expr.LiteralExpr") -> Any:
+        return None
+
+    def visit_unary_expr(self, _expr: "expr.UnaryExpr") -> Any:
+        self._expression(_expr.right)
+
+    def visit_variable_expr(self, _expr: "expr.VariableExpr") -> Any:
+        _expr.depth, _expr.slot = self._lookup(_expr.name.lexeme)
+
+    def visit_block_stmt(self, _stmt: "stmt.BlockStmt") -> Any:
+        if stmt.VarStmt not in map(type, _stmt.statements):
+            _stmt.size = 0
+            self._sequence(_stmt.statements)
+            return
+        _stmt.size = len(self._block(_stmt.statements))
+
+    def visit_expression_stmt(self, _stmt: "stmt.ExpressionStmt") -> Any:
+        self._expression(_stmt.expression)
+
+    def visit_print_stmt(self, _stmt: "stmt.PrintStmt") -> Any:
+        self._expression(_stmt.expression)
+
+    def visit_var_stmt(self, _stmt: "stmt.VarStmt") -> Any:
+        # The initializer still sees the variables of the enclosing scopes.
+        if _stmt.initializer is not None:
+            self._expression(_stmt.initializer)
+        if self._scopes:
+            scope = self._scopes[-1]
+            name = _stmt.name.lexeme
+            if name in scope:
+                # Redeclaring a variable in the same block reuses its slot.
+                _stmt.slot = scope[name]
+                return
+            _stmt.slot = scope[name] = len(scope)
+            declarations = self._declarations.setdefault(name, [])
+            declarations.append((len(self._scopes) - 1, _stmt.slot))
+
+    def _leave(self, scope: dict[str, int]) -> None:
+        for name in scope:
+            self._declarations[name].pop()
+
+    def _lookup(self, name: str) -> tuple[int, int]:
+        """The depth and the slot of the variable a name refers to."""
+        declarations = self._declarations.get(name)
+        if declarations:
+            scope, slot = declarations[-1]
+            return len(self._scopes) - 1 - scope, slot
+        return len(self._scopes), -1
+
+
+expr.Visitor.register(Resolver)
+stmt.Visitor.register(Resolver)
@@ -0,0 +1,76 @@
+"""Ropes
+
+Long strings built by concatenation are kept as `Rope`s, trees of the
+strings they are made of, and only joined when their text is needed, so
+building a string by appending to it again and again takes linear time
+instead of quadratic.
+"""
+
+# The length from which a concatenation makes a rope: copying shorter
+# strings is cheaper than keeping them apart.
+THRESHOLD = 256
+
+
+class Rope:
+    """A string made of two others, joined on demand.
+
+    It compares, hashes, adds and converts to `str` like its text, which it
+    keeps once it is joined, dropping its parts.
+    """
+
+    __slots__ = ("left", "right", "_length", "text")
+
+    def __init__(self, left: "str | Rope", right: "str | Rope") -> None:
+        self.left: str | Rope | None = left
+        self.right: str | Rope | None = right
+        self._length = len(left) + len(right)
+        self.text: str | None = None
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __str__(self) -> str:
+        if self.text is None:
+            self.text = self._join()
+            self.left = self.right = None
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"Rope({str(self)!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (str, Rope)):
+            return len(self) == len(other) and str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    def __add__(self, other: "str | Rope") -> "str | Rope":
+        return concat(self, other)
+
+    def __radd__(self, other: str) -> "str | Rope":
+        return concat(other, self)
+
+    def _join(self) -> str:
+        """Join the strings of the tree, without recursing, as the trees
+        built by appending are as deep as their number of parts."""
+        parts: list[str] = []
+        stack: list[str | Rope | None] = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            elif node is not None and node.text is not None:
+                parts.append(node.text)
+            elif node is not None:
+                stack.append(node.right)
+                stack.append(node.left)
+        return "".join(parts)
+
+
+def concat(left: str | Rope, right: str | Rope) -> str | Rope:
+    """Concatenate two strings, into a rope if they are long."""
+    if len(left) + len(right) < THRESHOLD:
+        return str(left) + str(right)
+    return Rope(left, right)
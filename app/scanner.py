@@ -4,21 +4,53 @@ This module contains the functionality to scan a string.
 
 """
 
+import multiprocessing
+import re
 import sys
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, TextIO
 
-from .tokens import KEYWORDS, Token, TokenType
+from .tokens import KEYWORDS, Token, TokenBuffer, TokenType
 
 
+class SymbolTable:
+    """Interns the identifiers (and optionally strings) of a compilation.
+
+    Equal names share a single string object, which saves memory and lets
+    dictionary lookups of those names succeed on the identity check.
+    """
+
+    def __init__(self) -> None:
+        self._symbols: dict[str, str] = {}
+        self.total: int = 0
+
+    @property
+    def unique(self) -> int:
+        """Number of distinct symbols."""
+        return len(self._symbols)
+
+    def intern(self, text: str) -> str:
+        """Return the shared copy of text."""
+        self.total += 1
+        return self._symbols.setdefault(text, text)
+
+
+# pylint: disable-next=too-many-instance-attributes
 class Scanner:
     """Scanner"""
 
-    def __init__(self, source: str) -> None:
+    def __init__(
+        self, source: str, intern_strings: bool = False, line: int = 1
+    ) -> None:
         self._source: str = source
         self._start: int = 0
         self._current: int = 0
-        self._line: int = 1
+        self._line: int = line
         self._tokens: list[Token] = []
+        self._intern_strings = intern_strings
         self.lexical_errors: list[str] = []
+        self.symbols = SymbolTable()
 
     def _is_at_end(self) -> bool:
         """Check if we are at the end of the source."""
@@ -33,6 +65,29 @@ class Scanner:
         self._tokens.append(Token(TokenType.EOF, "", None, self._line))
         return self._tokens
 
+    def iter_tokens(self) -> Iterator[Token]:
+        """Scan the contents lazily, yielding each token once it is found."""
+        for _, token in self.positioned_tokens():
+            yield token
+
+    def positioned_tokens(self) -> Iterator[tuple[int, Token]]:
+        """Scan the contents lazily, yielding each token together with its
+        start offset."""
+        pending = self._tokens
+        while not self._is_at_end():
+            self._start = self._current
+            self._scan_token()
+            if pending:
+                yield self._start, pending.pop()
+        yield self._current, Token(TokenType.EOF, "", None, self._line)
+
+    def scan_buffer(self) -> TokenBuffer:
+        """Scan the contents into a compact `TokenBuffer`."""
+        buffer = TokenBuffer(self._source)
+        for start, token in self.positioned_tokens():
+            buffer.append(token.type, start, self._current - start, token.line)
+        return buffer
+
     def _scan_token(self) -> None:
         """Scan a token."""
         c: str = self._advance()
@@ -131,6 +186,8 @@ class Scanner:
     def _add_token(self, token_type: TokenType, literal: object = None) -> None:
         """Add a token to the token list."""
         text: str = self._source[self._start : self._current]
+        if token_type == TokenType.IDENTIFIER:
+            text = self.symbols.intern(text)
         self._tokens.append(Token(token_type, text, literal, self._line))
 
     def _lexical_error(self, msg: str) -> None:
@@ -157,6 +214,8 @@ class Scanner:
 
         # Trim the surrounding quotes.
         value = self._source[self._start + 1 : self._current - 1]
+        if self._intern_strings:
+            value = self.symbols.intern(value)
         self._add_token(TokenType.STRING, value)
 
     def _number(self) -> None:
@@ -194,6 +253,185 @@ class Scanner:
         self._add_token(token_type)
 
 
+# One alternative per lexeme class. The number and identifier alternatives
+# refuse to stop in front of a non-ASCII character so that those (rare)
+# lexemes are left to the reference implementation.
+_NON_ASCII = r"[^\x00-\x7f]"
+_LEXEME_PATTERN = re.compile(
+    rf"""
+    (?P<IDENTIFIER>[A-Za-z_][A-Za-z0-9_]*+)(?!{_NON_ASCII})
+    |(?P<WHITESPACE>[ \t\r]+)
+    |(?P<COMMENT>//[^\n]*)
+    |(?P<PUNCTUATOR>[!=<>]=?|[(){{}},.\-+;*/])
+    |(?P<NEWLINE>\n+)
+    |(?P<NUMBER>[0-9]++(?:\.[0-9]++)?+)(?!{_NON_ASCII}|\.{_NON_ASCII})
+    |(?P<STRING>"[^"]*"?)
+    """,
+    re.VERBOSE,
+)
+
+_PUNCTUATORS: dict[str, TokenType] = {
+    "(": TokenType.LEFT_PAREN,
+    ")": TokenType.RIGHT_PAREN,
+    "{": TokenType.LEFT_BRACE,
+    "}": TokenType.RIGHT_BRACE,
+    ",": TokenType.COMMA,
+    ".": TokenType.DOT,
+    "-": TokenType.MINUS,
+    "+": TokenType.PLUS,
+    ";": TokenType.SEMICOLON,
+    "/": TokenType.SLASH,
+    "*": TokenType.STAR,
+    "!": TokenType.BANG,
+    "!=": TokenType.BANG_EQUAL,
+    "=": TokenType.EQUAL,
+    "==": TokenType.EQUAL_EQUAL,
+    ">": TokenType.GREATER,
+    ">=": TokenType.GREATER_EQUAL,
+    "<": TokenType.LESS,
+    "<=": TokenType.LESS_EQUAL,
+}
+
+
+class FastScanner(Scanner):
+    """Scanner that consumes a whole lexeme per step.
+
+    It produces the same tokens and lexical errors as `Scanner`, but matches
+    each lexeme with a single compiled regular expression instead of walking
+    the source one character at a time. Anything the expression does not
+    cover (unexpected or non-ASCII characters) is delegated, one token at a
+    time, to the character based implementation.
+    """
+
+    def scan_tokens(self) -> list[Token]:
+        """Scan the contents."""
+        self._tokens = list(self.iter_tokens())
+        return self._tokens
+
+    # pylint: disable-next=too-many-locals
+    def iter_tokens(self) -> Iterator[Token]:
+        """Scan the contents lazily, yielding each token once it is found."""
+        source = self._source
+        length = len(source)
+        pending = self._tokens
+        match = _LEXEME_PATTERN.match
+        punctuators = _PUNCTUATORS
+        keywords = KEYWORDS
+        intern = self.symbols.intern
+        intern_strings = self._intern_strings
+        line = self._line
+        pos = self._current
+
+        while pos < length:
+            m = match(source, pos)
+            if m is None:
+                self._start = self._current = pos
+                self._line = line
+                self._scan_token()
+                pos = self._current
+                line = self._line
+                if pending:
+                    yield from pending
+                    pending.clear()
+                continue
+
+            kind = m.lastgroup
+            text = m.group()
+            pos = m.end()
+            if kind == "IDENTIFIER":
+                token_type = keywords.get(text, TokenType.IDENTIFIER)
+                if token_type == TokenType.IDENTIFIER:
+                    text = intern(text)
+                yield Token(token_type, text, None, line)
+            elif kind == "PUNCTUATOR":
+                yield Token(punctuators[text], text, None, line)
+            elif kind == "NEWLINE":
+                line += len(text)
+            elif kind == "NUMBER":
+                yield Token(TokenType.NUMBER, text, float(text), line)
+            elif kind == "STRING":
+                line += text.count("\n")
+                if len(text) > 1 and text[-1] == '"':
+                    value = text[1:-1]
+                    if intern_strings:
+                        value = intern(value)
+                    yield Token(TokenType.STRING, text, value, line)
+                else:
+                    self._start = m.start()
+                    self._line = line
+                    self._lexical_error("Unterminated string.")
+            # Whitespace and comments produce no tokens.
+
+        self._current = pos
+        self._line = line
+        yield Token(TokenType.EOF, "", None, line)
+
+    # pylint: disable-next=too-many-locals,too-many-statements
+    def scan_buffer(self) -> TokenBuffer:
+        """Scan the contents into a compact `TokenBuffer`."""
+        source = self._source
+        length = len(source)
+        buffer = TokenBuffer(source)
+        append = buffer.append
+        match = _LEXEME_PATTERN.match
+        punctuators = _PUNCTUATORS
+        keywords = KEYWORDS
+        intern = self.symbols.intern
+        line = self._line
+        pos = self._current
+
+        while pos < length:
+            start = pos
+            m = match(source, pos)
+            if m is None:
+                self._start = self._current = pos
+                self._line = line
+                self._scan_token()
+                pos = self._current
+                line = self._line
+                if self._tokens:
+                    token = self._tokens.pop()
+                    append(token.type, start, pos - start, token.line)
+                continue
+
+            kind = m.lastgroup
+            pos = m.end()
+            if kind == "IDENTIFIER":
+                text = m.group()
+                token_type = keywords.get(text, TokenType.IDENTIFIER)
+                if token_type == TokenType.IDENTIFIER:
+                    intern(text)
+                append(token_type, start, pos - start, line)
+            elif kind == "PUNCTUATOR":
+                append(punctuators[m.group()], start, pos - start, line)
+            elif kind == "NEWLINE":
+                line += pos - start
+            elif kind == "NUMBER":
+                append(TokenType.NUMBER, start, pos - start, line)
+            elif kind == "STRING":
+                text = m.group()
+                line += text.count("\n")
+                if len(text) > 1 and text[-1] == '"':
+                    if self._intern_strings:
+                        intern(text[1:-1])
+                    append(TokenType.STRING, start, pos - start, line)
+                else:
+                    self._start = start
+                    self._line = line
+                    self._lexical_error("Unterminated string.")
+
+        self._current = pos
+        self._line = line
+        append(TokenType.EOF, pos, 0, line)
+        return buffer
+
+
+SCANNERS: dict[str, type[Scanner]] = {
+    "default": Scanner,
+    "fast": FastScanner,
+}
+
+
 def isalpha(c: str) -> bool:
     """Check if c is alphabetic or _"""
     return c.isalpha() or c == "_"
@@ -204,26 +442,101 @@ def isalphanumeric(c: str) -> bool:
     return isalpha(c) or c.isdigit()
 
 
-def tokenize_cmd(content: str) -> None:
-    """Tokenize and print the content."""
+def tokenize_cmd(
+    content: str,
+    engine: str = "default",
+    compact: bool = False,
+    stats: bool = False,
+    workers: int = 1,
+) -> None:
+    """Tokenize and print the content.
+
+    With more than one worker the content is scanned with `scan_parallel`.
+    """
     if content:
-        tokens, lexical_errors = scan(content)
+        symbols = None
+        tokens: Iterable[Token]
+        if workers > 1:
+            tokens, lexical_errors = scan_parallel(content, workers, engine)
+        else:
+            sc = make_scanner(content, engine)
+            tokens = sc.scan_buffer() if compact else sc.scan_tokens()
+            lexical_errors = sc.lexical_errors
+            symbols = sc.symbols
         print_lexical_errors(lexical_errors)
         print_tokens(tokens)
+        if stats and symbols is not None:
+            print_symbol_stats(symbols)
         if lexical_errors:
             sys.exit(65)
     else:
         print("EOF  null")
 
 
-def tokens_to_string(tokens: list[Token]) -> str:
+def tokens_to_string(tokens: Iterable[Token]) -> str:
     """Transform a list of tokens in a string."""
     return "\n".join([str(x) for x in tokens])
 
 
-def print_tokens(tokens: list[Token]) -> None:
+def print_tokens(tokens: Iterable[Token]) -> None:
     """Print a list of tokens."""
-    print(tokens_to_string(tokens))
+    write_tokens(tokens, sys.stdout)
+
+
+# Size, in characters, of the pieces `write_tokens` writes at once.
+WRITE_CHUNK = 1 << 16
+
+# Tokens whose line depends on more than their type.
+_VARIABLE_TYPES = frozenset(
+    (TokenType.IDENTIFIER, TokenType.STRING, TokenType.NUMBER)
+)
+
+
+def write_tokens(tokens: Iterable[Token], stream: TextIO) -> None:
+    """Write tokens to a stream, one per line, like `tokens_to_string`.
+
+    The lines are gathered in chunks of about `WRITE_CHUNK` characters that
+    are encoded and written straight to the binary buffer of the stream when
+    it has one. Keywords and punctuators are rendered once per type.
+    """
+    stream.flush()
+    binary = getattr(stream, "buffer", None)
+    encoding = stream.encoding or "utf-8"
+    errors = stream.errors or "strict"
+    rendered: dict[TokenType, str] = {}
+    lines: list[str] = []
+    size = 0
+    append = lines.append
+    for token in tokens:
+        kind = token.type
+        line = rendered.get(kind)
+        if line is None:
+            if kind is TokenType.IDENTIFIER:
+                line = f"IDENTIFIER {token.lexeme} null\n"
+            elif kind in _VARIABLE_TYPES:
+                line = f"{token}\n"
+            else:
+                line = rendered[kind] = f"{token}\n"
+        append(line)
+        size += len(line)
+        if size >= WRITE_CHUNK:
+            _write_chunk(stream, binary, "".join(lines), encoding, errors)
+            lines.clear()
+            size = 0
+    _write_chunk(stream, binary, "".join(lines), encoding, errors)
+
+
+def _write_chunk(
+    stream: TextIO,
+    binary: BinaryIO | None,
+    chunk: str,
+    encoding: str,
+    errors: str,
+) -> None:
+    if binary is None:
+        stream.write(chunk)
+    else:
+        binary.write(chunk.encode(encoding, errors))
 
 
 def print_lexical_errors(errors: list[str]) -> None:
@@ -232,10 +545,145 @@ def print_lexical_errors(errors: list[str]) -> None:
         print(error, file=sys.stderr)
 
 
-def scan(contents: str) -> tuple[list[Token], list[str]]:
+def print_symbol_stats(symbols: SymbolTable) -> None:
+    """Print how many of the interned symbols are distinct."""
+    print(
+        f"symbols: {symbols.unique} unique / {symbols.total} total",
+        file=sys.stderr,
+    )
+
+
+def make_scanner(
+    contents: str, engine: str = "default", line: int = 1
+) -> Scanner:
+    """Create a scanner for the contents using one of the `SCANNERS`."""
+    return SCANNERS[engine](contents, line=line)
+
+
+def scan(
+    contents: str, engine: str = "default"
+) -> tuple[list[Token], list[str]]:
     """Scan a string.
 
     Return a tuple containing the list of tokens and
     the list of lexical errors"""
-    sc = Scanner(contents)
+    sc = make_scanner(contents, engine)
     return sc.scan_tokens(), sc.lexical_errors
+
+
+def scan_buffer(
+    contents: str, engine: str = "default"
+) -> tuple[TokenBuffer, list[str]]:
+    """Scan a string into a compact `TokenBuffer`.
+
+    Return a tuple containing the token buffer and
+    the list of lexical errors"""
+    sc = make_scanner(contents, engine)
+    return sc.scan_buffer(), sc.lexical_errors
+
+
+# Below this size a process pool costs more than it saves.
+PARALLEL_MIN_CHUNK = 1 << 16
+
+_UNTERMINATED = "Error: Unterminated string."
+
+
+def scan_parallel(
+    contents: str, workers: int, engine: str = "fast"
+) -> tuple[TokenBuffer, list[str]]:
+    """Scan a string with a pool of processes.
+
+    The contents are split at newlines into chunks that are scanned
+    independently. Only strings can span a newline, so a chunk whose scan
+    ends inside an unterminated string is stitched to the next one by
+    re-scanning from the opening quote. The tokens and lexical errors are
+    the same as the ones of `scan_buffer`.
+    """
+    chunks = min(workers * 4, len(contents) // PARALLEL_MIN_CHUNK)
+    if workers < 2 or chunks < 2:
+        return scan_buffer(contents, engine)
+
+    bounds = _chunk_bounds(contents, chunks)
+    lines = [1]
+    for start, end in zip(bounds, bounds[1:-1]):
+        lines.append(lines[-1] + contents.count("\n", start, end))
+
+    # Forking a process that runs the pool's threads is unsafe.
+    context = multiprocessing.get_context("forkserver")
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        results = list(
+            pool.map(
+                _scan_chunk,
+                [
+                    (contents[start:end], line, engine)
+                    for start, end, line in zip(bounds, bounds[1:], lines)
+                ],
+            )
+        )
+
+    merged, errors = _merge_chunks(contents, bounds, results, engine)
+    eof_line = lines[-1] + contents.count("\n", bounds[-2])
+    merged.append(TokenType.EOF, len(contents), 0, eof_line)
+    return merged, errors
+
+
+def _merge_chunks(
+    contents: str,
+    bounds: list[int],
+    results: list[tuple[TokenBuffer, list[str], int | None]],
+    engine: str,
+) -> tuple[TokenBuffer, list[str]]:
+    """Merge the tokens and errors of the chunks, but the end of file,
+    stitching the strings that span chunks."""
+    merged = TokenBuffer(contents)
+    errors: list[str] = []
+    pending: int | None = None
+    for index, result in enumerate(results):
+        if pending is None:
+            base = bounds[index]
+        else:
+            # The chunk starts inside a string: scan it again from the quote.
+            base = pending
+            line = contents.count("\n", 0, pending) + 1
+            result = _scan_chunk(
+                (contents[pending : bounds[index + 1]], line, engine)
+            )
+        buffer, chunk_errors, unterminated = result
+        merged.extend(buffer, base, len(buffer) - 1)
+        pending = None
+        if unterminated is not None and index + 1 < len(results):
+            chunk_errors.pop()
+            pending = base + unterminated
+        errors.extend(chunk_errors)
+    return merged, errors
+
+
+def _chunk_bounds(contents: str, chunks: int) -> list[int]:
+    """Offsets that split the contents at newlines in about equal chunks."""
+    bounds = [0]
+    size = len(contents) // chunks
+    for _ in range(chunks - 1):
+        newline = contents.find("\n", bounds[-1] + size)
+        if newline == -1:
+            break
+        bounds.append(newline + 1)
+    if bounds[-1] != len(contents):
+        bounds.append(len(contents))
+    return bounds
+
+
+def _scan_chunk(
+    chunk: tuple[str, int, str],
+) -> tuple[TokenBuffer, list[str], int | None]:
+    """Scan a chunk starting at the given line.
+
+    Return its tokens, its lexical errors and, if it ends inside an
+    unterminated string, the offset of the opening quote.
+    """
+    contents, line, engine = chunk
+    sc = make_scanner(contents, engine, line)
+    buffer = sc.scan_buffer()
+    unterminated = None
+    if sc.lexical_errors and sc.lexical_errors[-1].endswith(_UNTERMINATED):
+        unterminated = sc._start  # pylint: disable=protected-access
+    return buffer, sc.lexical_errors, unterminated
@@ -3,7 +3,11 @@
 This module contains the functionality to manage tokens.
 """
 
+from array import array
+from collections import deque
+from collections.abc import Iterable, Iterator
 from enum import Enum, auto
+from typing import Protocol
 
 
 class TokenType(Enum):
@@ -61,6 +65,8 @@ class TokenType(Enum):
 class Token:
     """Token"""
 
+    __slots__ = ("type", "lexeme", "literal", "line")
+
     def __init__(
         self, token_type: TokenType, lexeme: str, literal: object, line: int
     ):
@@ -115,3 +121,114 @@ KEYWORDS: dict[str, TokenType] = {
     "var": TokenType.VAR,
     "while": TokenType.WHILE,
 }
+
+
+class TokenSequence(Protocol):
+    """Anything the parser can read tokens from by index."""
+
+    def __getitem__(self, index: int) -> Token: ...
+
+
+class TokenStream:
+    """Indexable view over tokens that are produced lazily.
+
+    Tokens are pulled from the underlying iterable on demand and only the
+    last `window` of them are kept, which is enough for a parser that looks
+    at the current and the previous token.
+    """
+
+    def __init__(self, tokens: Iterable[Token], window: int = 2) -> None:
+        self._tokens = iter(tokens)
+        self._buffer: deque[Token] = deque(maxlen=window)
+        self._next = 0
+
+    def __getitem__(self, index: int) -> Token:
+        while index >= self._next:
+            self._buffer.append(next(self._tokens))
+            self._next += 1
+        offset = index - self._next
+        if offset < -len(self._buffer):
+            raise IndexError(f"token {index} is no longer buffered")
+        return self._buffer[offset]
+
+
+_TOKEN_TYPES: dict[int, TokenType] = {t.value: t for t in TokenType}
+
+
+class TokenBuffer:
+    """Compact, struct-of-arrays storage for the tokens of a source.
+
+    Every token is kept as four integers (type, start offset, length and
+    line) in `array` columns. `Token` objects, their lexemes and literals
+    are only materialized from the source when a token is accessed, so the
+    buffer can be handed to the parser in place of a list of tokens.
+    """
+
+    def __init__(self, source: str) -> None:
+        self._source = source
+        self._types = array("B")
+        self._starts = array("I")
+        self._lengths = array("I")
+        self._lines = array("I")
+        self._recent: dict[int, Token] = {}
+
+    def __getstate__(self) -> dict[str, object]:
+        state = self.__dict__.copy()
+        state["_recent"] = {}
+        return state
+
+    def append(
+        self, token_type: TokenType, start: int, length: int, line: int
+    ) -> None:
+        """Add a token given its position in the source."""
+        self._types.append(token_type.value)
+        self._starts.append(start)
+        self._lengths.append(length)
+        self._lines.append(line)
+
+    def extend(self, other: "TokenBuffer", offset: int, count: int) -> None:
+        """Add the first count tokens of a buffer over a part of the source
+        that starts at offset."""
+        # pylint: disable=protected-access
+        self._types.extend(other._types[:count])
+        self._starts.extend(start + offset for start in other._starts[:count])
+        self._lengths.extend(other._lengths[:count])
+        self._lines.extend(other._lines[:count])
+
+    def __len__(self) -> int:
+        return len(self._types)
+
+    def __getitem__(self, index: int) -> Token:
+        token = self._recent.get(index)
+        if token is None:
+            if len(self._recent) > 4:
+                self._recent.clear()
+            token = self._recent[index] = self._materialize(index)
+        return token
+
+    def __iter__(self) -> Iterator[Token]:
+        for index in range(len(self._types)):
+            yield self._materialize(index)
+
+    def token_type(self, index: int) -> TokenType:
+        """Return the type of a token without materializing it."""
+        return _TOKEN_TYPES[self._types[index]]
+
+    def start(self, index: int) -> int:
+        """Return the offset in the source where a token starts."""
+        return self._starts[index]
+
+    def lexeme(self, index: int) -> str:
+        """Return the lexeme of a token."""
+        start = self._starts[index]
+        return self._source[start : start + self._lengths[index]]
+
+    def _materialize(self, index: int) -> Token:
+        token_type = _TOKEN_TYPES[self._types[index]]
+        lexeme = self.lexeme(index)
+        literal: object = None
+        if token_type == TokenType.NUMBER:
+            literal = float(lexeme)
+        elif token_type == TokenType.STRING:
+            literal = lexeme[1:-1]
+        return Token(token_type, lexeme, literal, self._lines[index])
@@ -25,12 +25,14 @@ def main() -> None:
             ast = define_ast(
                 basename,
                 [
-                    "Assign   : Token name, Expr value",
-                    "Binary   : Expr left, Token operator, Expr right",
+                    "Assign   : Token name, Expr value, int depth=-1, "
+                    "int slot=-1",
+                    "Binary   : Expr left, Token operator, Expr right, "
+                    "bool proven=False",
                     "Grouping : Expr expression",
                     "Literal  : object value",
-                    "Unary    : Token operator, Expr right",
-                    "Variable : Token name",
+                    "Unary    : Token operator, Expr right, bool proven=False",
+                    "Variable : Token name, int depth=-1, int slot=-1",
                 ],
             )
 
@@ -42,10 +44,11 @@ def main() -> None:
             ast = define_ast(
                 basename,
                 [
-                    "Block      : list[Stmt|None] statements",
+                    "Block      : list[Stmt|None] statements, int size=-1",
                     "Expression : Expr expression",
                     "Print      : Expr expression",
-                    "Var        : Token name, Expr|None initializer",
+                    "Var        : Token name, Expr|None initializer, "
+                    "int slot=-1",
                 ],
             )
             path = Path(output_dir) / f"{basename.lower()}.py"
@@ -64,6 +67,7 @@ def define_ast(basename: str, types: list[str]) -> list[str]:
         '"""Auto generated code to produce an ast."""\n',
         "\n",
         "import abc\n",
+        "from collections.abc import Callable\n",
         "from typing import Any\n",
         "\n",
         "from app.tokens import Token\n\n",
@@ -79,6 +83,7 @@ def define_ast(basename: str, types: list[str]) -> list[str]:
         [
             f"class {basename}(abc.ABC):\n",
             f'    """Class {basename}."""\n',
+            "    __slots__ = ()\n",
             "    @abc.abstractmethod\n",
             "    def accept(self, visitor: Visitor) -> Any:\n",
             '        """Accept the node."""\n',
@@ -91,27 +96,51 @@ def define_ast(basename: str, types: list[str]) -> list[str]:
         classname = _type.split(":")[0].strip()
         fields = _type.split(":")[1].strip()
         ast.extend(define_type(basename, classname, fields))
-    # Remove the last two extra lines.
-    del ast[-2:]
+
+    ast.extend(define_dispatch_table(basename, types))
     return ast
 
 
+def define_dispatch_table(basename: str, types: list[str]) -> list[str]:
+    """Generate a function that maps the node classes to visitor methods."""
+    table = [
+        "def dispatch_table(\n",
+        "    visitor: Visitor,\n",
+        f") -> dict[type[{basename}], Callable[[Any], Any]]:\n",
+        '    """Map every node class to the method of the visitor that visits',
+        ' it."""\n',
+        "    return {\n",
+    ]
+    for _type in types:
+        typename = _type.split(":")[0].strip()
+        table.append(
+            f"        {typename}{basename}: "
+            f"visitor.visit_{typename.lower()}_{basename.lower()},\n"
+        )
+    table.append("    }\n")
+    return table
+
+
 def define_type(basename: str, classname: str, fieldlist: str) -> list[str]:
     """Define the types."""
+    fields = [split_field(field) for field in fieldlist.split(", ")]
     fieldnames = [
-        f"{field.split(" ")[1]}: {" | ".join(field.split(" ")[0].split("|"))}"
-        for field in fieldlist.split(", ")
+        f"{name}: {annotation}{f" = {default}" if default else ""}"
+        for annotation, name, default in fields
     ]
+    slots = ", ".join(f'"{name}"' for _, name, _ in fields)
+    if len(fields) == 1:
+        slots += ","
     _type = [
         f"class {classname}{basename}({basename}):\n",
         f'    """Class {classname}{basename}."""\n',
         "\n",
+        f"    __slots__ = ({slots})\n",
+        "\n",
         f"    def __init__(self, {", ".join(fieldnames)}) -> None:\n",
     ]
 
-    fields = fieldlist.split(", ")
-    for field in fields:
-        name = field.split(" ")[1]
+    for _, name, _ in fields:
         _type.append(f"        self.{name} = {name}\n")
     _type.append("\n")
 
@@ -127,6 +156,14 @@ def define_type(basename: str, classname: str, fieldlist: str) -> list[str]:
     return _type
 
 
+def split_field(field: str) -> tuple[str, str, str]:
+    """Split a field like `Expr|None name` or `int slot=-1` into its type
+    annotation, its name and its default value (empty if it has none)."""
+    _type, declaration = field.split(" ")
+    name, _, default = declaration.partition("=")
+    return " | ".join(_type.split("|")), name, default
+
+
 def define_visitor(basename: str, types: list[str]) -> list[str]:
     """Generate the abstract class Visitor."""
 
@@ -0,0 +1,498 @@
+"""Bytecode virtual machine
+
+A compiler from resolved syntax trees to bytecode and a stack machine that
+runs it, as an alternative to walking the tree.
+"""
+
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from enum import IntEnum
+from typing import Any
+
+from gen import expr, stmt
+
+from . import parser
+from .exceptions import InterpreterError
+from .interpreter import Interpreter, isequal, stringify
+from .output import OutputSink
+from .resolver import Resolver
+from .tokens import Token, TokenType
+
+
+class OpCode(IntEnum):
+    """Instructions.
+
+    The ones from EXTENDED_ARG on are followed by a two byte little endian
+    operand; an EXTENDED_ARG provides the high bits of the next operand.
+    """
+
+    RETURN = 0
+    POP = 1
+    NIL = 2
+    TRUE = 3
+    FALSE = 4
+    EQUAL = 5
+    NOT_EQUAL = 6
+    GREATER = 7
+    GREATER_EQUAL = 8
+    LESS = 9
+    LESS_EQUAL = 10
+    ADD = 11
+    SUBTRACT = 12
+    MULTIPLY = 13
+    DIVIDE = 14
+    NOT = 15
+    NEGATE = 16
+    PRINT = 17
+    EXTENDED_ARG = 18
+    CONSTANT = 19
+    DEFINE_GLOBAL = 20
+    GET_GLOBAL = 21
+    SET_GLOBAL = 22
+    GET_LOCAL = 23
+    SET_LOCAL = 24
+    STORE_LOCAL = 25
+
+
+# Plain ints, as comparing with enum members is twice as slow in the loop.
+(
+    _RETURN,
+    _POP,
+    _NIL,
+    _TRUE,
+    _FALSE,
+    _EQUAL,
+    _NOT_EQUAL,
+    _GREATER,
+    _GREATER_EQUAL,
+    _LESS,
+    _LESS_EQUAL,
+    _ADD,
+    _SUBTRACT,
+    _MULTIPLY,
+    _DIVIDE,
+    _NOT,
+    _NEGATE,
+    _PRINT,
+    _EXTENDED_ARG,
+    _CONSTANT,
+    _DEFINE_GLOBAL,
+    _GET_GLOBAL,
+    _SET_GLOBAL,
+    _GET_LOCAL,
+    _SET_LOCAL,
+    _STORE_LOCAL,
+) = map(int, OpCode)
+
+_BINARY_OPCODES = {
+    TokenType.EQUAL_EQUAL: OpCode.EQUAL,
+    TokenType.BANG_EQUAL: OpCode.NOT_EQUAL,
+    TokenType.GREATER: OpCode.GREATER,
+    TokenType.GREATER_EQUAL: OpCode.GREATER_EQUAL,
+    TokenType.LESS: OpCode.LESS,
+    TokenType.LESS_EQUAL: OpCode.LESS_EQUAL,
+    TokenType.PLUS: OpCode.ADD,
+    TokenType.MINUS: OpCode.SUBTRACT,
+    TokenType.STAR: OpCode.MULTIPLY,
+    TokenType.SLASH: OpCode.DIVIDE,
+}
+
+# The instructions whose operand is the index of a constant.
+_CONSTANT_OPCODES = {
+    OpCode.CONSTANT,
+    OpCode.DEFINE_GLOBAL,
+    OpCode.GET_GLOBAL,
+    OpCode.SET_GLOBAL,
+}
+
+
+class Chunk:
+    """Bytecode, the constants it uses and the lines it comes from.
+
+    The line table only has an entry where the line changes.
+    """
+
+    __slots__ = ("code", "constants", "slots", "_indices", "_starts", "_lines")
+
+    def __init__(self) -> None:
+        self.code = bytearray()
+        self.constants: list[Any] = []
+        # The number of local variable slots the code needs.
+        self.slots = 0
+        self._indices: dict[tuple[type, object], int] = {}
+        self._starts = array("L")
+        self._lines = array("L")
+
+    def write(self, opcode: OpCode, line: int, operand: int = -1) -> None:
+        """Append an instruction."""
+        if operand > 0xFFFF:
+            self.write(OpCode.EXTENDED_ARG, line, operand >> 16)
+            operand &= 0xFFFF
+        if not self._lines or self._lines[-1] != line:
+            self._starts.append(len(self.code))
+            self._lines.append(line)
+        if operand < 0:
+            self.code.append(opcode)
+        else:
+            self.code += bytes((opcode, operand & 0xFF, operand >> 8))
+
+    def constant(self, value: object) -> int:
+        """The index of a constant, added if it is new."""
+        # The repr of a number tells apart 0 and -0, which compare equal.
+        key = (type(value), repr(value) if isinstance(value, float) else value)
+        index = self._indices.get(key)
+        if index is None:
+            index = self._indices[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def line(self, offset: int) -> int:
+        """The line of the instruction at offset."""
+        return self._lines[bisect_right(self._starts, offset) - 1]
+
+
+class Compiler(expr.Visitor, stmt.Visitor):
+    """Compiles resolved nodes into a chunk.
+
+    Blocks cannot be re-entered, so every frame of local variables sits at
+    a fixed offset of a single array of slots and each local variable gets
+    an absolute slot.
+    """
+
+    def __init__(self, chunk: Chunk) -> None:
+        self.chunk = chunk
+        # The first slot of the frames being compiled, innermost last.
+        self._bases: list[int] = []
+        self._top = 0
+        self._line = 1
+        self._expressions = expr.dispatch_table(self)
+        self._statements = stmt.dispatch_table(self)
+
+    def expression(self, _expr: expr.Expr) -> None:
+        """Compile an expression that leaves its value on the stack."""
+        self._expressions[type(_expr)](_expr)
+
+    def statement(self, _stmt: stmt.Stmt) -> None:
+        """Compile a statement."""
+        self._statements[type(_stmt)](_stmt)
+
+    def end(self) -> None:
+        """Compile the return from the code compiled so far."""
+        self.chunk.write(OpCode.RETURN, self._line)
+
+    def visit_assign_expr(self, _expr: "expr.AssignExpr") -> None:
+        self.expression(_expr.value)
+        self._line = _expr.name.line
+        if _expr.slot < 0:
+            index = self.chunk.constant(_expr.name.lexeme)
+            self.chunk.write(OpCode.SET_GLOBAL, self._line, index)
+        else:
+            slot = self._bases[-1 - _expr.depth] + _expr.slot
+            self.chunk.write(OpCode.SET_LOCAL, self._line, slot)
+
+    def visit_binary_expr(self, _expr: "expr.BinaryExpr") -> None:
+        # The hottest visit: dispatch inline instead of through expression.
+        expressions = self._expressions
+        expressions[type(_expr.left)](_expr.left)
+        expressions[type(_expr.right)](_expr.right)
+        self._line = _expr.operator.line
+        self.chunk.write(_BINARY_OPCODES[_expr.operator.type], self._line)
+
+    def visit_grouping_expr(self, _expr: "expr.GroupingExpr") -> None:
+        self.expression(_expr.expression)
+
+    def visit_literal_expr(self, _expr: "expr.LiteralExpr") -> None:
+        match _expr.value:
+            case None:
+                self.chunk.write(OpCode.NIL, self._line)
+            case True:
+                self.chunk.write(OpCode.TRUE, self._line)
+            case False:
+                self.chunk.write(OpCode.FALSE, self._line)
+            case value:
+                index = self.chunk.constant(value)
+                self.chunk.write(OpCode.CONSTANT, self._line, index)
+
+    def visit_unary_expr(self, _expr: "expr.UnaryExpr") -> None:
+        self.expression(_expr.right)
+        self._line = _expr.operator.line
+        if _expr.operator.type == TokenType.BANG:
+            self.chunk.write(OpCode.NOT, self._line)
+        else:
+            self.chunk.write(OpCode.NEGATE, self._line)
+
+    def visit_variable_expr(self, _expr: "expr.VariableExpr") -> None:
+        self._line = _expr.name.line
+        if _expr.slot < 0:
+            index = self.chunk.constant(_expr.name.lexeme)
+            self.chunk.write(OpCode.GET_GLOBAL, self._line, index)
+        else:
+            slot = self._bases[-1 - _expr.depth] + _expr.slot
+            self.chunk.write(OpCode.GET_LOCAL, self._line, slot)
+
+    def visit_block_stmt(self, _stmt: "stmt.BlockStmt") -> None:
+        if _stmt.size:
+            self._bases.append(self._top)
+            self._top += _stmt.size
+            self.chunk.slots = max(self.chunk.slots, self._top)
+        for statement in _stmt.statements:
+            if statement is not None:
+                self.statement(statement)
+        if _stmt.size:
+            self._top = self._bases.pop()
+
+    def visit_expression_stmt(self, _stmt: "stmt.ExpressionStmt") -> None:
+        self.expression(_stmt.expression)
+        self.chunk.write(OpCode.POP, self._line)
+
+    def visit_print_stmt(self, _stmt: "stmt.PrintStmt") -> None:
+        self.expression(_stmt.expression)
+        self.chunk.write(OpCode.PRINT, self._line)
+
+    def visit_var_stmt(self, _stmt: "stmt.VarStmt") -> None:
+        if _stmt.initializer is not None:
+            self.expression(_stmt.initializer)
+        else:
+            self.chunk.write(OpCode.NIL, _stmt.name.line)
+        self._line = _stmt.name.line
+        if _stmt.slot < 0:
+            index = self.chunk.constant(_stmt.name.lexeme)
+            self.chunk.write(OpCode.DEFINE_GLOBAL, self._line, index)
+        else:
+            slot = self._bases[-1] + _stmt.slot
+            self.chunk.write(OpCode.STORE_LOCAL, self._line, slot)
+
+
+expr.Visitor.register(Compiler)
+stmt.Visitor.register(Compiler)
+
+
+class VM:
+    """Stack machine that runs chunks.
+
+    The globals and the local slots outlive a run, so a chunk can be run
+    piecewise as it grows. The printed lines are buffered by `output`,
+    which the caller flushes.
+    """
+
+    def __init__(self, output: OutputSink | None = None) -> None:
+        self.output = OutputSink() if output is None else output
+        self.globals: dict[str, object] = {}
+        self._slots: list[object] = []
+        self._stack: list[Any] = []
+
+    # pylint: disable-next=too-many-branches,too-many-statements,too-many-locals
+    def run(self, chunk: Chunk, start: int = 0) -> object:
+        """Run a chunk from an offset up to a RETURN.
+
+        Return the value left on the stack, if any.
+        """
+        code = chunk.code
+        constants = chunk.constants
+        values = self.globals
+        slots = self._slots
+        if len(slots) < chunk.slots:
+            slots.extend([None] * (chunk.slots - len(slots)))
+        stack = self._stack
+        push = stack.append
+        pop = stack.pop
+        write = self.output.write
+        ip = start
+        extended = 0
+        # pylint: disable=unidiomatic-typecheck
+        try:
+            while True:
+                op = code[ip]
+                if op >= _EXTENDED_ARG:
+                    arg = code[ip + 1] | code[ip + 2] << 8 | extended
+                    extended = 0
+                    ip += 3
+                    if op == _GET_LOCAL:
+                        push(slots[arg])
+                    elif op == _CONSTANT:
+                        push(constants[arg])
+                    elif op == _GET_GLOBAL:
+                        try:
+                            push(values[constants[arg]])
+                        except KeyError:
+                            raise _undefined(
+                                chunk, ip - 3, constants[arg]
+                            ) from None
+                    elif op == _SET_LOCAL:
+                        slots[arg] = stack[-1]
+                    elif op == _STORE_LOCAL:
+                        slots[arg] = pop()
+                    elif op == _SET_GLOBAL:
+                        name = constants[arg]
+                        if name not in values:
+                            raise _undefined(chunk, ip - 3, name)
+                        values[name] = stack[-1]
+                    elif op == _DEFINE_GLOBAL:
+                        values[constants[arg]] = pop()
+                    else:
+                        extended = arg << 16
+                    continue
+
+                ip += 1
+                if _GREATER <= op <= _DIVIDE:
+                    b = pop()
+                    a = stack[-1]
+                    if type(a) is float and type(b) is float:
+                        if op == _ADD:
+                            stack[-1] = a + b
+                        elif op == _SUBTRACT:
+                            stack[-1] = a - b
+                        elif op == _MULTIPLY:
+                            stack[-1] = a * b
+                        elif op == _LESS:
+                            stack[-1] = a < b
+                        elif op == _DIVIDE:
+                            stack[-1] = a / b
+                        elif op == _GREATER:
+                            stack[-1] = a > b
+                        elif op == _LESS_EQUAL:
+                            stack[-1] = a <= b
+                        else:
+                            stack[-1] = a >= b
+                    elif op == _ADD and type(a) is str and type(b) is str:
+                        stack[-1] = a + b
+                    elif op == _ADD:
+                        raise _error(
+                            chunk,
+                            ip - 1,
+                            "Operands must be two numbers or two strings.",
+                        )
+                    else:
+                        raise _error(chunk, ip - 1, "Operands must be numbers.")
+                elif op == _POP:
+                    pop()
+                elif op == _PRINT:
+                    write(stringify(pop()))
+                elif op == _EQUAL:
+                    b = pop()
+                    stack[-1] = isequal(stack[-1], b)
+                elif op == _NOT_EQUAL:
+                    b = pop()
+                    stack[-1] = not isequal(stack[-1], b)
+                elif op == _NOT:
+                    a = stack[-1]
+                    stack[-1] = a is None or a is False
+                elif op == _NEGATE:
+                    if type(stack[-1]) is not float:
+                        raise _error(chunk, ip - 1, "Operand must be a number.")
+                    stack[-1] = -stack[-1]
+                elif op == _NIL:
+                    push(None)
+                elif op == _TRUE:
+                    push(True)
+                elif op == _FALSE:
+                    push(False)
+                else:
+                    return pop() if stack else None
+        except InterpreterError:
+            stack.clear()
+            raise
+
+
+def _error(chunk: Chunk, offset: int, message: str) -> InterpreterError:
+    """A runtime error at the instruction at offset.
+
+    Chunks keep lines rather than tokens, so the error gets a token that
+    only carries the line.
+    """
+    token = Token(TokenType.EOF, "", None, chunk.line(offset))
+    return InterpreterError(token, message)
+
+
+def _undefined(chunk: Chunk, offset: int, name: str) -> InterpreterError:
+    return _error(chunk, offset, f"Undefined variable '{name}'.")
+
+
+class VMInterpreter(Interpreter):
+    """Interpreter that compiles statements to bytecode and runs it.
+
+    The output and the runtime errors are the same as the ones of the tree
+    walking `Interpreter`.
+    """
+
+    def __init__(
+        self,
+        _statements: Iterable[stmt.Stmt | None] | None = None,
+        output: OutputSink | None = None,
+    ) -> None:
+        super().__init__(_statements, output)
+        self._vm = VM(self.output)
+
+    def interpret(self) -> None:
+        """Compile and run every top-level statement, as it is resolved."""
+        if self._statements is None:
+            return
+        chunk = Chunk()
+        compiler = Compiler(chunk)
+        try:
+            for statement in Resolver().resolved(self._statements):
+                if statement is not None:
+                    start = len(chunk.code)
+                    compiler.statement(statement)
+                    compiler.end()
+                    self._vm.run(chunk, start)
+        except InterpreterError as e:
+            self.runtime_error(e)
+        finally:
+            self.output.flush()
+
+    def define(self, name: str, value: object) -> None:
+        self._vm.globals[name] = value
+
+    def evaluate(self, _expr: expr.Expr) -> object:
+        chunk = Chunk()
+        compiler = Compiler(chunk)
+        compiler.expression(_expr)
+        compiler.end()
+        return self._vm.run(chunk)
+
+
+def compile_program(statements: Iterable[stmt.Stmt | None]) -> Chunk:
+    """Resolve and compile a program into a single chunk."""
+    chunk = Chunk()
+    compiler = Compiler(chunk)
+    for statement in Resolver().resolved(statements):
+        if statement is not None:
+            compiler.statement(statement)
+    compiler.end()
+    return chunk
+
+
+def disassemble(chunk: Chunk) -> Iterator[str]:
+    """Yield a line describing each instruction of a chunk."""
+    code = chunk.code
+    offset = 0
+    previous_line = -1
+    extended = 0
+    while offset < len(code):
+        opcode = OpCode(code[offset])
+        line = chunk.line(offset)
+        source = f"{line:4d}" if line != previous_line else "   |"
+        previous_line = line
+        text = f"{offset:04d} {source} {opcode.name}"
+        if opcode < OpCode.EXTENDED_ARG:
+            offset += 1
+            yield text
+            continue
+        operand = code[offset + 1] | code[offset + 2] << 8 | extended
+        extended = operand << 16 if opcode == OpCode.EXTENDED_ARG else 0
+        text = f"{text:<31} {operand:5d}"
+        if opcode in _CONSTANT_OPCODES:
+            text += f" '{stringify(chunk.constants[operand])}'"
+        offset += 3
+        yield text
+
+
+def disasm_cmd(content: str, scanner_engine: str = "default") -> None:
+    """Disassemble command."""
+    statements = parser.parse_or_exit(content, scanner_engine)
+    with parser.deep_recursion():
+        program = compile_program(statements)
+    for line in disassemble(program):
+        print(line)
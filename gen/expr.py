@@ -1,6 +1,7 @@
 """Auto generated code to produce an ast."""
 
 import abc
+from collections.abc import Callable
 from typing import Any
 
 from app.tokens import Token
@@ -66,6 +67,8 @@ class Visitor(metaclass=abc.ABCMeta):
 class Expr(abc.ABC):
     """Class Expr."""
 
+    __slots__ = ()
+
     @abc.abstractmethod
     def accept(self, visitor: Visitor) -> Any:
         """Accept the node."""
@@ -74,9 +77,15 @@ class Expr(abc.ABC):
 class AssignExpr(Expr):
     """Class AssignExpr."""
 
-    def __init__(self, name: Token, value: Expr) -> None:
+    __slots__ = ("name", "value", "depth", "slot")
+
+    def __init__(
+        self, name: Token, value: Expr, depth: int = -1, slot: int = -1
+    ) -> None:
         self.name = name
         self.value = value
+        self.depth = depth
+        self.slot = slot
 
     def accept(self, visitor: Visitor) -> Any:
         return visitor.visit_assign_expr(self)
@@ -85,10 +94,15 @@ class AssignExpr(Expr):
 class BinaryExpr(Expr):
     """Class BinaryExpr."""
 
-    def __init__(self, left: Expr, operator: Token, right: Expr) -> None:
+    __slots__ = ("left", "operator", "right", "proven")
+
+    def __init__(
+        self, left: Expr, operator: Token, right: Expr, proven: bool = False
+    ) -> None:
         self.left = left
         self.operator = operator
         self.right = right
+        self.proven = proven
 
     def accept(self, visitor: Visitor) -> Any:
         return visitor.visit_binary_expr(self)
@@ -97,6 +111,8 @@ class BinaryExpr(Expr):
 class GroupingExpr(Expr):
     """Class GroupingExpr."""
 
+    __slots__ = ("expression",)
+
     def __init__(self, expression: Expr) -> None:
         self.expression = expression
 
@@ -107,6 +123,8 @@ class GroupingExpr(Expr):
 class LiteralExpr(Expr):
     """Class LiteralExpr."""
 
+    __slots__ = ("value",)
+
     def __init__(self, value: object) -> None:
         self.value = value
 
@@ -117,9 +135,14 @@ class LiteralExpr(Expr):
 class UnaryExpr(Expr):
     """Class UnaryExpr."""
 
-    def __init__(self, operator: Token, right: Expr) -> None:
+    __slots__ = ("operator", "right", "proven")
+
+    def __init__(
+        self, operator: Token, right: Expr, proven: bool = False
+    ) -> None:
         self.operator = operator
         self.right = right
+        self.proven = proven
 
     def accept(self, visitor: Visitor) -> Any:
         return visitor.visit_unary_expr(self)
@@ -128,8 +151,26 @@ class UnaryExpr(Expr):
 class VariableExpr(Expr):
     """Class VariableExpr."""
 
-    def __init__(self, name: Token) -> None:
+    __slots__ = ("name", "depth", "slot")
+
+    def __init__(self, name: Token, depth: int = -1, slot: int = -1) -> None:
         self.name = name
+        self.depth = depth
+        self.slot = slot
 
     def accept(self, visitor: Visitor) -> Any:
         return visitor.visit_variable_expr(self)
+
+
+def dispatch_table(
+    visitor: Visitor,
+) -> dict[type[Expr], Callable[[Any], Any]]:
+    """Map every node class to the method of the visitor that visits it."""
+    return {
+        AssignExpr: visitor.visit_assign_expr,
+        BinaryExpr: visitor.visit_binary_expr,
+        GroupingExpr: visitor.visit_grouping_expr,
+        LiteralExpr: visitor.visit_literal_expr,
+        UnaryExpr: visitor.visit_unary_expr,
+        VariableExpr: visitor.visit_variable_expr,
+    }
@@ -1,6 +1,7 @@
 """Auto generated code to produce an ast."""
 
 import abc
+from collections.abc import Callable
 from typing import Any
 
 from app.tokens import Token
@@ -54,6 +55,8 @@ class Visitor(metaclass=abc.ABCMeta):
 class Stmt(abc.ABC):
     """Class Stmt."""
 
+    __slots__ = ()
+
     @abc.abstractmethod
     def accept(self, visitor: Visitor) -> Any:
         """Accept the node."""
@@ -62,8 +65,11 @@ class Stmt(abc.ABC):
 class BlockStmt(Stmt):
     """Class BlockStmt."""
 
-    def __init__(self, statements: list[Stmt | None]) -> None:
+    __slots__ = ("statements", "size")
+
+    def __init__(self, statements: list[Stmt | None], size: int = -1) -> None:
         self.statements = statements
+        self.size = size
 
     def accept(self, visitor: Visitor) -> Any:
         return visitor.visit_block_stmt(self)
@@ -72,6 +78,8 @@ class BlockStmt(Stmt):
 class ExpressionStmt(Stmt):
     """Class ExpressionStmt."""
 
+    __slots__ = ("expression",)
+
     def __init__(self, expression: Expr) -> None:
         self.expression = expression
 
@@ -82,6 +90,8 @@ class ExpressionStmt(Stmt):
 class PrintStmt(Stmt):
     """Class PrintStmt."""
 
+    __slots__ = ("expression",)
+
     def __init__(self, expression: Expr) -> None:
         self.expression = expression
 
@@ -92,9 +102,26 @@ class PrintStmt(Stmt):
 class VarStmt(Stmt):
     """Class VarStmt."""
 
-    def __init__(self, name: Token, initializer: Expr | None) -> None:
+    __slots__ = ("name", "initializer", "slot")
+
+    def __init__(
+        self, name: Token, initializer: Expr | None, slot: int = -1
+    ) -> None:
         self.name = name
         self.initializer = initializer
+        self.slot = slot
 
     def accept(self, visitor: Visitor) -> Any:
         return visitor.visit_var_stmt(self)
+
+
+def dispatch_table(
+    visitor: Visitor,
+) -> dict[type[Stmt], Callable[[Any], Any]]:
+    """Map every node class to the method of the visitor that visits it."""
+    return {
+        BlockStmt: visitor.visit_block_stmt,
+        ExpressionStmt: visitor.visit_expression_stmt,
+        PrintStmt: visitor.visit_print_stmt,
+        VarStmt: visitor.visit_var_stmt,
+    }
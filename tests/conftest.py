@@ -0,0 +1,13 @@
+"""Shared fixtures."""
+
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def lox_cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Keep the cache of parsed programs inside the test directory."""
+    directory = tmp_path / "lox-cache"
+    monkeypatch.setenv("LOX_CACHE_DIR", str(directory))
+    return directory
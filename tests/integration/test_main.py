@@ -1,16 +1,29 @@
 """Test the main program."""
 
+import io
 import os
 import re
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
 
 import pytest
 
-from app import main
+from app import client, main
 
 from . import DATA_FOLDER
 
 DATA_FOLDER_CLI_TESTS = DATA_FOLDER / "cli"
 
+# The options that select every engine, with and without the optimizer.
+ENGINE_OPTIONS = [
+    [f"--engine={engine}", *optimize]
+    for engine in main.ENGINES
+    for optimize in ([], ["-O"])
+]
+
 
 def list_test_files(subfolder: str) -> list[tuple[str, str, str]]:
     """Build the list of files to test."""
@@ -69,6 +82,48 @@ def test_cli_tokenize(
     assert stderr == error_content
 
 
+@pytest.mark.parametrize("lox,output,error", list_test_files("tokenize"))
+def test_cli_tokenize_fast_scanner(
+    lox: str,
+    output: str,
+    error: str,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Test the tokenize command with the fast scanner."""
+    command = "tokenize"
+    folder_tests = DATA_FOLDER_CLI_TESTS / command
+    monkeypatch.setattr(
+        "sys.argv",
+        ["", command, str(folder_tests / lox), "--scanner=fast"],
+    )
+
+    output_content = ""
+    try:
+        with open(str(folder_tests / output), encoding="utf-8") as file:
+            output_content = file.read()
+    except FileNotFoundError:
+        pass
+
+    error_content = ""
+    try:
+        with open(str(folder_tests / error), encoding="utf-8") as file:
+            error_content = file.read()
+    except FileNotFoundError:
+        pass
+
+    if error_content:
+        with pytest.raises(SystemExit) as pytest_wrapped_e:
+            main.main()
+        assert pytest_wrapped_e.value.code == 65
+    else:
+        main.main()
+
+    captured = capsys.readouterr()
+    assert captured.out == output_content
+    assert captured.err == error_content
+
+
 @pytest.mark.parametrize("lox,output,error", list_test_files("parse"))
 def test_cli_parse(
     lox: str,
@@ -111,18 +166,19 @@ def test_cli_parse(
     assert stderr == error_content
 
 
+@pytest.mark.parametrize("options", ENGINE_OPTIONS)
 @pytest.mark.parametrize("lox,output,error", list_test_files("evaluate"))
 def test_cli_evaluate(
     lox: str,
     output: str,
     error: str,
-    monkeypatch: pytest.MonkeyPatch,
+    options: list[str],
     capsys: pytest.CaptureFixture,
 ) -> None:
     """Test the evaluate command."""
     command = "evaluate"
     folder_tests = DATA_FOLDER_CLI_TESTS / command
-    monkeypatch.setattr("sys.argv", ["", command, str(folder_tests / lox)])
+    argv = [command, str(folder_tests / lox), *options]
 
     output_content = ""
     try:
@@ -140,11 +196,11 @@ def test_cli_evaluate(
 
     if error_content:
         with pytest.raises(SystemExit) as pytest_wrapped_e:
-            main.main()
+            main.execute(argv)
         assert pytest_wrapped_e.type == SystemExit
         assert pytest_wrapped_e.value.code == 70
     else:
-        main.main()
+        main.execute(argv)
 
     captured = capsys.readouterr()
     stdout = captured.out
@@ -153,18 +209,19 @@ def test_cli_evaluate(
     assert stderr == error_content
 
 
+@pytest.mark.parametrize("options", ENGINE_OPTIONS)
 @pytest.mark.parametrize("lox,output,error", list_test_files("run"))
 def test_cli_run(
     lox: str,
     output: str,
     error: str,
-    monkeypatch: pytest.MonkeyPatch,
+    options: list[str],
     capsys: pytest.CaptureFixture,
 ) -> None:
     """Test the evaluate command."""
     command = "run"
     folder_tests = DATA_FOLDER_CLI_TESTS / command
-    monkeypatch.setattr("sys.argv", ["", command, str(folder_tests / lox)])
+    argv = [command, str(folder_tests / lox), *options]
 
     output_content = ""
     try:
@@ -182,10 +239,10 @@ def test_cli_run(
 
     if error_content:
         with pytest.raises(SystemExit) as pytest_wrapped_e:
-            main.main()
+            main.execute(argv)
         assert pytest_wrapped_e.type == SystemExit
     else:
-        main.main()
+        main.execute(argv)
 
     captured = capsys.readouterr()
     stdout = captured.out
@@ -198,3 +255,289 @@ def test_cli_run(
     elif error_content and not error_content.startswith("[line"):
         # It's a runtime error.
         assert pytest_wrapped_e.value.code == 70
+
+
+@pytest.mark.parametrize("lox,output,error", list_test_files("run"))
+def test_cli_run_stream(
+    lox: str,
+    output: str,
+    error: str,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Test the run command in streaming mode."""
+    command = "run"
+    folder_tests = DATA_FOLDER_CLI_TESTS / command
+    monkeypatch.setattr(
+        "sys.argv", ["", command, str(folder_tests / lox), "--stream"]
+    )
+
+    output_content = ""
+    try:
+        with open(str(folder_tests / output), encoding="utf-8") as file:
+            output_content = file.read()
+    except FileNotFoundError:
+        pass
+
+    error_content = ""
+    try:
+        with open(str(folder_tests / error), encoding="utf-8") as file:
+            error_content = file.read()
+    except FileNotFoundError:
+        pass
+
+    if error_content:
+        with pytest.raises(SystemExit) as pytest_wrapped_e:
+            main.main()
+        assert pytest_wrapped_e.value.code in (65, 70)
+    else:
+        main.main()
+
+    captured = capsys.readouterr()
+    assert captured.out == output_content
+    assert captured.err == error_content
+
+
+def test_cli_unknown_engine(
+    monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture
+) -> None:
+    """Test that an unknown engine is rejected."""
+    monkeypatch.setattr("sys.argv", ["", "run", "x.lox", "--engine=jit"])
+    with pytest.raises(SystemExit) as pytest_wrapped_e:
+        main.main()
+    assert pytest_wrapped_e.value.code == 1
+    assert "Unknown engine: jit" in capsys.readouterr().err
+
+
+def test_cli_disasm(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Test the disasm command."""
+    lox = tmp_path / "program.lox"
+    lox.write_text('print "a" + "b";\n', encoding="utf-8")
+    monkeypatch.setattr("sys.argv", ["", "disasm", str(lox)])
+    main.main()
+    assert capsys.readouterr().out == (
+        "0000    1 CONSTANT                  0 'a'\n"
+        "0003    | CONSTANT                  1 'b'\n"
+        "0006    | ADD\n"
+        "0007    | PRINT\n"
+        "0008    | RETURN\n"
+    )
+
+
+def test_cli_emit_python(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Test the emit-python command."""
+    lox = tmp_path / "program.lox"
+    lox.write_text("var a = 1;\nprint a;\n", encoding="utf-8")
+    monkeypatch.setattr("sys.argv", ["", "emit-python", str(lox)])
+    main.main()
+    assert capsys.readouterr().out == (
+        "def run(G):\n"
+        "    G['a'] = 1.0\n"
+        "    print(_stringify(G['a'] if 'a' in G else _undefined('a', 2)))\n"
+    )
+
+
+def test_cli_explain_types(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Test the run command with --explain-types."""
+    lox = tmp_path / "program.lox"
+    lox.write_text('var a = "a";\nprint a + 1;\n', encoding="utf-8")
+    monkeypatch.setattr("sys.argv", ["", "run", str(lox), "--explain-types"])
+    main.main()
+    assert capsys.readouterr().out == (
+        "[line 2] + (string, number) checked\n"
+        "0 of 1 checks proven unnecessary\n"
+    )
+
+
+def test_cli_profile(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Test the run command with --profile-out, then --profile-in."""
+    lox = tmp_path / "program.lox"
+    lox.write_text(
+        'var a = 2;\nprint -a * a + 1;\nprint "a" + "b";\n', encoding="utf-8"
+    )
+    profile = str(tmp_path / "profile.json.gz")
+    for option in ("--profile-out", "--profile-in"):
+        monkeypatch.setattr(
+            "sys.argv", ["", "run", str(lox), f"{option}={profile}", "-O"]
+        )
+        main.main()
+        assert capsys.readouterr() == ("-3\nab\n", "")
+
+
+def test_cli_profile_other_source(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Test that only --profile-in warns about the profile of another
+    source."""
+    lox = tmp_path / "program.lox"
+    profile = str(tmp_path / "profile.json.gz")
+    for source, option in (
+        ("print 1 + 1;\n", "--profile-out"),
+        ("print 1 - 1;\n", "--profile-out"),
+        ("print 1 * 1;\n", "--profile-in"),
+    ):
+        lox.write_text(source, encoding="utf-8")
+        monkeypatch.setattr(
+            "sys.argv", ["", "run", str(lox), f"{option}={profile}"]
+        )
+        main.main()
+    captured = capsys.readouterr()
+    assert captured.out == "2\n0\n1\n"
+    assert (
+        captured.err == f"Ignoring the profile of another source: {profile}\n"
+    )
+
+
+def test_cli_profile_out_not_a_profile(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Test that --profile-out does not replace a file that is not a
+    profile."""
+    lox = tmp_path / "program.lox"
+    lox.write_text("print 1;\n", encoding="utf-8")
+    notes = tmp_path / "notes.lox"
+    notes.write_text("print 2;\n", encoding="utf-8")
+    for target in (notes, lox):
+        monkeypatch.setattr(
+            "sys.argv", ["", "run", str(lox), f"--profile-out={target}"]
+        )
+        with pytest.raises(SystemExit) as e:
+            main.main()
+        assert e.value.code == 1
+        assert capsys.readouterr() == ("", f"{target} is not a profile\n")
+    assert lox.read_text(encoding="utf-8") == "print 1;\n"
+    assert notes.read_text(encoding="utf-8") == "print 2;\n"
+
+
+def test_cli_profile_engine(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Test that --profile-in picks its own engine."""
+    lox = tmp_path / "program.lox"
+    lox.write_text("print 1;\n", encoding="utf-8")
+    monkeypatch.setattr(
+        "sys.argv",
+        ["", "run", str(lox), "--profile-in=profile", "--engine=vm"],
+    )
+    with pytest.raises(SystemExit) as e:
+        main.main()
+    assert e.value.code == 1
+    assert (
+        capsys.readouterr().err == "--profile-in runs under --engine=adaptive\n"
+    )
+
+
+def test_cli_columns(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Test the evaluate command with --columns."""
+    lox = tmp_path / "expression.lox"
+    lox.write_text("a * 2 + b\n", encoding="utf-8")
+    first = tmp_path / "first.csv"
+    first.write_text("a\n1\n2\nc\n", encoding="utf-8")
+    second = tmp_path / "second.csv"
+    second.write_text("b\n3\n4\n5\n", encoding="utf-8")
+    monkeypatch.setattr(
+        "sys.argv",
+        ["", "evaluate", str(lox), f"--columns={first},{second}"],
+    )
+    with pytest.raises(SystemExit) as e:
+        main.main()
+    assert e.value.code == 70
+    assert capsys.readouterr() == (
+        "5\n8\n\n",
+        "[row 3] Operands must be numbers.\n[line 1]\n",
+    )
+
+
+def test_cli_serve(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Test running commands through the daemon with the client."""
+    path = str(tmp_path / "lox.sock")
+    monkeypatch.setenv("LOX_SOCKET", path)
+    lox = tmp_path / "program.lox"
+    lox.write_text('print "a" + "b";\nprint -"c";\n', encoding="utf-8")
+    with subprocess.Popen(
+        [sys.executable, "-m", "app.main", "serve", path],
+        cwd=Path(main.__file__).parent.parent,
+    ) as server:
+        try:
+            deadline = time.monotonic() + 10
+            while True:
+                assert server.poll() is None
+                assert time.monotonic() < deadline, "The daemon did not bind"
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    if probe.connect_ex(path) == 0:
+                        break
+                time.sleep(0.05)
+            for _ in range(2):
+                assert client.main(["run", str(lox), "--engine=vm"]) == 70
+                assert capsys.readouterr() == (
+                    "ab\n",
+                    "Operand must be a number.\n[line 2]\n",
+                )
+            monkeypatch.setattr("sys.stdin", io.StringIO("1 +"))
+            assert client.main(["evaluate", "-"]) == 65
+            assert capsys.readouterr() == ("", "")
+        finally:
+            server.terminate()
+            server.wait()
+    # SIGTERM stops the daemon cleanly, removing its socket.
+    assert server.returncode == 0
+    assert not Path(path).exists()
+
+
+def test_cli_deep_nesting(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+) -> None:
+    """Test the commands on input nested deeper than Python recurses."""
+    depth = 5000
+    expression = "(" * depth + "-1" + ")" * depth
+    lox = tmp_path / "expression.lox"
+    lox.write_text(expression, encoding="utf-8")
+    monkeypatch.setattr("sys.argv", ["", "parse", str(lox)])
+    main.main()
+    assert capsys.readouterr().out == (
+        "(group " * depth + "(- 1.0)" + ")" * depth + "\n"
+    )
+    monkeypatch.setattr("sys.argv", ["", "evaluate", str(lox)])
+    main.main()
+    assert capsys.readouterr().out == "-1\n"
+    lox.write_text(
+        "{" * depth + f"print {expression};" + "}" * depth, encoding="utf-8"
+    )
+    for engine in main.ENGINES:
+        monkeypatch.setattr(
+            "sys.argv", ["", "run", str(lox), f"--engine={engine}"]
+        )
+        main.main()
+        assert capsys.readouterr().out == "-1\n"
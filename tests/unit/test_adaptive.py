@@ -0,0 +1,80 @@
+"""Adaptive engine tests."""
+
+import pytest
+
+from app import interpreter, parser
+from app.adaptive import AdaptiveInterpreter
+from gen import expr, stmt
+from tests.utils import run_program
+
+
+class TestAdaptiveInterpreter:
+    """Test the adaptive engine against the tree walking interpreter."""
+
+    PROGRAMS = [
+        "print 1 + 2 * 3 - 4 / 2;",
+        'print "a" + "b"; print 1 < 2; print 2 <= 2; print 3 > 4;',
+        "print 1 >= 2; print 1 == 1; print nil != false; print !nil;",
+        'print "a" == "a"; print true == false; print nil == nil;',
+        "print -(1 + 2); print 10 / 4; print 7 * 0.5; print 3 - 1.5;",
+        "var a = 1; { var a = a + 1; print a; { a = a * 10; } print a; }",
+        'print 1 == "1"; print !true; print !"a";',
+        'print -"a";',
+        'print 1 + "a";',
+        'print "a" < "b";',
+        "print 1 * nil;",
+        'print 2 - "b"; print 3;',
+    ]
+
+    def test_same_behavior(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_same_behavior"""
+        for source in self.PROGRAMS:
+            expected = run_program(interpreter.Interpreter, source, capsys)
+            assert run_program(AdaptiveInterpreter, source, capsys) == expected
+
+    def test_quickening(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_quickening"""
+        statements, _ = parser.parse(
+            'var a = 2; print -a * a; print "a" + "b";', use_cache=False
+        )
+        AdaptiveInterpreter(statements).interpret()
+        assert capsys.readouterr().out == "-4\nab\n"
+        product, concatenation = (
+            s.expression
+            for s in statements[1:]
+            if isinstance(s, stmt.PrintStmt)
+        )
+        assert isinstance(product, expr.BinaryExpr)
+        assert type(product).__name__ == "NumberStarExpr"
+        assert type(product.left).__name__ == "NumberNegateExpr"
+        assert type(concatenation).__name__ == "StringPlusExpr"
+
+    def test_deoptimization(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_deoptimization"""
+        statements, _ = parser.parse(
+            'var a = 1; print a + a; a = "b";', use_cache=False
+        )
+        # The same tree runs twice, the second time with a string.
+        engine = AdaptiveInterpreter([*statements, statements[1]])
+        engine.interpret()
+        assert capsys.readouterr().out == "2\nbb\n"
+        printed = statements[1]
+        assert isinstance(printed, stmt.PrintStmt)
+        assert type(printed.expression).__name__ == "_GenericBinaryExpr"
+
+    def test_run_again(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_run_again"""
+        statements, _ = parser.parse(
+            "var a = 1; print (a + 2) * -a;", use_cache=False
+        )
+        AdaptiveInterpreter(statements).interpret()
+        AdaptiveInterpreter(statements).interpret()
+        assert capsys.readouterr().out == "-3\n-3\n"
+
+    def test_evaluate(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_evaluate"""
+        expression, _ = parser.parse_expression("(1 + 2) * -3 == -9")
+        assert expression is not None
+        assert AdaptiveInterpreter().evaluate(expression) is True
+        interpreter.interpret_cmd("2 * 21", engine=AdaptiveInterpreter)
+        assert capsys.readouterr().out == "42\n"
@@ -0,0 +1,166 @@
+"""Batch evaluation tests."""
+
+import warnings
+from pathlib import Path
+
+import pytest
+
+from app import batch, parser, vm
+from app.interpreter import Interpreter
+from gen import expr
+
+COLUMNS: dict[str, list[object]] = {
+    "x": [1.0, 3.0, 5.0, 0.5],
+    "y": [2.0, 1.0, 4.0, 0.0],
+    "b": [True, False, True, False],
+    "s": ["a", "b", None, "d"],
+}
+
+# Expressions and their value for every row of the columns.
+ROWS: dict[str, list[object]] = {
+    "x * 2 + y": [4.0, 7.0, 14.0, 1.0],
+    "x > y == b": [False, False, True, False],
+    "!x == !b": [True, False, True, False],
+}
+
+
+class _Vectorized(Interpreter):
+    """An engine for the expressions whose rows are all vectorized."""
+
+    def evaluate(self, _expr: expr.Expr) -> object:
+        raise AssertionError("A row was evaluated by the interpreter")
+
+
+class TestBatch:
+    """Test evaluating an expression for every row of some columns."""
+
+    @staticmethod
+    def _run(
+        source: str,
+        columns: dict[str, list[object]],
+        engine: type[Interpreter] = Interpreter,
+    ) -> list[tuple[object, str | None]]:
+        """Evaluate an expression for every row, with the messages of the
+        runtime errors."""
+        _expr, errors = parser.parse_expression(source)
+        assert _expr is not None and not errors
+        return [
+            (value, None if error is None else error.msg)
+            for value, error in batch.evaluate_rows(_expr, columns, engine)
+        ]
+
+    def test_parse_cell(self) -> None:
+        """test_parse_cell"""
+        assert batch.parse_cell("1.5") == 1.5
+        assert batch.parse_cell("true") is True
+        assert batch.parse_cell("false") is False
+        assert batch.parse_cell("") is None
+        assert batch.parse_cell("nil") is None
+        assert batch.parse_cell("abc") == "abc"
+
+    def test_read_csv(self, tmp_path: Path) -> None:
+        """test_read_csv"""
+        first = tmp_path / "first.csv"
+        first.write_text("x,s\n1,a\n2,\n", encoding="utf-8")
+        second = tmp_path / "second.csv"
+        second.write_text("b\ntrue\nfalse\n", encoding="utf-8")
+        assert batch.read_columns([str(first), str(second)]) == {
+            "x": [1.0, 2.0],
+            "s": ["a", None],
+            "b": [True, False],
+        }
+
+    def test_read_different_lengths(self, tmp_path: Path) -> None:
+        """test_read_different_lengths"""
+        first = tmp_path / "first.csv"
+        first.write_text("x\n1\n2\n", encoding="utf-8")
+        second = tmp_path / "second.csv"
+        second.write_text("y\n1\n", encoding="utf-8")
+        with pytest.raises(ValueError):
+            batch.read_columns([str(first), str(second)])
+
+    def test_rows(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """test_rows"""
+        monkeypatch.setattr(batch, "import_numpy", lambda: None)
+        for engine in (Interpreter, vm.VMInterpreter):
+            for source, values in ROWS.items():
+                assert self._run(source, COLUMNS, engine) == [
+                    (value, None) for value in values
+                ]
+
+    def test_vectorized_rows(self) -> None:
+        """test_vectorized_rows"""
+        pytest.importorskip("numpy")
+        for source, values in ROWS.items():
+            assert self._run(source, COLUMNS, _Vectorized) == [
+                (value, None) for value in values
+            ]
+
+    def test_mixed_rows(self) -> None:
+        """test_mixed_rows"""
+        pytest.importorskip("numpy")
+        columns: dict[str, list[object]] = {"m": [1.0, "a", None, 2.0]}
+        error = "Operands must be numbers."
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            # The product overflows to infinity, as in the interpreter.
+            assert self._run(f"m * 1{'0' * 308} * 10", columns) == [
+                (float("inf"), None),
+                (None, error),
+                (None, error),
+                (float("inf"), None),
+            ]
+
+    def test_failing_rows(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """test_failing_rows"""
+        for vectorized in (True, False):
+            if not vectorized:
+                monkeypatch.setattr(batch, "import_numpy", lambda: None)
+            assert self._run('s + "!"', COLUMNS) == [
+                ("a!", None),
+                ("b!", None),
+                (None, "Operands must be two numbers or two strings."),
+                ("d!", None),
+            ]
+            error = (None, "Operand must be a number.")
+            assert self._run("-b", COLUMNS) == [error] * 4
+            error = (None, "Undefined variable 'z'.")
+            assert self._run("z", COLUMNS) == [error] * 4
+            assert self._run("x / y", COLUMNS) == [
+                (0.5, None),
+                (3.0, None),
+                (1.25, None),
+                (None, "Division by zero."),
+            ]
+
+    def test_vectorized(self) -> None:
+        """test_vectorized"""
+        np = pytest.importorskip("numpy")
+        columns = {
+            name: batch.column_array(np, COLUMNS[name]) for name in "xyb"
+        }
+        evaluator = batch.ArrayEvaluator(np, columns, 4)
+        _expr, _ = parser.parse_expression("x / y")
+        assert _expr is not None
+        assert evaluator.evaluate(_expr).tolist()[:3] == [0.5, 3.0, 1.25]
+        # The division by zero is left to the interpreter.
+        assert evaluator.rejected.tolist() == [False, False, False, True]
+        _expr, _ = parser.parse_expression('x + "a"')
+        assert _expr is not None
+        with pytest.raises(batch.Unvectorizable):
+            evaluator.evaluate(_expr)
+        column = batch.column_array(np, [1.0, "a", None, 2.0])
+        assert column[1].tolist() == [False, True, True, False]
+        evaluator = batch.ArrayEvaluator(np, {"m": column}, 4)
+        _expr, _ = parser.parse_expression("-m")
+        assert _expr is not None
+        assert evaluator.evaluate(_expr).tolist()[::3] == [-1.0, -2.0]
+        assert evaluator.rejected.tolist() == [False, True, True, False]
+
+    def test_read_npy(self, tmp_path: Path) -> None:
+        """test_read_npy"""
+        np = pytest.importorskip("numpy")
+        np.save(tmp_path / "x.npy", np.array([1, 2, 3]))
+        assert batch.read_columns([str(tmp_path / "x.npy")]) == {
+            "x": [1.0, 2.0, 3.0]
+        }
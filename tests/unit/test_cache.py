@@ -0,0 +1,88 @@
+"""Cache tests."""
+
+import os
+from pathlib import Path
+
+from app import cache, parser
+from tests.utils import describe
+
+SOURCE = 'var a = "x" + "y";\nprint a;\n'
+
+
+class TestCache:
+    """Test the cache of parsed programs."""
+
+    def test_hit(self, lox_cache_dir: Path) -> None:
+        """test_hit"""
+        statements, _ = parser.parse(SOURCE)
+        assert len(list(lox_cache_dir.glob("*.loxc"))) == 1
+        assert cache.load(SOURCE) is not None
+        cached, errors = parser.parse(SOURCE)
+        assert not errors
+        assert cached is not statements
+        assert list(map(describe, cached)) == list(map(describe, statements))
+
+    def test_errors_not_cached(self, lox_cache_dir: Path) -> None:
+        """test_errors_not_cached"""
+        _, errors = parser.parse("var;")
+        assert errors
+        assert not lox_cache_dir.exists()
+        assert parser.parse("var;")[1] == errors
+
+    def test_disabled(self, lox_cache_dir: Path) -> None:
+        """test_disabled"""
+        parser.parse(SOURCE, use_cache=False)
+        assert not lox_cache_dir.exists()
+
+    def test_corrupt_entry(self, lox_cache_dir: Path) -> None:
+        """test_corrupt_entry"""
+        lox_cache_dir.mkdir()
+        path = lox_cache_dir / f"{cache.key(SOURCE)}{cache.SUFFIX}"
+        path.write_bytes(b"not a pickle")
+        assert cache.load(SOURCE) is None
+        assert not path.exists()
+        assert not parser.parse(SOURCE)[1]
+
+    def test_garbage_entries(self, lox_cache_dir: Path) -> None:
+        """test_garbage_entries"""
+        lox_cache_dir.mkdir()
+        path = lox_cache_dir / f"{cache.key(SOURCE)}{cache.SUFFIX}"
+        for garbage in (
+            b"",
+            b"\x80\x05",
+            b"cmissing_module\nName\n.",
+            b"X\x02\x00\x00\x00\xff\xfe.",
+            b"(lp0\nI1\naI2\na(tR.",
+        ):
+            path.write_bytes(garbage)
+            assert cache.load(SOURCE) is None
+            assert not path.exists()
+        assert not parser.parse(SOURCE)[1]
+
+    def test_evict_least_recently_used(self, lox_cache_dir: Path) -> None:
+        """test_evict_least_recently_used"""
+        lox_cache_dir.mkdir()
+        for age, name in enumerate(["new", "old", "older"]):
+            path = lox_cache_dir / f"{name}{cache.SUFFIX}"
+            path.write_bytes(b"x" * 10)
+            os.utime(path, ns=(0, 10**9 * (10 - age)))
+        cache.evict(lox_cache_dir, 25)
+        remaining = sorted(p.stem for p in lox_cache_dir.glob("*.loxc"))
+        assert remaining == ["new", "old"]
+
+    def test_in_memory(self, lox_cache_dir: Path) -> None:
+        """test_in_memory"""
+        cache.keep_in_memory()
+        try:
+            statements, _ = parser.parse(SOURCE)
+            for path in lox_cache_dir.glob("*.loxc"):
+                path.unlink()
+            cached = cache.load(SOURCE)
+            assert cached is not None and cached is not statements
+            assert cache.load(SOURCE) is not cached
+            assert list(map(describe, cached)) == list(
+                map(describe, statements)
+            )
+        finally:
+            cache.keep_in_memory(0)
+        assert cache.load(SOURCE) is None
@@ -0,0 +1,54 @@
+"""Closure engine tests."""
+
+import pytest
+
+from app import interpreter, parser
+from app.closure import ClosureInterpreter
+
+
+class TestClosureInterpreter:
+    """Test the closure engine against the tree walking interpreter."""
+
+    PROGRAMS = [
+        "print 1 + 2 * 3 - 4 / 2;",
+        'print "a" + "b"; print 1 < 2; print 2 <= 2; print 3 > 4;',
+        "print 1 >= 2; print 1 == 1; print nil != false; print !nil;",
+        "print -(1 + 2); print 10 / 4; print 7 * 0.5; print 3 - 1.5;",
+        "var a = 1; { var a = a + 1; print a; { a = a * 10; } print a; }",
+        "var a; print a; a = b = 2;",
+        "{ var a = 1; { var b = a; print a + b; } } print a;",
+        'print -"a";',
+        'print 1 + "a";',
+        'print "a" < 1;',
+        "print 1 * nil;",
+        'print 2 - "b"; print 3;',
+    ]
+
+    @staticmethod
+    def _run(
+        engine: type[interpreter.Interpreter],
+        source: str,
+        capsys: pytest.CaptureFixture[str],
+    ) -> tuple[str, str, object]:
+        """Run a program and return its output, errors and exit code."""
+        code = None
+        try:
+            interpreter.run_cmd(source, use_cache=False, engine=engine)
+        except SystemExit as e:
+            code = e.code
+        captured = capsys.readouterr()
+        return captured.out, captured.err, code
+
+    def test_same_behavior(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_same_behavior"""
+        for source in self.PROGRAMS:
+            expected = self._run(interpreter.Interpreter, source, capsys)
+            assert self._run(ClosureInterpreter, source, capsys) == expected
+
+    def test_evaluate(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_evaluate"""
+        expression, _ = parser.parse_expression("(1 + 2) * -3 == -9")
+        assert expression is not None
+        assert ClosureInterpreter().evaluate(expression) is True
+        interpreter.interpret_cmd("2 * 21", engine=ClosureInterpreter)
+        assert capsys.readouterr().out == "42\n"
@@ -0,0 +1,81 @@
+"""Python code generation tests."""
+
+import pytest
+
+from app import codegen, interpreter, parser
+from tests.utils import FAILING_PROGRAMS, run_program
+
+
+class TestPythonInterpreter:
+    """Test the Python backend against the tree walking interpreter."""
+
+    PROGRAMS = [
+        "print 1 + 2 * 3 - 4 / 2;",
+        'print "a" + "b"; print 1 < 2; print 2 <= 2; print 3 > 4;',
+        "print 1 >= 2; print 1 == 1; print nil != false; print !nil;",
+        "print -(1 + 2); print 10 / 4; print 7 * 0.5; print !0; print !!true;",
+        "var a = 1; { var a = a + 1; print a; { a = a * 10; } print a; }",
+        "var a; print a; a = b = 2;",
+        "{ var a = 1; { var b = a; print a + b; } } print a;",
+        "{ var a = 1; print a + (a = 5); print a; print a - -(a = 2); }",
+        "var g = 1; print g + (g = 5); print (g = 3) * g; print g;",
+        *FAILING_PROGRAMS,
+        "print 1;\nundefined = 2;",
+    ]
+
+    def test_same_behavior(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_same_behavior"""
+        for source in self.PROGRAMS:
+            expected = run_program(interpreter.Interpreter, source, capsys)
+            result = run_program(codegen.PythonInterpreter, source, capsys)
+            assert result == expected, source
+
+    def test_batches(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """test_batches"""
+        monkeypatch.setattr(codegen, "BATCH_SIZE", 2)
+        source = "var a = 1; { var b = a; a = b + 1; } print a; print b;"
+        expected = run_program(interpreter.Interpreter, source, capsys)
+        assert (
+            run_program(codegen.PythonInterpreter, source, capsys) == expected
+        )
+
+    def test_recursion_falls_back(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """test_recursion_falls_back"""
+
+        def too_deep(*_: object) -> None:
+            raise RecursionError
+
+        monkeypatch.setattr(codegen, "compile_function", too_deep)
+        source = "var a = 1; { var b = a + 1; print b; } print -a;"
+        assert run_program(codegen.PythonInterpreter, source, capsys) == (
+            "2\n-1\n",
+            "",
+            None,
+        )
+
+    def test_evaluate(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_evaluate"""
+        expression, _ = parser.parse_expression("(1 + 2) * -3 == -9")
+        assert expression is not None
+        assert codegen.PythonInterpreter().evaluate(expression) is True
+        interpreter.interpret_cmd("2 * 21", engine=codegen.PythonInterpreter)
+        assert capsys.readouterr().out == "42\n"
+
+    def test_emit_python(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_emit_python"""
+        codegen.emit_python_cmd('var a = "x"; { var b = a; print b + "y"; }')
+        assert capsys.readouterr().out == (
+            "def run(G):\n"
+            "    G['a'] = 'x'\n"
+            "    b_0 = G['a'] if 'a' in G else _undefined('a', 1)\n"
+            "    print(_stringify(b_0 + 'y' if type(b_0) is str else "
+            "_fail('Operands must be two numbers or two strings.', 1)))\n"
+        )
@@ -0,0 +1,120 @@
+"""Daemon tests."""
+
+import io
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app import daemon, main
+from app.client import receive, send
+
+
+class TestDaemon:
+    """Test running commands sent to the daemon."""
+
+    @staticmethod
+    def _run(tmp_path: Path, message: dict[str, Any]) -> tuple[str, str, int]:
+        """Run a request and return its output, errors and exit code."""
+        server = daemon.Daemon(str(tmp_path / "lox.sock"), main.serve_request)
+        try:
+            stream = io.BytesIO()
+            code = server.run(message, stream)
+        finally:
+            server.server_close()
+        replies = list(receive(io.BytesIO(stream.getvalue())))
+        return (
+            "".join(reply.get("stdout", "") for reply in replies),
+            "".join(reply.get("stderr", "") for reply in replies),
+            code,
+        )
+
+    def test_source(self, tmp_path: Path) -> None:
+        """test_source"""
+        message = {
+            "argv": ["run", "-"],
+            "cwd": str(tmp_path),
+            "source": "print 1;\nprint -nil;\n",
+        }
+        assert self._run(tmp_path, message) == (
+            "1\n",
+            "Operand must be a number.\n[line 2]\n",
+            70,
+        )
+
+    def test_path(self, tmp_path: Path) -> None:
+        """test_path"""
+        (tmp_path / "program.lox").write_text("print 1 +;", encoding="utf-8")
+        message = {"argv": ["run", "program.lox"], "cwd": str(tmp_path)}
+        assert self._run(tmp_path, message) == (
+            "",
+            "[line 1] Error at ';': Expect expression.\n",
+            65,
+        )
+
+    def test_refused(self, tmp_path: Path) -> None:
+        """test_refused"""
+        message = {"argv": ["watch", "program.lox"], "cwd": str(tmp_path)}
+        assert self._run(tmp_path, message) == (
+            "",
+            "The daemon does not run watch\n",
+            1,
+        )
+
+    def test_uncaught(self, tmp_path: Path) -> None:
+        """test_uncaught"""
+        message = {"argv": ["run", "missing.lox"], "cwd": str(tmp_path)}
+        out, err, code = self._run(tmp_path, message)
+        assert (out, code) == ("", 1)
+        assert err.startswith("Traceback")
+        assert err.endswith("'missing.lox'\n")
+
+    def test_serve(self, tmp_path: Path) -> None:
+        """test_serve"""
+        path = str(tmp_path / "lox.sock")
+        thread = threading.Thread(
+            target=daemon.serve_cmd, args=(path, main.serve_request, 3)
+        )
+        thread.start()
+        try:
+            deadline = time.monotonic() + 10
+            while True:
+                assert thread.is_alive()
+                assert time.monotonic() < deadline, "The daemon did not bind"
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    if probe.connect_ex(path) == 0:
+                        break
+            with pytest.raises(SystemExit):
+                daemon.serve_cmd(path, main.serve_request, 0)
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(path)
+                with client.makefile("rwb") as stream:
+                    send(stream, {"argv": ["run", "-"], "source": "print 1;"})
+                    replies = list(receive(stream))
+        finally:
+            thread.join()
+        assert replies == [{"stdout": "1\n"}, {"exit": 0}]
+        assert not Path(path).exists()
+
+    def test_stale_socket(self, tmp_path: Path) -> None:
+        """test_stale_socket"""
+        path = str(tmp_path / "lox.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+            stale.bind(path)
+        daemon.serve_cmd(path, main.serve_request, 0)
+        assert not Path(path).exists()
+
+    def test_not_a_socket(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        """test_not_a_socket"""
+        path = tmp_path / "program.lox"
+        path.write_text("print 1;", encoding="utf-8")
+        with pytest.raises(SystemExit) as e:
+            daemon.serve_cmd(str(path), main.serve_request, 0)
+        assert e.value.code == 1
+        assert capsys.readouterr().err == f"{path} is not a socket\n"
+        assert path.read_text(encoding="utf-8") == "print 1;"
@@ -0,0 +1,106 @@
+"""Incremental scanning and parsing tests."""
+
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+
+from app import incremental, parser, scanner
+from tests.utils import describe
+
+
+class TestDocument:
+    """Test Document"""
+
+    EDITS = [
+        ("print 1;\nprint 2;\n", 6, 1, "1 + 1"),
+        ("print 1;\nprint 2;\n", 8, 0, "var a = 3;\n"),
+        ("print 1.5;\n", 0, 0, "1."),
+        ('print "a";\nprint 2;\n', 6, 1, ""),
+        ("var a = 1;\n// c\nprint a;\n", 11, 2, ""),
+        ("{ print 1; }\nprint 2;\n", 11, 1, ""),
+        ("print 1;\nprint @;\n", 15, 1, "3"),
+    ]
+
+    def test_edits(self) -> None:
+        """test_edits"""
+        for source, offset, removed, inserted in self.EDITS:
+            document = incremental.Document(source)
+            document.edit(offset, removed, inserted)
+            expected_source = (
+                source[:offset] + inserted + source[offset + removed :]
+            )
+            assert document.source == expected_source
+            sc = scanner.Scanner(expected_source)
+            tokens = sc.scan_tokens()
+            _parser = parser.Parser(tokens)
+            statements = _parser.parse()
+            assert document.tokens == tokens, expected_source
+            assert document.lexical_errors == sc.lexical_errors
+            assert document.parse_errors == _parser.parse_errors
+            assert [describe(s) for s in document.statements] == [
+                describe(s) for s in statements
+            ]
+
+    def test_work_is_local(self) -> None:
+        """test_work_is_local"""
+        source = "".join(f"var a{i} = {i};\n" for i in range(100))
+        document = incremental.Document(source)
+        stats = document.edit(source.index("var a50"), 0, "print 1;\n")
+        assert stats.rescanned_tokens < 10
+        assert stats.reparsed_declarations <= 3
+        assert document.tokens[-1].line == 102
+
+    def test_out_of_range(self) -> None:
+        """test_out_of_range"""
+        with pytest.raises(ValueError):
+            incremental.Document("print 1;").edit(5, 10, "")
+
+
+class TestWatch:
+    """Test the watch helpers."""
+
+    def test_diff(self) -> None:
+        """test_diff"""
+        assert incremental.diff("print 1;", "print 12;") == (7, 0, "2")
+        assert incremental.diff("aaa", "aa") == (2, 1, "")
+        assert incremental.diff("", "x") == (0, 0, "x")
+
+    def test_watch_reports(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        """test_watch_reports"""
+        path = tmp_path / "test.lox"
+        path.write_text("print 1;\nprint ;\n", encoding="utf-8")
+        incremental.watch_cmd(str(path), interval=0, iterations=0)
+        captured = capsys.readouterr()
+        assert captured.out == f"{path}: 6 tokens, 2 declarations\n"
+        assert captured.err == "[line 2] Error at ';': Expect expression.\n"
+
+    def test_watch_atomic_save(
+        self,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """test_watch_atomic_save"""
+        path = tmp_path / "test.lox"
+        path.write_text("print 1;\n", encoding="utf-8")
+        saved = tmp_path / "test.lox.tmp"
+        steps: Iterator[Callable[[], object]] = iter(
+            [
+                lambda: path.rename(saved),
+                lambda: saved.write_text("print 12;\n", encoding="utf-8"),
+                lambda: saved.rename(path),
+            ]
+        )
+
+        def sleep(_: float) -> None:
+            next(steps)()
+
+        monkeypatch.setattr("time.sleep", sleep)
+        incremental.watch_cmd(str(path), interval=0, iterations=3)
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0] == f"{path}: 4 tokens, 1 declarations"
+        assert lines[1].startswith(f"{path}: 4 tokens, 1 declarations (")
+        assert len(lines) == 2
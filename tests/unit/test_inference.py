@@ -0,0 +1,92 @@
+"""Type inference tests."""
+
+import pytest
+
+from app import interpreter, parser
+from app.inference import Type, TypeInference, describe, explain_types_cmd
+from gen import expr, stmt
+
+
+def infer(source: str) -> list[expr.BinaryExpr | expr.UnaryExpr]:
+    """Parse a program, infer its types and return its printed operators."""
+    statements, errors = parser.parse(source, use_cache=False)
+    assert not errors
+    for _ in TypeInference().inferred(statements):
+        pass
+    printed = []
+    for statement in statements:
+        if isinstance(statement, stmt.PrintStmt):
+            operation = statement.expression
+            assert isinstance(operation, (expr.BinaryExpr, expr.UnaryExpr))
+            printed.append(operation)
+    return printed
+
+
+class TestTypeInference:
+    """Test the type inference pass."""
+
+    PROGRAMS = [
+        "print 1 + 2 * 3 - 4 / 2; print -(1 + 2) > 3;",
+        'var a = "a"; print a + "b"; a = 1; print a + 2;',
+        "var a = 1; { var a = a + 1; print -a; { a = a * 10; } print a; }",
+        "var a = 1; print a + (a = 5); print a;",
+        "var a; print a + 1;",
+        'var a = 1; print (a = "x") + a;',
+        'print -"a";',
+        'print 1 + "a";',
+        "print b * 2;",
+    ]
+
+    @staticmethod
+    def _run(
+        source: str, inferred: bool, capsys: pytest.CaptureFixture[str]
+    ) -> tuple[str, str, object]:
+        """Run a program and return its output, errors and exit code."""
+        statements, _ = parser.parse(source, use_cache=False)
+        if inferred:
+            statements = list(TypeInference().inferred(statements))
+        engine = interpreter.Interpreter(statements)
+        engine.interpret()
+        captured = capsys.readouterr()
+        return captured.out, captured.err, engine.runtime_errors
+
+    def test_same_behavior(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_same_behavior"""
+        for source in self.PROGRAMS:
+            expected = self._run(source, False, capsys)
+            assert self._run(source, True, capsys) == expected
+
+    def test_proven(self) -> None:
+        """test_proven"""
+        operations = infer(
+            'print -1; print 1 + 2; print "a" + "b"; print (1 < 2) == nil;'
+        )
+        assert [o.proven for o in operations] == [True, True, True, False]
+
+    def test_variables(self) -> None:
+        """test_variables"""
+        operations = infer(
+            'var a = 1; print a * 2; a = "x"; print a * 2; print a + "y";'
+        )
+        assert [o.proven for o in operations] == [True, False, True]
+
+    def test_unproven(self) -> None:
+        """test_unproven"""
+        operations = infer('var a; print -a; print 1 + "a"; print b - 1;')
+        assert not any(o.proven for o in operations)
+
+    def test_describe(self) -> None:
+        """test_describe"""
+        assert describe(Type.NUMBER) == "number"
+        assert describe(Type.NUMBER | Type.STRING) == "number|string"
+        assert describe(Type.ANY) == "any"
+        assert describe(Type(0)) == "never"
+
+    def test_explain_types(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_explain_types"""
+        explain_types_cmd('var a = 1;\nprint -a + "b";\n')
+        assert capsys.readouterr().out == (
+            "[line 2] - (number) proven\n"
+            "[line 2] + (number, string) checked\n"
+            "1 of 2 checks proven unnecessary\n"
+        )
@@ -0,0 +1,120 @@
+"""Optimizer tests."""
+
+import pytest
+
+from app import interpreter, optimizer, parser
+from gen import stmt
+from tests.utils import describe, run_program
+
+
+def optimize(source: str) -> list[stmt.Stmt | None]:
+    """Parse and optimize a program."""
+    statements, errors = parser.parse(source, use_cache=False)
+    assert not errors
+    return optimizer.optimize(statements)
+
+
+class TestOptimizer:
+    """Test the optimizer pass."""
+
+    PROGRAMS = [
+        "print (1 + 2) * 3; print 10 / 4 - -1; print !(1 < 2) == false;",
+        'print "a" + "b" + "c"; print nil == false; print !nil;',
+        "var a = 1; var b = a + 2; print a * b;",
+        "var a = 1; print a; a = 2; print a;",
+        "var a = 1; print a + (a = 5); print a;",
+        "var a = 1; { var a = a + 1; print a; { a = a * 10; } print a; }",
+        "var a = 1; { print a; var a = 2; print a; } print a;",
+        "var a = 1; print a; var a = 2; print a;",
+        "var a; print a; a = b = 2;",
+        "print a; var a = 1;",
+        "{ var a = 1; } print a;",
+        'print 1; print -"a"; print 2;',
+        'print 1 + "a";',
+        'var a = "a"; print a < 1;',
+        "var a = nil; print 1 * a;",
+    ]
+
+    @staticmethod
+    def _run(
+        source: str, optimized: bool, capsys: pytest.CaptureFixture[str]
+    ) -> tuple[str, str, object]:
+        """Run a program and return its output, errors and exit code."""
+        engine = interpreter.Interpreter
+        if optimized:
+            engine = optimizer.optimizing(engine)
+        return run_program(engine, source, capsys)
+
+    def test_same_behavior(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_same_behavior"""
+        for source in self.PROGRAMS:
+            expected = self._run(source, False, capsys)
+            assert self._run(source, True, capsys) == expected
+
+    def test_folding(self) -> None:
+        """test_folding"""
+        assert describe(optimize('print (1 + 2) * 3; print "a" + "b";')) == (
+            "[PrintStmt(LiteralExpr(9.0)), PrintStmt(LiteralExpr('ab'))]"
+        )
+
+    def test_failing_folds_kept(self) -> None:
+        """test_failing_folds_kept"""
+        assert describe(
+            optimize('print -"x"; print (1 + nil); print 1/0;')
+        ) == (
+            "[PrintStmt(UnaryExpr(-, LiteralExpr('x'))), "
+            "PrintStmt(BinaryExpr(LiteralExpr(1.0), +, LiteralExpr(None))), "
+            "PrintStmt(BinaryExpr(LiteralExpr(1.0), /, LiteralExpr(0.0)))]"
+        )
+
+    def test_failing_fold_line(
+        self, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        """test_failing_fold_line"""
+        source = 'print "ok";\n\nprint -(("x"));\n'
+        assert self._run(source, True, capsys) == (
+            "ok\n",
+            "Operand must be a number.\n[line 3]\n",
+            70,
+        )
+
+    def test_propagation(self) -> None:
+        """test_propagation"""
+        statements = optimize("var a = 2; var b; print a * 3; print b;")
+        assert describe(statements[2:]) == (
+            "[PrintStmt(LiteralExpr(6.0)), PrintStmt(LiteralExpr(None))]"
+        )
+
+    def test_no_propagation_after_assignment(self) -> None:
+        """test_no_propagation_after_assignment"""
+        statements = optimize("var a = 2; { a = 3; } print a;")
+        assert describe(statements[2]) == "PrintStmt(VariableExpr(a))"
+
+    def test_no_propagation_before_declaration(self) -> None:
+        """test_no_propagation_before_declaration"""
+        statements = optimize("print a; var a = 1;")
+        assert describe(statements[0]) == "PrintStmt(VariableExpr(a))"
+
+    def test_evaluate(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_evaluate"""
+        interpreter.interpret_cmd(
+            "((1 + 2)) * -3 == -9",
+            engine=optimizer.optimizing(interpreter.Interpreter),
+        )
+        assert capsys.readouterr().out == "true\n"
+
+    def test_stream(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_stream"""
+        interpreter.run_cmd(
+            "var a = 2; print a * a; a = 1; print a;",
+            stream=True,
+            engine=optimizer.optimizing(interpreter.Interpreter),
+        )
+        assert capsys.readouterr().out == "4\n1\n"
+
+    def test_optimizing_engines(self) -> None:
+        """test_optimizing_engines"""
+        engine = optimizer.optimizing(interpreter.Interpreter)
+        assert interpreter.Interpreter in engine.__mro__
+        assert engine.__name__ == "OptimizingInterpreter"
+        assert optimizer.optimizing(interpreter.Interpreter) is engine
@@ -0,0 +1,82 @@
+"""Output sink tests."""
+
+import io
+import os
+
+import pytest
+
+from app import adaptive, closure, codegen, interpreter, parser, vm
+from app.output import OutputSink
+
+
+class TestOutputSink:
+    """Test buffering the output of programs."""
+
+    ENGINES = [
+        interpreter.Interpreter,
+        closure.ClosureInterpreter,
+        vm.VMInterpreter,
+        codegen.PythonInterpreter,
+        adaptive.AdaptiveInterpreter,
+    ]
+
+    def test_buffered(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_buffered"""
+        sink = OutputSink(interval=60)
+        sink.write("a")
+        sink.write("b")
+        assert capsys.readouterr().out == ""
+        sink.flush()
+        assert capsys.readouterr().out == "a\nb\n"
+        sink.flush()
+        assert capsys.readouterr().out == ""
+
+    def test_size(self) -> None:
+        """test_size"""
+        stream = io.StringIO()
+        sink = OutputSink(stream, size=7, interval=60)
+        sink.write("ab")
+        sink.write("cd")
+        assert stream.getvalue() == ""
+        sink.write("e")
+        assert stream.getvalue() == "ab\ncd\ne\n"
+
+    def test_interval(self) -> None:
+        """test_interval"""
+        stream = io.StringIO()
+        sink = OutputSink(stream, interval=0)
+        sink.write("a")
+        assert stream.getvalue() == "a\n"
+
+    def test_environment(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """test_environment"""
+        monkeypatch.setenv("LOX_OUTPUT_SIZE", "2")
+        stream = io.StringIO()
+        OutputSink(stream, interval=60).write("a")
+        assert stream.getvalue() == "a\n"
+
+    def test_file_descriptor(self) -> None:
+        """test_file_descriptor"""
+        read, write = os.pipe()
+        try:
+            sink = OutputSink(write)
+            sink.write("é")
+            sink.flush()
+            assert os.read(read, 16) == "é\n".encode()
+        finally:
+            os.close(read)
+            os.close(write)
+
+    def test_engines(self) -> None:
+        """test_engines"""
+        source = 'print 1; { var a = "b"; print a; } print -"c";'
+        for engine in self.ENGINES:
+            stream = io.StringIO()
+            statements, _ = parser.parse(source, use_cache=False)
+            program = engine(statements, OutputSink(stream, interval=60))
+            program.interpret()
+            # Flushed before the runtime error is reported.
+            assert stream.getvalue() == "1\nb\n"
+            assert program.runtime_errors == [
+                "Operand must be a number.\n[line 1]"
+            ]
@@ -0,0 +1,169 @@
+"""Parser tests."""
+
+from app import parser
+from app.astprinter import AstPrinter
+from app.interpreter import Interpreter
+from gen import expr, stmt
+from tests.utils import describe
+
+
+class TestParseCompact:
+    """Test parsing directly over a token buffer."""
+
+    def test_same_tree(self) -> None:
+        """test_same_tree"""
+        for source in ["1 + 2 * (3 - -4)", '!true == "a"', "a = b = nil"]:
+            expected, errors = parser.parse_expression(source)
+            found, compact_errors = parser.parse_expression(
+                source, compact=True
+            )
+            assert expected is not None and found is not None
+            assert AstPrinter().print(found) == AstPrinter().print(expected)
+            assert compact_errors == errors
+
+    def test_same_errors(self) -> None:
+        """test_same_errors"""
+        source = "var a = ;\nprint (1;\n{ var b = 2; }\nprint b"
+        statements, errors = parser.parse(source)
+        compact_statements, compact_errors = parser.parse(source, compact=True)
+        assert compact_errors == errors
+        assert len(compact_statements) == len(statements)
+
+
+class TestPrecedence:
+    """Test the precedence and associativity of the operators."""
+
+    TREES = [
+        ("1 - 2 - 3", "(- (- 1.0 2.0) 3.0)"),
+        ("1 + 2 * 3 / 4", "(+ 1.0 (/ (* 2.0 3.0) 4.0))"),
+        ("-1 * -2", "(* (- 1.0) (- 2.0))"),
+        ("!!true == false", "(== (! (! true)) false)"),
+        ("1 < 2 == 3 >= 4", "(== (< 1.0 2.0) (>= 3.0 4.0))"),
+        ("a == (b)", "(== (a) (group (b)))"),
+        ('"a" != nil', "(!= a nil)"),
+    ]
+
+    ERRORS = [
+        ("1 + 2 = 3", "[line 1] Error at '=': Invalid assignment target."),
+        ("-a = 3", "[line 1] Error at '=': Invalid assignment target."),
+        ("1 +", "[line 1] Error at end: Expect expression."),
+        ("(1", "[line 1] Error at end: Expect ')' after expression."),
+        ("* 2", "[line 1] Error at '*': Expect expression."),
+    ]
+
+    def test_trees(self) -> None:
+        """test_trees"""
+        for source, tree in self.TREES:
+            expression, errors = parser.parse_expression(source)
+            assert not errors
+            assert expression is not None
+            assert AstPrinter().print(expression) == tree, source
+
+    def test_errors(self) -> None:
+        """test_errors"""
+        for source, error in self.ERRORS:
+            _, errors = parser.parse_expression(source)
+            assert errors == [error], source
+
+    def test_assignment(self) -> None:
+        """test_assignment"""
+        expression, errors = parser.parse_expression("a = b = 1 + 2")
+        assert not errors
+        assert describe(expression) == (
+            "AssignExpr(a, AssignExpr(b, BinaryExpr("
+            "LiteralExpr(1.0), +, LiteralExpr(2.0))))"
+        )
+
+
+class TestIterativeParser:
+    """Test parsing without recursion."""
+
+    SOURCES = [
+        "var a = (1 + 2) * -(3 - !b);\nprint a = b = c;\n",
+        "{ var a = 1; { print a; } }\nprint (1;\n{ var b = 2; }\nprint b",
+        "{ { print 1; }\nprint ;\n1 + 2 = 3;",
+    ]
+
+    def test_same_as_recursive(self) -> None:
+        """test_same_as_recursive"""
+        for source in self.SOURCES:
+            expected, errors = parser.parse(source, use_cache=False)
+            found, iterative_errors = parser.parse(
+                source, use_cache=False, iterative=True
+            )
+            assert list(map(describe, found)) == list(map(describe, expected))
+            assert iterative_errors == errors
+
+    def test_deep_nesting(self) -> None:
+        """test_deep_nesting"""
+        depth = 100_000
+        expression, errors = parser.parse_expression(
+            "(" * depth + "-1" + ")" * depth, iterative=True
+        )
+        assert not errors
+        for _ in range(depth):
+            assert isinstance(expression, expr.GroupingExpr)
+            expression = expression.expression
+        assert isinstance(expression, expr.UnaryExpr)
+
+        statements, errors = parser.parse(
+            "{" * depth + "print 1;" + "}" * depth, iterative=True
+        )
+        assert not errors
+        statement = statements[0]
+        for _ in range(depth):
+            assert isinstance(statement, stmt.BlockStmt)
+            statement = statement.statements[0]
+        assert isinstance(statement, stmt.PrintStmt)
+
+    def test_deep_fallback(self) -> None:
+        """test_deep_fallback"""
+        depth = 10_000
+        expression, errors = parser.parse_expression(
+            "(" * depth + "1" + ")" * depth
+        )
+        assert not errors
+        assert isinstance(expression, expr.GroupingExpr)
+        statements, errors = parser.parse(
+            "{" * depth + "print 1;" + "}" * depth, use_cache=False
+        )
+        assert not errors
+        assert isinstance(statements[0], stmt.BlockStmt)
+
+    def test_deep_errors(self) -> None:
+        """test_deep_errors"""
+        _, errors = parser.parse(
+            "{" * 3 + "print " + "(" * 1000, iterative=True
+        )
+        assert (
+            errors
+            == ["[line 1] Error at end: Expect expression."]
+            + ["[line 1] Error at end: Expect '}'."] * 3
+        )
+
+
+class TestNodes:
+    """Test the generated syntax tree nodes."""
+
+    def test_slots(self) -> None:
+        """test_slots"""
+        statements, _ = parser.parse(
+            "var a = -(1 + 2); { print a = b; }", use_cache=False
+        )
+        var, block = statements
+        assert isinstance(var, stmt.VarStmt)
+        assert isinstance(block, stmt.BlockStmt)
+        for node in [var, var.initializer, block, block.statements[0]]:
+            assert not hasattr(node, "__dict__")
+
+    def test_dispatch_tables(self) -> None:
+        """test_dispatch_tables"""
+        visitor = Interpreter()
+        for module, base in [(expr, expr.Expr), (stmt, stmt.Stmt)]:
+            table = module.dispatch_table(visitor)
+            assert set(table) == set(base.__subclasses__())
+            for node_class, method in table.items():
+                name = node_class.__name__.removesuffix(base.__name__)
+                assert method.__name__ == (
+                    f"visit_{name.lower()}_{base.__name__.lower()}"
+                )
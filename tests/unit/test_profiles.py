@@ -0,0 +1,98 @@
+"""Execution profile tests."""
+
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+from app import interpreter, parser, profiles
+from gen import stmt
+from tests.utils import run_program
+
+
+class TestProfiles:
+    """Test recording profiles and running with them."""
+
+    PROGRAMS = [
+        "print 1 + 2 * 3 - 4 / 2; print -(1 + 2) > 3;",
+        'var a = "a"; print a + "b"; a = 1; print a + 2;',
+        "var a = 1; { var a = a + 1; print -a; { a = a * 10; } print a; }",
+        'print !nil == !"a"; print nil != false;',
+        'print -"a";',
+        'print 1 + "a";',
+        "print b * 2;",
+    ]
+
+    def test_same_behavior(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        """test_same_behavior"""
+        for i, source in enumerate(self.PROGRAMS):
+            path = str(tmp_path / f"profile{i}.json")
+            expected = run_program(interpreter.Interpreter, source, capsys)
+            engine = profiles.profiling(profiles.load(path, source))
+            assert run_program(engine, source, capsys) == expected
+            engine = profiles.profile_guided(profiles.load(path, source))
+            assert run_program(engine, source, capsys) == expected
+
+    def test_record(self, tmp_path: Path) -> None:
+        """test_record"""
+        path = str(tmp_path / "profile.json")
+        source = 'var a = 1; { print -a + a; } print "a" + "b";'
+        for _ in range(2):
+            statements, _ = parser.parse(source, use_cache=False)
+            profiles.profiling(profiles.load(path, source))(
+                statements
+            ).interpret()
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            data = json.load(file)
+        assert data["sites"] == [
+            ["binary +", 2, {"number number": 2}, None],
+            ["unary -", 2, {"number": 2}, None],
+            ["variable a", 2, {}, -1],
+            ["variable a", 2, {}, -1],
+            ["binary +", 2, {"string string": 2}, None],
+        ]
+
+    def test_quickened_before_running(self, tmp_path: Path) -> None:
+        """test_quickened_before_running"""
+        path = str(tmp_path / "profile.json")
+        source = 'var a = 2; print a * a; a = "b"; print 1 == a;'
+        statements, _ = parser.parse(source, use_cache=False)
+        profiles.profiling(profiles.load(path, source))(statements).interpret()
+        statements, _ = parser.parse(source, use_cache=False)
+        profile = profiles.load(path, source)
+        quickened = profiles.quickened(statements, profile)
+        assert [
+            type(statement.expression).__name__
+            for statement in quickened
+            if isinstance(statement, stmt.PrintStmt)
+        ] == ["NumberStarExpr", "_GenericBinaryExpr"]
+
+    def test_other_source(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        """test_other_source"""
+        path = str(tmp_path / "profile.json")
+        profiles.load(path, "print 1 + 1;").dump()
+        assert not profiles.load(path, "print 1 + 1;").sites
+        assert not profiles.load(path, "print 1 - 1;").sites
+        assert capsys.readouterr().err == (
+            f"Ignoring the profile of another source: {path}\n"
+        )
+        assert not profiles.load(path, "print 1 - 1;", recording=True).sites
+        assert not capsys.readouterr().err
+
+    def test_invalid(
+        self, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        """test_invalid"""
+        path = tmp_path / "profile.json"
+        path.write_text("{", encoding="utf-8")
+        assert not profiles.load(str(path), "print 1;").sites
+        assert capsys.readouterr().err.startswith(
+            f"Ignoring an invalid profile: {path}: "
+        )
+        with pytest.raises(ValueError):
+            profiles.load(str(path), "print 1;", recording=True)
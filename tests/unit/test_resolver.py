@@ -0,0 +1,96 @@
+"""Resolver tests."""
+
+import pytest
+
+from app import interpreter, parser
+from app.resolver import Resolver
+from gen import expr, stmt
+
+
+def resolve(source: str) -> list[stmt.Stmt | None]:
+    """Parse and resolve a program."""
+    statements, errors = parser.parse(source, use_cache=False)
+    assert not errors
+    return list(Resolver().resolved(statements))
+
+
+class TestResolver:
+    """Test the resolver pass."""
+
+    def test_depth_and_slot(self) -> None:
+        """test_depth_and_slot"""
+        source = "var g; { var a; var b; { var c; print b; } g = a; }"
+        block = resolve(source)[1]
+        assert isinstance(block, stmt.BlockStmt)
+        first, second, inner, assign = block.statements
+        assert isinstance(first, stmt.VarStmt) and first.slot == 0
+        assert isinstance(second, stmt.VarStmt) and second.slot == 1
+        assert isinstance(inner, stmt.BlockStmt)
+        _, printed = inner.statements
+        assert isinstance(printed, stmt.PrintStmt)
+        variable = printed.expression
+        assert isinstance(variable, expr.VariableExpr)
+        assert (variable.depth, variable.slot) == (1, 1)
+        assert isinstance(assign, stmt.ExpressionStmt)
+        target = assign.expression
+        assert isinstance(target, expr.AssignExpr)
+        assert (target.depth, target.slot) == (1, -1)
+        assert isinstance(target.value, expr.VariableExpr)
+        assert (target.value.depth, target.value.slot) == (0, 0)
+
+    def test_redeclaration_reuses_slot(self) -> None:
+        """test_redeclaration_reuses_slot"""
+        block = resolve("{ var a = 1; var b; var a = a; }")[0]
+        assert isinstance(block, stmt.BlockStmt)
+        assert [
+            s.slot for s in block.statements if isinstance(s, stmt.VarStmt)
+        ] == [0, 1, 0]
+
+    def test_empty_blocks_elided(self) -> None:
+        """test_empty_blocks_elided"""
+        outer = resolve("{ var a; var b; { { print b; } } }")[0]
+        assert isinstance(outer, stmt.BlockStmt)
+        assert outer.size == 2
+        middle = outer.statements[2]
+        assert isinstance(middle, stmt.BlockStmt)
+        assert middle.size == 0
+        inner = middle.statements[0]
+        assert isinstance(inner, stmt.BlockStmt)
+        assert inner.size == 0
+        printed = inner.statements[0]
+        assert isinstance(printed, stmt.PrintStmt)
+        assert isinstance(printed.expression, expr.VariableExpr)
+        assert printed.expression.depth == 0
+        assert printed.expression.slot == 1
+
+    PROGRAMS = [
+        (
+            "var a = 1; { print a; var a = a + 1; print a; { print a; } }",
+            "1\n2\n2\n",
+            [],
+        ),
+        ("{ var a = 1; { a = 2; } print a; } print a;", "2\n", ["a"]),
+        ("{ { print b; } }", "", ["b"]),
+        ("{ var b = 1; } { b = 2; }", "", ["b"]),
+        (
+            "{ var a = 1; { var b = a; } { var c; print c; c = a; print c; } }",
+            "nil\n1\n",
+            [],
+        ),
+    ]
+
+    def test_same_behavior(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_same_behavior"""
+        for source, output, undefined in self.PROGRAMS:
+            code = None
+            try:
+                interpreter.run_cmd(source, use_cache=False)
+            except SystemExit as e:
+                code = e.code
+            captured = capsys.readouterr()
+            assert captured.out == output, source
+            assert code == (70 if undefined else None)
+            if undefined:
+                assert captured.err == (
+                    f"Undefined variable '{undefined[0]}'.\n[line 1]\n"
+                )
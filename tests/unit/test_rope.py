@@ -0,0 +1,91 @@
+"""Rope tests."""
+
+import pytest
+
+from app import codegen, interpreter, optimizer, parser
+from app.rope import THRESHOLD, Rope, concat
+from gen import expr, stmt
+from tests.utils import run_program
+
+LONG = "x" * THRESHOLD
+
+
+class TestRope:
+    """Test ropes and the strings the interpreter builds with them."""
+
+    def test_concat(self) -> None:
+        """test_concat"""
+        assert concat("a", "b") == "ab"
+        assert isinstance(concat("a", "b"), str)
+        rope = concat(LONG, "a")
+        assert isinstance(rope, Rope)
+        assert len(rope) == THRESHOLD + 1
+        assert str(rope) == LONG + "a"
+
+    def test_like_str(self) -> None:
+        """test_like_str"""
+        rope = concat(concat("a", LONG), concat(LONG, "b"))
+        text = "a" + LONG + LONG + "b"
+        assert rope == text
+        assert text == rope
+        assert rope == Rope("a" + LONG, LONG + "b")
+        assert rope != concat(LONG, LONG)
+        assert rope != 1.0
+        assert hash(rope) == hash(text)
+        assert str("c" + rope) == "c" + text
+        assert str(rope + "c") == text + "c"
+
+    def test_deep(self) -> None:
+        """test_deep"""
+        rope: str | Rope = LONG
+        for _ in range(100000):
+            rope = concat(rope, "ab")
+        assert str(rope) == LONG + "ab" * 100000
+
+    def test_interpreter(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_interpreter"""
+        source = (
+            f'var s = "{LONG}"; s = s + "a"; s = "b" + s + s;'
+            f'print s == "b{LONG}a{LONG}a"; print s; print s + 1;'
+        )
+        expected = (
+            f"true\nb{LONG}a{LONG}a\n",
+            "Operands must be two numbers or two strings.\n[line 1]\n",
+            70,
+        )
+        assert run_program(interpreter.Interpreter, source, capsys) == expected
+        engine = optimizer.optimizing(interpreter.Interpreter)
+        assert run_program(engine, source, capsys) == expected
+
+    def test_folded(self) -> None:
+        """test_folded"""
+        statements, _ = parser.parse(f'print "{LONG}" + "a";', use_cache=False)
+        statement = optimizer.optimize(statements)[0]
+        assert isinstance(statement, stmt.PrintStmt)
+        assert isinstance(statement.expression, expr.LiteralExpr)
+        assert not isinstance(statement.expression.value, Rope)
+        assert statement.expression.value == LONG + "a"
+
+    def test_walked_by_python_engine(
+        self,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ) -> None:
+        """test_walked_by_python_engine"""
+        compile_function = codegen.compile_function
+        calls = []
+
+        def too_deep_once(*args: object) -> object:
+            calls.append(args)
+            if len(calls) == 1:
+                raise RecursionError
+            return compile_function(*args)  # type: ignore[arg-type]
+
+        monkeypatch.setattr(codegen, "compile_function", too_deep_once)
+        monkeypatch.setattr(codegen, "BATCH_SIZE", 2)
+        source = f'var s = "{LONG}"; s = s + "a"; print s + "b";'
+        assert run_program(codegen.PythonInterpreter, source, capsys) == (
+            f"{LONG}ab\n",
+            "",
+            None,
+        )
@@ -1,5 +1,9 @@
 """Scan tests."""
 
+import io
+
+import pytest
+
 from app import scanner, tokens
 
 
@@ -60,3 +64,158 @@ class TestScan:
         sc = scanner.Scanner("({*.,+*})")
         t = sc.scan_tokens()
         assert t == expected
+
+
+class TestFastScan:
+    """Test the regex based scanner against the reference one."""
+
+    SOURCES = [
+        "",
+        "(()",
+        'var foo = "bar";\nprint foo + "baz" ; // comment\n',
+        "1234.1234 .5 5. 12.a and_or orchid if\tfor\r\nwhile",
+        '"multi\nline" "unterminated\n\n',
+        "!= == <= >= ! = < > / // // \n/",
+        ",.$(#@\n%",
+        "café = é1; x²",
+    ]
+
+    def test_same_tokens(self) -> None:
+        """test_same_tokens"""
+        for source in self.SOURCES:
+            reference = scanner.Scanner(source)
+            fast = scanner.FastScanner(source)
+            assert fast.scan_tokens() == reference.scan_tokens(), source
+            assert fast.lexical_errors == reference.lexical_errors, source
+
+    def test_scan_engine(self) -> None:
+        """test_scan_engine"""
+        tokens_found, errors = scanner.scan("var a;", "fast")
+        assert [t.type for t in tokens_found] == [
+            tokens.TokenType.VAR,
+            tokens.TokenType.IDENTIFIER,
+            tokens.TokenType.SEMICOLON,
+            tokens.TokenType.EOF,
+        ]
+        assert not errors
+
+
+class TestScanBuffer:
+    """Test scanning into a TokenBuffer."""
+
+    def test_same_tokens(self) -> None:
+        """test_same_tokens"""
+        for source in TestFastScan.SOURCES:
+            for engine in scanner.SCANNERS:
+                reference = scanner.Scanner(source)
+                expected = reference.scan_tokens()
+                compact = scanner.make_scanner(source, engine)
+                buffer = compact.scan_buffer()
+                assert list(buffer) == expected, source
+                assert len(buffer) == len(expected)
+                assert compact.lexical_errors == reference.lexical_errors
+
+    def test_lazy_access(self) -> None:
+        """test_lazy_access"""
+        buffer, _ = scanner.scan_buffer('x = "y";', "fast")
+        assert buffer.token_type(2) == tokens.TokenType.STRING
+        assert buffer.lexeme(2) == '"y"'
+        assert buffer[2].literal == "y"
+        assert buffer[2] is buffer[2]
+
+    def test_token_slots(self) -> None:
+        """test_token_slots"""
+        token = tokens.Token(tokens.TokenType.EOF, "", None, 1)
+        assert not hasattr(token, "__dict__")
+
+
+class TestSymbols:
+    """Test identifier interning."""
+
+    def test_interned_identifiers(self) -> None:
+        """test_interned_identifiers"""
+        source = 'var name = "s"; name = name + "s";'
+        for engine in scanner.SCANNERS:
+            sc = scanner.make_scanner(source, engine)
+            names = [
+                t
+                for t in sc.scan_tokens()
+                if t.type == tokens.TokenType.IDENTIFIER
+            ]
+            assert len(names) == 3
+            assert names[0].lexeme is names[1].lexeme is names[2].lexeme
+            assert (sc.symbols.unique, sc.symbols.total) == (1, 3)
+
+    def test_interned_strings(self) -> None:
+        """test_interned_strings"""
+        source = '"ss" + "ss"'
+        for engine, cls in scanner.SCANNERS.items():
+            sc = cls(source, intern_strings=True)
+            first, _, second, _ = sc.scan_tokens()
+            assert first.literal is second.literal, engine
+            assert (sc.symbols.unique, sc.symbols.total) == (1, 2)
+
+    def test_compact_symbols(self) -> None:
+        """test_compact_symbols"""
+        source = 'var name = "s"; name = name + "s"; var other;'
+        for engine, cls in scanner.SCANNERS.items():
+            sc = cls(source, intern_strings=True)
+            sc.scan_buffer()
+            assert (sc.symbols.unique, sc.symbols.total) == (3, 6), engine
+
+
+class TestScanParallel:
+    """Test scanning chunks in a process pool."""
+
+    SOURCES = [
+        'var a = 1;\n// "comment\nprint "multi\nline\nstring";\n' * 20,
+        'print 1.5;\n@ "x\n' * 30 + '"\nvar b;\n',
+        'var s = "' + "\n" * 100 + '";\nprint s;\n',
+        'print "never closed\n' + "var x = 1;\n" * 50,
+    ]
+
+    def test_same_as_scan(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """test_same_as_scan"""
+        monkeypatch.setattr(scanner, "PARALLEL_MIN_CHUNK", 16)
+        for source in self.SOURCES:
+            for engine in scanner.SCANNERS:
+                expected, errors = scanner.scan(source)
+                buffer, parallel_errors = scanner.scan_parallel(
+                    source, 2, engine
+                )
+                assert list(buffer) == expected, source
+                assert parallel_errors == errors, source
+
+    def test_small_source(self) -> None:
+        """test_small_source"""
+        buffer, errors = scanner.scan_parallel("print 1;", 4)
+        assert scanner.tokens_to_string(buffer) == scanner.tokens_to_string(
+            scanner.scan("print 1;")[0]
+        )
+        assert not errors
+
+
+class TestWriteTokens:
+    """Test writing tokens to a stream."""
+
+    SOURCE = 'var x = 0; print "" + "0" + 1.50; if (x != 10) {} // é\n"é"'
+
+    def test_same_as_string(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """test_same_as_string"""
+        monkeypatch.setattr(scanner, "WRITE_CHUNK", 8)
+        expected = scanner.tokens_to_string(scanner.scan(self.SOURCE)[0])
+        binary = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+        text = io.StringIO()
+        for stream in (binary, text):
+            scanner.write_tokens(scanner.scan(self.SOURCE)[0], stream)
+            stream.seek(0)
+            assert stream.read() == expected + "\n"
+
+    def test_print_tokens(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_print_tokens"""
+        print("before")
+        scanner.print_tokens(scanner.scan("print 0;")[0])
+        assert capsys.readouterr().out == (
+            "before\nPRINT print null\nNUMBER 0 0.0\n"
+            "SEMICOLON ; null\nEOF  null\n"
+        )
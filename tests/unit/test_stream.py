@@ -0,0 +1,46 @@
+"""Streaming tests."""
+
+import pytest
+
+from app import interpreter, scanner, tokens
+
+
+class TestTokenStream:
+    """Test TokenStream"""
+
+    def test_window(self) -> None:
+        """test_window"""
+        stream = tokens.TokenStream(scanner.Scanner("1 2 3").iter_tokens())
+        assert stream[0].lexeme == "1"
+        assert stream[1].lexeme == "2"
+        assert stream[0].lexeme == "1"
+        assert stream[3].type == tokens.TokenType.EOF
+        with pytest.raises(IndexError):
+            _ = stream[0]
+
+    def test_iter_tokens(self) -> None:
+        """test_iter_tokens"""
+        source = 'var a = "x";\n@ print a;'
+        for engine in scanner.SCANNERS:
+            lazy = scanner.make_scanner(source, engine)
+            eager = scanner.make_scanner(source, engine)
+            assert list(lazy.iter_tokens()) == eager.scan_tokens()
+            assert lazy.lexical_errors == eager.lexical_errors
+
+
+class TestRunStream:
+    """Test the streaming pipeline."""
+
+    def test_output_before_parse_error(
+        self, capsys: pytest.CaptureFixture[str]
+    ) -> None:
+        """test_output_before_parse_error"""
+        with pytest.raises(SystemExit) as pytest_wrapped_e:
+            interpreter.run_cmd('print "first";\nprint ;\nprint;', stream=True)
+        assert pytest_wrapped_e.value.code == 65
+        captured = capsys.readouterr()
+        assert captured.out == "first\n"
+        assert captured.err == (
+            "[line 2] Error at ';': Expect expression.\n"
+            "[line 3] Error at ';': Expect expression.\n"
+        )
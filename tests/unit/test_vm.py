@@ -0,0 +1,88 @@
+"""Bytecode virtual machine tests."""
+
+import pytest
+
+from app import interpreter, parser, vm
+from tests.utils import FAILING_PROGRAMS, run_program
+
+
+class TestVM:
+    """Test the bytecode engine against the tree walking interpreter."""
+
+    PROGRAMS = [
+        "print 1 + 2 * 3 - 4 / 2;",
+        'print "a" + "b"; print 1 < 2; print 2 <= 2; print 3 > 4;',
+        "print 1 >= 2; print 1 == 1; print nil != false; print !nil;",
+        "print -(1 + 2); print 10 / 4; print 7 * 0.5; print !0;",
+        "var a = 1; { var a = a + 1; print a; { a = a * 10; } print a; }",
+        "var a; print a; a = b = 2;",
+        "{ var a = 1; { var b = a; print a + b; } } print a;",
+        "{ var a = 1; { var b = 2; } { var c = 3; print a + c; } }",
+        *FAILING_PROGRAMS,
+    ]
+
+    def test_same_behavior(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_same_behavior"""
+        for source in self.PROGRAMS:
+            expected = run_program(interpreter.Interpreter, source, capsys)
+            assert run_program(vm.VMInterpreter, source, capsys) == expected
+
+    def test_evaluate(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_evaluate"""
+        expression, _ = parser.parse_expression("(1 + 2) * -3 == -9")
+        assert expression is not None
+        assert vm.VMInterpreter().evaluate(expression) is True
+        interpreter.interpret_cmd("2 * 21", engine=vm.VMInterpreter)
+        assert capsys.readouterr().out == "42\n"
+
+    def test_opcode_aliases(self) -> None:
+        """test_opcode_aliases"""
+        for opcode in vm.OpCode:
+            assert getattr(vm, f"_{opcode.name}") == opcode
+
+    def test_extended_arg(self, capsys: pytest.CaptureFixture[str]) -> None:
+        """test_extended_arg"""
+        chunk = vm.Chunk()
+        for number in range(70000):
+            chunk.constant(float(number))
+        statements, _ = parser.parse("print 0.5;", use_cache=False)
+        compiler = vm.Compiler(chunk)
+        for statement in statements:
+            assert statement is not None
+            compiler.statement(statement)
+        compiler.end()
+        assert chunk.code[0] == vm.OpCode.EXTENDED_ARG
+        machine = vm.VM()
+        machine.run(chunk)
+        machine.output.flush()
+        assert capsys.readouterr().out == "0.5\n"
+
+    def test_constants_deduplicated(self) -> None:
+        """test_constants_deduplicated"""
+        chunk = vm.Chunk()
+        assert chunk.constant(1.0) == chunk.constant(1.0)
+        assert chunk.constant(0.0) != chunk.constant(-0.0)
+        assert chunk.constant("1") != chunk.constant(1.0)
+
+    def test_line_table(self) -> None:
+        """test_line_table"""
+        statements, _ = parser.parse(
+            "var a = 1;\n\n{ print a; }", use_cache=False
+        )
+        chunk = vm.compile_program(statements)
+        assert [chunk.line(offset) for offset in (0, 3, 6, 9)] == [1, 1, 3, 3]
+
+    def test_disassemble(self) -> None:
+        """test_disassemble"""
+        source = "var a = 1;\n{ var b = a; print -b; }"
+        statements, _ = parser.parse(source, use_cache=False)
+        assert list(vm.disassemble(vm.compile_program(statements))) == [
+            "0000    1 CONSTANT                  0 '1'",
+            "0003    | DEFINE_GLOBAL             1 'a'",
+            "0006    2 GET_GLOBAL                1 'a'",
+            "0009    | STORE_LOCAL               0",
+            "0012    | GET_LOCAL                 0",
+            "0015    | NEGATE",
+            "0016    | PRINT",
+            "0017    | RETURN",
+        ]
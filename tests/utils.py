@@ -0,0 +1,52 @@
+"""Test helpers."""
+
+import inspect
+
+import pytest
+
+from app import interpreter
+from app.tokens import Token
+from gen import expr, stmt
+
+# Programs that fail at run time, after printing or on another line.
+FAILING_PROGRAMS = [
+    'print 1;\nprint -"a";',
+    'print 1 +\n"a";',
+    'print "a" <\n1;',
+    "print 1 * nil;",
+    'print 2 - "b"; print 3;',
+]
+
+
+def describe(node: object) -> str:
+    """Describe a syntax tree in a way that can be compared."""
+    match node:
+        case expr.Expr() | stmt.Stmt():
+            # Fields with a default are annotations, not syntax.
+            parameters = inspect.signature(type(node)).parameters.values()
+            inner = ", ".join(
+                describe(getattr(node, parameter.name))
+                for parameter in parameters
+                if parameter.default is parameter.empty
+            )
+            return f"{type(node).__name__}({inner})"
+        case Token():
+            return node.lexeme
+        case list():
+            return f"[{', '.join(describe(item) for item in node)}]"
+    return repr(node)
+
+
+def run_program(
+    engine: type[interpreter.Interpreter],
+    source: str,
+    capsys: pytest.CaptureFixture[str],
+) -> tuple[str, str, object]:
+    """Run a program and return its output, errors and exit code."""
+    code = None
+    try:
+        interpreter.run_cmd(source, use_cache=False, engine=engine)
+    except SystemExit as e:
+        code = e.code
+    captured = capsys.readouterr()
+    return captured.out, captured.err, code